@@ -0,0 +1,17 @@
+"""
+Benchmarks for the task store and the UI hot paths.
+
+    python -m benchmarks generate --tasks 100000
+    python -m benchmarks run --sizes 1000,100000 --json results.json
+    python -m benchmarks compare baseline.json results.json
+
+generator.py builds reproducible synthetic stores, scenarios.py registers the
+timed scenarios and runner.py times them and reads/writes the JSON results.
+The bench_*.py, load_test.py, stress_writers.py and store_suite.py scripts in
+this directory are standalone and run as files.
+"""
+import os
+import sys
+
+# The floppy_zwang modules import each other by bare name (as main.py does).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
@@ -0,0 +1,201 @@
+"""
+python -m benchmarks <command>
+
+    generate  build (and cache) the synthetic databases for --sizes
+    run       time the scenarios, print a table and optionally write --json
+    compare   compare two result files; exit status 1 on any regression
+    memory    profile peak and retained memory; exit status 1 on a budget overrun
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from . import generator, memory, runner
+from .scenarios import SCENARIOS, Context, start_display, stop_display
+
+DEFAULT_SIZES = "1000,10000,100000"
+
+
+def _sizes(text):
+    return [int(float(s)) for s in text.split(",") if s.strip()]
+
+
+def _progress(n):
+    print(f"\r  {n} rows", end="", file=sys.stderr, flush=True)
+
+
+def cmd_generate(args):
+    for n in _sizes(args.sizes):
+        t0 = time.perf_counter()
+        print(f"{n} tasks (seed {args.seed})", file=sys.stderr)
+        path = generator.cached_database(n, args.seed, progress=_progress)
+        print(f"\r  {path} ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+
+def cmd_run(args):
+    selected = [s for s in SCENARIOS if not args.k or args.k in f"{s.group}/{s.name}"]
+    display, gui_skip = (None, None)
+    if any(s.gui for s in selected) and not args.no_gui:
+        display, gui_skip = start_display()
+    elif args.no_gui:
+        gui_skip = "--no-gui"
+
+    results = []
+    try:
+        for n in _sizes(args.sizes):
+            for backend in args.backends.split(","):
+                with tempfile.TemporaryDirectory() as workdir:
+                    print(f"{backend}, {n} tasks", file=sys.stderr)
+                    store = generator.make_store(backend, n, args.seed, workdir=workdir, progress=_progress)
+                    ctx = Context(store, backend, n)
+                    try:
+                        for s in selected:
+                            results.append(_run_one(s, ctx, args, gui_skip))
+                    finally:
+                        ctx.close()
+                        store.close()
+    finally:
+        stop_display(display)
+
+    runner.print_table(results)
+    if args.json:
+        params = {"sizes": _sizes(args.sizes), "backends": args.backends.split(","), "seed": args.seed,
+                  "anchor": generator.DEFAULT_ANCHOR.isoformat(), "generator_version": generator.GENERATOR_VERSION}
+        runner.save(runner.result_document(results, params), args.json)
+        print(f"results written to {args.json}", file=sys.stderr)
+
+
+def _run_one(s, ctx, args, gui_skip):
+    entry = {
+        "name": s.name,
+        "group": s.group,
+        "fullname": f"{s.group}/{s.name}[{ctx.backend}-{ctx.tasks}]",
+        "params": {"backend": ctx.backend, "tasks": ctx.tasks},
+    }
+    if s.gui and gui_skip:
+        entry["skipped"] = gui_skip
+        return entry
+    print(f"  {entry['fullname']}", file=sys.stderr)
+    fn = s.fn(ctx)
+    entry["stats"] = runner.measure(fn, min_time=args.min_time, min_rounds=args.min_rounds)
+    return entry
+
+
+def cmd_memory(args):
+    selected = [s for s in memory.MEMORY_SCENARIOS if not args.k or args.k in s.name]
+    display, gui_skip = (None, None)
+    if any(s.gui for s in selected) and not args.no_gui:
+        display, gui_skip = start_display()
+    elif args.no_gui:
+        gui_skip = "--no-gui"
+
+    results = []
+    try:
+        for n in _sizes(args.sizes):
+            for backend in args.backends.split(","):
+                with tempfile.TemporaryDirectory() as workdir:
+                    print(f"{backend}, {n} tasks", file=sys.stderr)
+                    store = generator.make_store(backend, n, args.seed, workdir=workdir, progress=_progress)
+                    ctx = Context(store, backend, n)
+                    try:
+                        for s in selected:
+                            results.append(_memory_one(s, ctx, gui_skip))
+                    finally:
+                        ctx.close()
+                        store.close()
+    finally:
+        stop_display(display)
+
+    memory.print_table(results)
+    if args.json:
+        params = {"sizes": _sizes(args.sizes), "backends": args.backends.split(","), "seed": args.seed,
+                  "generator_version": generator.GENERATOR_VERSION, "budgets": memory.BUDGETS}
+        runner.save(runner.result_document(results, params), args.json)
+        print(f"results written to {args.json}", file=sys.stderr)
+    over = [e for e in results if e.get("budget") and not e["budget"]["passed"]]
+    if over and not args.no_budgets:
+        print(f"\n{len(over)} scenario(s) over their memory budget")
+        return 1
+    return 0
+
+
+def _memory_one(s, ctx, gui_skip):
+    entry = {
+        "name": s.name,
+        "fullname": f"{s.name}[{ctx.backend}-{ctx.tasks}]",
+        "params": {"backend": ctx.backend, "tasks": ctx.tasks},
+    }
+    if s.gui and gui_skip:
+        entry["skipped"] = gui_skip
+        return entry
+    print(f"  {entry['fullname']}", file=sys.stderr)
+    setup = s.fn(ctx)
+    if isinstance(setup, str):
+        entry["skipped"] = setup
+        return entry
+    fn, rows = setup
+    fn()  # warm-up: lazy imports, statement cache, first Treeview build
+    entry["rows"] = rows
+    entry["stats"] = memory.profile(fn)
+    budget = memory.check_budget(s.name, ctx.backend, rows, entry["stats"])
+    if budget is not None:
+        entry["budget"] = {"limit": budget[0], "passed": budget[1]}
+    return entry
+
+
+def cmd_compare(args):
+    rows = runner.compare(runner.load(args.baseline), runner.load(args.current),
+                          threshold=args.threshold, stat=args.stat)
+    runner.print_comparison(rows)
+    regressions = [r for r in rows if r[4] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks", description="Task store and UI benchmarks.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("generate", help="build the cached synthetic databases")
+    s.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated task counts, e.g. 1000,1e6")
+    s.add_argument("--seed", type=int, default=0)
+    s.set_defaults(func=cmd_generate)
+
+    s = sub.add_parser("run", help="run the scenarios")
+    s.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated task counts, e.g. 1000,1e6")
+    s.add_argument("--backends", default="sqlite", help="comma-separated: sqlite, memory")
+    s.add_argument("--seed", type=int, default=0)
+    s.add_argument("-k", help="only scenarios whose group/name contains this")
+    s.add_argument("--no-gui", action="store_true", help="skip the Tk scenarios")
+    s.add_argument("--min-time", type=float, default=runner.MIN_TIME, help="seconds per scenario")
+    s.add_argument("--min-rounds", type=int, default=runner.MIN_ROUNDS)
+    s.add_argument("--json", help="write results here")
+    s.set_defaults(func=cmd_run)
+
+    s = sub.add_parser("compare", help="flag regressions against a baseline result file")
+    s.add_argument("baseline")
+    s.add_argument("current")
+    s.add_argument("--threshold", type=float, default=runner.DEFAULT_THRESHOLD,
+                   help="relative slowdown that counts as a regression (default 0.10)")
+    s.add_argument("--stat", default="median", choices=["median", "min", "mean"])
+    s.set_defaults(func=cmd_compare)
+
+    s = sub.add_parser("memory", help="profile peak and retained memory against per-row budgets")
+    s.add_argument("--sizes", default="10000,100000,500000", help="comma-separated task counts, e.g. 1000,1e6")
+    s.add_argument("--backends", default="sqlite", help="comma-separated: sqlite, memory")
+    s.add_argument("--seed", type=int, default=0)
+    s.add_argument("-k", help="only scenarios whose name contains this")
+    s.add_argument("--no-gui", action="store_true", help="skip the Tk scenarios")
+    s.add_argument("--no-budgets", action="store_true", help="report only; do not fail on budget overruns")
+    s.add_argument("--json", help="write results here")
+    s.set_defaults(func=cmd_memory)
+
+    args = p.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Online backup under load: write latency seen by the app while a snapshot runs.
+
+    python benchmarks/bench_backup.py [--tasks 200000] [--pages 256] [--pause 0.01]
+
+Fills a temporary database, then takes a snapshot with backup.backup_database()
+on a worker thread while the main thread keeps adding and reading tasks the
+way the UI does. Reports the snapshot time and the latency of the foreground
+operations (against the same loop run without a backup), and checks that the snapshot is consistent (quick_check passes and
+its task count is one the live database actually had).
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+import backup  # noqa: E402
+import db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=backup.BACKUP_PAGES)
+    parser.add_argument("--pause", type=float, default=backup.BACKUP_PAUSE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "tasks.db"))
+        db.init_db()
+        db.add_tasks_bulk((None, f"task {i}", "x" * 200, None, i % 6, "bench", 0) for i in range(args.tasks))
+        size_mb = os.path.getsize(db.DB_FILENAME) / 1e6
+        counts_seen = {db.get_stats()["total"]}
+
+        def foreground_op():
+            t0 = time.perf_counter()
+            db.add_task("written during backup")
+            db.get_tasks(sort_by="id", limit=200)
+            elapsed = time.perf_counter() - t0
+            counts_seen.add(db.get_stats()["total"])
+            time.sleep(0.005)
+            return elapsed
+
+        baseline = []
+        t_end = time.perf_counter() + 1.0
+        while time.perf_counter() < t_end:
+            baseline.append(foreground_op())
+
+        done = threading.Event()
+        result = {}
+
+        def worker():
+            t0 = time.perf_counter()
+            result["path"] = backup.backup_database(os.path.join(tmp, "snapshot.db"),
+                                                    pages=args.pages, pause=args.pause)
+            result["seconds"] = time.perf_counter() - t0
+            done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+        latencies = []
+        while not done.is_set():
+            latencies.append(foreground_op())
+
+        conn = sqlite3.connect(result["path"])
+        snapshot_count = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        conn.close()
+
+    print(f"database        {size_mb:.1f} MB, {args.tasks} tasks")
+    print(f"snapshot        {result['seconds']:.2f} s  (pages={args.pages}, pause={args.pause})")
+    for label, samples in (("without backup", baseline), ("during backup", latencies)):
+        if samples:
+            samples.sort()
+            print(f"{label:<16}n={len(samples):<5} median={statistics.median(samples) * 1000:.2f} ms  "
+                  f"max={samples[-1] * 1000:.2f} ms")
+    consistent = check == "ok" and snapshot_count in counts_seen
+    print(f"snapshot        {snapshot_count} tasks, quick_check={check}, consistent={consistent}")
+    return 0 if consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
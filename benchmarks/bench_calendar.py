@@ -0,0 +1,73 @@
+"""
+Micro-benchmark for the date picker: popup open latency and month navigation.
+
+    python benchmarks/bench_calendar.py [--iterations 200]
+
+Needs a display (run under xvfb-run on headless machines).
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+from widgets import DateEntry  # noqa: E402
+
+
+def _report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<16} n={len(samples):<5} median={statistics.median(samples) * 1000:.3f} ms  "
+          f"p95={p95 * 1000:.3f} ms")
+
+
+def bench_open(root, iterations):
+    entry = DateEntry(root)
+    entry.pack()
+    root.update()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        entry._open_popup()
+        root.update_idletasks()
+        samples.append(time.perf_counter() - t0)
+        entry._popup._on_close()
+        root.update()
+    entry.destroy()
+    return samples
+
+
+def bench_navigate(root, iterations):
+    entry = DateEntry(root, initial_date=datetime.date.today())
+    entry.pack()
+    root.update()
+    entry._open_popup()
+    popup = entry._popup
+    samples = []
+    for i in range(iterations):
+        step = popup._on_next if i % 24 < 12 else popup._on_prev
+        t0 = time.perf_counter()
+        step()
+        root.update_idletasks()
+        samples.append(time.perf_counter() - t0)
+    entry.destroy()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    _report("popup open", bench_open(root, args.iterations))
+    _report("month nav", bench_navigate(root, args.iterations))
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Description compression: database size and read latency before and after.
+
+    python benchmarks/bench_compression.py [--tasks 20000] [--large 0.2] [--kb 8]
+
+Builds a temporary database where a fraction of the tasks carry multi-KB
+pasted logs (written uncompressed, as an older version would have), measures
+the file size and the common read paths, then runs the
+db.compress_descriptions() migration plus VACUUM and measures again.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+import bulk_io  # noqa: E402
+import db  # noqa: E402
+from store import SqliteTaskStore  # noqa: E402
+
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+
+def log_paste(rng, kb):
+    lines = []
+    size = 0
+    while size < kb * 1024:
+        line = (f"2026-03-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:"
+                f"{rng.randint(0, 59):02d} {rng.choice(LEVELS):<5} worker-{rng.randint(1, 8)} "
+                f"request {rng.getrandbits(32):08x} took {rng.randint(1, 900)}ms status={rng.choice([200, 200, 404, 500])}")
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def _time(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def measure(ids):
+    store = SqliteTaskStore(db.DB_FILENAME)
+    cases = [
+        ("get_tasks page 200", lambda: db.get_tasks(sort_by="default", limit=200), 20),
+        ("get_tasks all", lambda: db.get_tasks(show_completed=True), 3),
+        ("get_task x500", lambda: [db.get_task(i) for i in ids[:500]], 1),
+        ("search", lambda: db.search_tasks("status=500 took 17", limit=50), 3),
+        ("export jsonl", lambda: bulk_io.export_tasks("jsonl", io.StringIO(), store), 1),
+    ]
+    out = {"file size (MB)": os.path.getsize(db.DB_FILENAME) / 1e6}
+    try:
+        for label, fn, repeat in cases:
+            out[label + " (ms)"] = _time(fn, repeat) * 1000
+    finally:
+        store.close()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--large", type=float, default=0.2, help="fraction of tasks with a pasted log")
+    parser.add_argument("--kb", type=int, default=8, help="size of each pasted log")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "tasks.db"))
+        db.init_db()
+        min_size, db.DESCRIPTION_COMPRESS_MIN = db.DESCRIPTION_COMPRESS_MIN, 0  # store everything as text
+        db.add_tasks_bulk(
+            (None, f"task {i}", log_paste(rng, args.kb) if rng.random() < args.large else f"note {i}",
+             None, i % 6, "bench", 0)
+            for i in range(args.tasks)
+        )
+        db.DESCRIPTION_COMPRESS_MIN = min_size
+        ids = [r[0] for r in db.get_tasks(show_completed=True, sort_by="id")]
+        before = measure(ids)
+
+        t0 = time.perf_counter()
+        changed = db.compress_descriptions()
+        migrate = time.perf_counter() - t0
+        conn = db.db_get_connection()
+        conn.execute("VACUUM")
+        conn.close()
+        after = measure(ids)
+
+    print(f"{args.tasks} tasks, {changed} descriptions compressed in {migrate:.2f}s\n")
+    print(f"{'':<24}{'before':>12}{'after':>12}")
+    for label in before:
+        print(f"{label:<24}{before[label]:>12.2f}{after[label]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Google Calendar sync throughput against the local fake API, per fault profile.
+
+    python benchmarks/bench_gcal_sync.py [--tasks 300] [--profiles clean,flaky] [--modes single,batch]
+
+For each fault profile in fake_gcal.PROFILES, starts a fake_gcal server,
+points google_sync at it (as FLOPPY_ZWANG_GCAL_URL does) and pushes a fresh
+set of generated tasks twice: the first pass inserts the events, the second
+patches them. "single" is one push_task_to_google() call per task (the UI
+path); "batch" is push_tasks_to_google(). Reports tasks synced per second,
+failures left after retries, and what the server answered. Needs
+google-api-python-client.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+import fake_gcal  # noqa: E402
+import generator  # noqa: E402
+import google_sync  # noqa: E402
+from store import MemoryTaskStore  # noqa: E402
+
+
+def sync_single(tasks, store, service):
+    results = []
+    for task in tasks:
+        try:
+            results.append((task[0], google_sync.push_task_to_google(task, store, service)))
+        except Exception as e:
+            results.append((task[0], e))
+    return results
+
+
+def sync_batch(tasks, store, service):
+    return google_sync.push_tasks_to_google(tasks, store, service)
+
+
+MODES = {"single": sync_single, "batch": sync_batch}
+
+
+def run(profile, mode, n, seed):
+    server = fake_gcal.start_server(profile=profile, seed=seed)
+    google_sync.GCAL_URL = server.url
+    try:
+        store = MemoryTaskStore()
+        store.add_tasks_bulk(generator.generate_rows(n, seed))
+        tasks = store.get_tasks(show_completed=True)
+        service = google_sync.google_get_service()
+        passes = []
+        for name in ("insert", "patch"):
+            t0 = time.perf_counter()
+            results = MODES[mode](tasks, store, service)
+            elapsed = time.perf_counter() - t0
+            ok = 0
+            for tid, result in results:
+                if isinstance(result, str):
+                    store.map_task_to_gc(tid, result)
+                    ok += 1
+            passes.append((name, ok, elapsed))
+        return passes, dict(server.calendar.stats), len(server.calendar.events())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--profiles", default=",".join(fake_gcal.PROFILES))
+    parser.add_argument("--modes", default="single,batch")
+    parser.add_argument("--retries", type=int, default=google_sync.SYNC_RETRIES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        import googleapiclient  # noqa: F401
+    except ImportError:
+        sys.exit("google-api-python-client is not installed")
+    google_sync.SYNC_RETRIES = args.retries
+
+    print(f"{'profile':<11}{'mode':<8}{'pass':<8}{'synced':>8}{'failed':>8}{'seconds':>10}{'tasks/s':>10}"
+          f"{'events':>8}  server answers")
+    for profile in args.profiles.split(","):
+        for mode in args.modes.split(","):
+            passes, stats, events = run(profile, mode, args.tasks, args.seed)
+            answers = ", ".join(f"{k}: {v}" for k, v in sorted(stats.items(), key=lambda kv: str(kv[0])))
+            for name, ok, elapsed in passes:
+                print(f"{profile:<11}{mode:<8}{name:<8}{ok:>8}{args.tasks - ok:>8}{elapsed:>10.2f}"
+                      f"{ok / elapsed:>10.1f}{events:>8}  {answers if name == 'patch' else ''}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup time of the headless CLI versus the GUI import path.
+
+    python benchmarks/bench_startup.py [--runs 20]
+
+Each sample is a fresh interpreter. The CLI is timed end to end running
+`list --limit 0` against an empty temporary database; the GUI path is timed
+up to (and including, when a display is available) creating the Tk window.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PKG = os.path.join(ROOT, "floppy_zwang")
+
+GUI_SNIPPET = f"""
+import os, sys
+sys.path.insert(0, {PKG!r})
+import db
+db.init_db()
+try:
+    from ttkbootstrap import Window
+except ImportError:
+    from tkinter import Tk as Window
+import ui
+if os.environ.get("DISPLAY"):
+    Window().destroy()
+"""
+
+
+def _time(cmd, env, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _report(name, samples):
+    print(f"{name:<8} n={len(samples):<4} median={statistics.median(samples) * 1000:.1f} ms  "
+          f"min={min(samples) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FLOPPY_ZWANG_DB=os.path.join(tmp, "tasks.db"))
+        cli = _time([sys.executable, "-m", "floppy_zwang", "list", "--limit", "0"], env, args.runs)
+        try:
+            gui = _time([sys.executable, "-c", GUI_SNIPPET], env, args.runs)
+        except subprocess.CalledProcessError:
+            gui = None
+    _report("cli", cli)
+    if gui:
+        _report("gui", gui)
+        print(f"cli is {statistics.median(gui) / statistics.median(cli):.1f}x faster to start")
+    else:
+        print("gui     could not be started (missing GUI dependencies?)")
+
+
+if __name__ == "__main__":
+    main()
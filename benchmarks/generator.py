@@ -0,0 +1,201 @@
+"""
+Seeded synthetic task stores, 1k to 1M tasks.
+
+The same (tasks, seed, anchor) always yields the same rows. Distributions
+follow what real task lists look like rather than uniform noise:
+
+- priority: mostly 0-2, few 4-5;
+- tags: a Zipf-like vocabulary, so a handful of tags ("work", "home") cover
+  most tasks and a long tail is rare; 0-3 tags per task;
+- due dates: a quarter undated, the rest clustered in the next two weeks
+  with an overdue band and a long tail up to a year out;
+- completion: likelier for tasks due in the past;
+- descriptions: mostly empty or a line or two, a few paragraphs, and about
+  1% multi-KB pasted logs;
+- structure: ~2% subtasks under earlier tasks and ~0.5% repeating tasks.
+
+Generated SQLite databases are cached in CACHE_DIR (per size, seed and
+anchor) since a 1M-task store takes a while to build.
+"""
+import datetime
+import os
+import random
+import shutil
+
+import db
+from recurrence import PRESETS
+from store import MemoryTaskStore, SqliteTaskStore
+
+# Bump when the distributions change, so cached databases are rebuilt.
+GENERATOR_VERSION = 1
+CACHE_DIR = os.environ.get("FLOPPY_ZWANG_BENCH_CACHE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache")
+# A fixed anchor keeps results comparable across days; pass anchor=today for "live" dates.
+DEFAULT_ANCHOR = datetime.date(2026, 1, 5)
+
+PRIORITY_WEIGHTS = [30, 25, 20, 12, 8, 5]  # priorities 0..5
+HEAD_TAGS = ["work", "home", "errands", "urgent", "reading", "health", "finance", "family",
+             "Work-Admin", "someday", "waiting", "calls"]
+TAG_VOCABULARY = HEAD_TAGS + [f"project-{i}" for i in range(200)]
+TAG_COUNT_WEIGHTS = [30, 45, 18, 7]  # tasks with 0..3 tags
+VERBS = ["Fix", "Review", "Write", "Call", "Email", "Plan", "Buy", "Update", "Check", "Prepare",
+         "Book", "Clean", "Read", "Refactor", "Pay", "Schedule", "Draft", "Test"]
+OBJECTS = ["report", "invoice", "slides", "dentist", "landlord", "budget", "release notes",
+           "groceries", "flight", "car service", "backup script", "tax return", "newsletter",
+           "garden", "onboarding doc", "birthday gift", "kitchen tap", "login bug", "API docs"]
+WORDS = ("the a to and of for with on in is this that it be need check before after "
+         "meeting notes follow up ask about send list items review budget draft").split()
+LOG_LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+SUBTASK_RATE = 0.02
+RECURRING_RATE = 0.005
+
+
+def _tag_weights():
+    # Zipf-ish: weight 1/rank over the whole vocabulary.
+    return [1.0 / rank for rank in range(1, len(TAG_VOCABULARY) + 1)]
+
+
+def _title(rng, i):
+    return f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} #{i}"
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _log_paste(rng, kb):
+    lines, size = [], 0
+    while size < kb * 1024:
+        line = (f"2026-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:"
+                f"{rng.randint(0, 59):02d} {rng.choice(LOG_LEVELS):<5} worker-{rng.randint(1, 8)} "
+                f"req={rng.getrandbits(32):08x} {rng.randint(1, 900)}ms status={rng.choice([200, 200, 404, 500])}")
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def _description(rng):
+    x = rng.random()
+    if x < 0.45:
+        return ""
+    if x < 0.85:
+        return _sentence(rng, rng.randint(4, 20))
+    if x < 0.99:
+        return "\n\n".join(_sentence(rng, rng.randint(15, 60)) for _ in range(rng.randint(2, 6)))
+    return _log_paste(rng, rng.choice([2, 4, 8, 16, 32]))
+
+
+def _due(rng, anchor):
+    x = rng.random()
+    if x < 0.25:
+        return None
+    if x < 0.40:
+        offset = -int(rng.expovariate(1 / 20)) - 1   # overdue, mostly recently
+    elif x < 0.80:
+        offset = rng.randint(0, 14)                  # the next two weeks
+    else:
+        offset = rng.randint(15, 365)                # long tail
+    return (anchor + datetime.timedelta(days=offset)).isoformat()
+
+
+def generate_rows(n, seed=0, anchor=DEFAULT_ANCHOR):
+    """Yield n task rows (None, title, description, due_date, priority, tags, completed)."""
+    rng = random.Random(seed)
+    tag_weights = _tag_weights()
+    anchor_iso = anchor.isoformat()
+    for i in range(n):
+        due = _due(rng, anchor)
+        k = rng.choices(range(4), TAG_COUNT_WEIGHTS)[0]
+        tags = ",".join(dict.fromkeys(rng.choices(TAG_VOCABULARY, tag_weights, k=k)))
+        done_rate = 0.6 if due and due < anchor_iso else 0.15
+        yield (None, _title(rng, i), _description(rng), due,
+               rng.choices(range(6), PRIORITY_WEIGHTS)[0], tags, int(rng.random() < done_rate))
+
+
+def generate_structure(n, seed=0):
+    """
+    Subtask and recurrence assignments for a store filled from generate_rows()
+    with ids 1..n: ([(task_id, parent_id)], [(task_id, rule)]). Recurring
+    tasks need a due date, so callers skip undated ones.
+    """
+    rng = random.Random(seed + 1)
+    parents, rules = [], []
+    for tid in range(2, n + 1):
+        if rng.random() < SUBTASK_RATE:
+            # Parents come from earlier tasks, skewed towards recent ones.
+            parents.append((tid, max(1, tid - 1 - int(rng.expovariate(1 / 50)))))
+        elif rng.random() < RECURRING_RATE:
+            rules.append((tid, rng.choice(list(PRESETS.values()))))
+    return parents, rules
+
+
+def populate(store, n, seed=0, anchor=DEFAULT_ANCHOR, progress=None):
+    """Fill an empty, initialised store with the generated rows and structure."""
+    store.add_tasks_bulk(generate_rows(n, seed, anchor), batch_size=10000, progress=progress)
+    parents, rules = generate_structure(n, seed)
+    if isinstance(store, SqliteTaskStore):
+        # One transaction instead of a round trip per task; parents always
+        # precede their children, so no cycle checks are needed.
+        conn = store.db.connect()
+        try:
+            conn.executemany("UPDATE tasks SET parent_id = ? WHERE id = ?", [(p, t) for t, p in parents])
+            conn.executemany("UPDATE tasks SET recurrence = ? WHERE id = ? AND due_date IS NOT NULL",
+                             [(r, t) for t, r in rules])
+            conn.commit()
+        finally:
+            conn.close()
+        store.due_counts.invalidate()
+        return store
+    for tid, parent in parents:
+        store.set_parent(tid, parent)
+    for tid, rule in rules:
+        if store.get_task(tid)[3]:
+            store.set_recurrence(tid, rule)
+    return store
+
+
+def cached_database(n, seed=0, anchor=DEFAULT_ANCHOR, cache_dir=None, progress=None):
+    """Path to a generated SQLite database, building it on first use. Treat it as read-only."""
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"tasks-v{GENERATOR_VERSION}-{n}-s{seed}-{anchor.isoformat()}.db")
+    if not os.path.exists(path):
+        tmp = path + ".partial"
+        for stale in (tmp, tmp + "-wal", tmp + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        store = SqliteTaskStore(tmp)
+        store.init()
+        try:
+            populate(store, n, seed, anchor, progress)
+            conn = db.db_get_connection()
+            try:
+                conn.execute("ANALYZE")
+                # A single self-contained file, so plain file copies are complete.
+                conn.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                conn.close()
+        finally:
+            store.close()
+        os.replace(tmp, path)
+    return path
+
+
+def make_store(backend, n, seed=0, anchor=DEFAULT_ANCHOR, workdir=None, progress=None):
+    """
+    A populated store: "sqlite" works on a private copy of the cached database
+    in workdir, "memory" is a MemoryTaskStore filled in place.
+    """
+    if backend == "memory":
+        store = MemoryTaskStore()
+        store.init()
+        return populate(store, n, seed, anchor, progress)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown backend {backend!r}")
+    source = cached_database(n, seed, anchor, progress=progress)
+    path = os.path.join(workdir, os.path.basename(source))
+    shutil.copyfile(source, path)
+    store = SqliteTaskStore(path)
+    store.init()
+    return store
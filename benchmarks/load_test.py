@@ -0,0 +1,136 @@
+"""
+Load test for the HTTP/JSON API: reports requests/s and latency percentiles.
+
+    python benchmarks/load_test.py [--url http://127.0.0.1:8765] [--clients 16]
+                                   [--duration 10] [--write-ratio 0.1] [--seed-tasks 10000]
+
+Without --url an in-process server is started on a temporary database seeded
+with --seed-tasks tasks. Readers page through /tasks (half of them revalidating
+with If-None-Match); writers add tasks and toggle completion. Before the load
+starts, check_bad_requests() makes sure invalid input is answered with 400
+and not stored; the exit status is non-zero if it is not.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+
+def _request(url, method="GET", body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, resp.headers.get("ETag"), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), e.read()
+
+
+def _client(base, deadline, write_ratio, rng, latencies, errors):
+    etag = None
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        if rng.random() < write_ratio:
+            if rng.random() < 0.5:
+                status, _, _ = _request(f"{base}/tasks", "POST", {"title": f"load {rng.random()}", "priority": 2})
+            else:
+                status, _, _ = _request(f"{base}/tasks/done", "POST",
+                                        {"ids": [rng.randint(1, 1000)], "completed": rng.random() < 0.5})
+        else:
+            headers = {"If-None-Match": etag} if etag and rng.random() < 0.5 else {}
+            status, etag, _ = _request(f"{base}/tasks?limit=50&offset={rng.randint(0, 20) * 50}", headers=headers)
+        latencies.append(time.perf_counter() - t0)
+        if status >= 400:
+            errors.append(status)
+
+
+def check_bad_requests(base):
+    """Send invalid writes; returns a list of failures (empty when all get a 400 and change nothing)."""
+    failures = []
+    _, _, before = _request(f"{base}/tasks/1")
+    cases = [
+        ("PUT", f"{base}/tasks/1", {"due_date": "notadate"}),
+        ("PUT", f"{base}/tasks/1", {"due_date": 20260101}),
+        ("POST", f"{base}/tasks", {"title": "bad due", "due_date": "2026-02-30"}),
+        ("POST", f"{base}/tasks", [{"title": "ok", "due_date": "2026-01-01"}, {"title": "bad", "due_date": "soon"}]),
+        ("PUT", f"{base}/tasks/1", {"title": ""}),
+    ]
+    for method, url, body in cases:
+        status, _, payload = _request(url, method, body)
+        if status != 400:
+            failures.append(f"{method} {url} {body!r}: expected 400, got {status} {payload[:200]!r}")
+    _, _, after = _request(f"{base}/tasks/1")
+    if after != before:
+        failures.append(f"task 1 changed by rejected requests: {before!r} -> {after!r}")
+    return failures
+
+
+def _start_local_server(tmp, seed_tasks):
+    import db
+    import server
+
+    db.DB_FILENAME = os.path.join(tmp, "tasks.db")
+    db.init_db()
+    db.add_tasks_bulk((None, f"task {i}", "", f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}", i % 6, "load", 0)
+                      for i in range(seed_tasks))
+    srv = server.make_server("127.0.0.1", 0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--seed-tasks", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        srv = None
+        base = args.url
+        if not base:
+            srv, base = _start_local_server(tmp, args.seed_tasks)
+
+        failures = check_bad_requests(base)
+        for failure in failures:
+            print(f"FAILED {failure}")
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=_client,
+                             args=(base, deadline, args.write_ratio, random.Random(i), latencies, errors))
+            for i in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if srv:
+            srv.shutdown()
+            srv.server_close()
+
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda p: latencies[min(n - 1, int(n * p))] * 1000  # noqa: E731
+    print(f"requests   {n} in {elapsed:.1f}s with {args.clients} clients ({len(errors)} errors)")
+    print(f"throughput {n / elapsed:.0f} req/s")
+    print(f"latency    p50={pct(0.50):.2f} ms  p95={pct(0.95):.2f} ms  p99={pct(0.99):.2f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
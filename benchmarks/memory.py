@@ -0,0 +1,281 @@
+"""
+Memory profiling of the large-store paths, with per-row budgets for CI.
+
+Each memory scenario runs once per (backend, size) under tracemalloc while a
+sampler thread polls the process RSS. For a scenario over `rows` rows:
+
+    peak      tracemalloc peak above the starting point while the call runs
+    held      Python memory still allocated while its result is alive
+    retained  Python memory still allocated after the result is dropped and
+              collected (caches, leaks)
+    rss_peak  highest RSS seen during the call, above the starting RSS; this
+              also counts memory tracemalloc cannot see, such as Tcl's
+              Treeview items and SQLite's page cache
+    rss_kept  RSS after the result is dropped, above the starting RSS
+
+BUDGETS caps the tracemalloc peak (which is repeatable, unlike RSS) of each
+scenario at fixed + per_row * rows bytes, so streaming paths are held flat
+and list-building paths linear. Budgets are checked for the sqlite backend,
+the one the app ships with; the memory backend is reported only.
+`python -m benchmarks memory` exits 1 when a budget is exceeded.
+"""
+import gc
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+RSS_INTERVAL = 0.005
+# Pushes through the fake Calendar API are network bound; sync profiles this many tasks.
+SYNC_ROWS = 2000
+MB = 1024 * 1024
+
+# scenario -> (bytes per row, fixed bytes) for the tracemalloc peak, about 1.5x
+# the peaks measured at 10k-500k tasks. sync[push] is flat: the client's cyclic
+# garbage until the collector runs. load_tasks needs a display and is an
+# estimate until measured on one.
+BUDGETS = {
+    "get_tasks[sort=due_date]": (650, 1 * MB),
+    "get_tasks[sort=default]": (650, 1 * MB),
+    "get_tasks[page]": (0, 1 * MB),
+    "iter_tasks": (0, 2 * MB),
+    "export[csv]": (0, 2 * MB),
+    "export[jsonl]": (0, 2 * MB),
+    "export[ics]": (0, 2 * MB),
+    "sync[event_bodies]": (2100, 1 * MB),
+    "sync[push]": (0, 32 * MB),
+    "load_tasks": (2000, 8 * MB),
+}
+
+
+def _page_size():
+    try:
+        return os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return 4096
+
+
+_PAGE = _page_size()
+
+
+def rss():
+    """Resident set size in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RssSampler:
+    """Polls rss() on a thread; .peak is the highest value seen."""
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.peak = rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        value = rss()
+        if value is not None and (self.peak is None or value > self.peak):
+            self.peak = value
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+def profile(fn):
+    """Run fn() once and return the memory figures (bytes) described above."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        rss_base = rss()
+        t0 = time.perf_counter()
+        with RssSampler() as sampler:
+            result = fn()
+        seconds = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()  # cyclic garbage made by the call is not "held"
+        held, _ = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        rss_after = rss()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return {
+        "peak": peak - base,
+        "held": held - base,
+        "retained": retained - base,
+        "rss_peak": None if rss_base is None else sampler.peak - rss_base,
+        "rss_kept": None if rss_base is None else rss_after - rss_base,
+        "seconds": seconds,
+    }
+
+
+class MemoryScenario:
+    def __init__(self, name, fn, gui=False):
+        self.name = name
+        self.fn = fn
+        self.gui = gui
+
+
+MEMORY_SCENARIOS = []
+
+
+def memory_scenario(name, gui=False):
+    """Register fn(ctx) -> (callable, rows) or a skip reason string."""
+    def register(fn):
+        MEMORY_SCENARIOS.append(MemoryScenario(name, fn, gui))
+        return fn
+    return register
+
+
+def check_budget(name, backend, rows, stats):
+    """None when there is no budget to check, else (limit in bytes, passed)."""
+    budget = BUDGETS.get(name)
+    if budget is None or backend != "sqlite":
+        return None
+    per_row, fixed = budget
+    limit = fixed + per_row * rows
+    return limit, stats["peak"] <= limit
+
+
+# --- scenarios ---
+
+@memory_scenario("get_tasks[sort=due_date]")
+def get_tasks_due(ctx):
+    return (lambda: ctx.store.get_tasks(show_completed=True, sort_by="due_date", top_level_only=True)), ctx.tasks
+
+
+@memory_scenario("get_tasks[sort=default]")
+def get_tasks_default(ctx):
+    return (lambda: ctx.store.get_tasks(show_completed=True, sort_by="default", top_level_only=True)), ctx.tasks
+
+
+@memory_scenario("get_tasks[page]")
+def get_tasks_page(ctx):
+    return (lambda: ctx.store.get_tasks(show_completed=True, limit=200)), ctx.tasks
+
+
+@memory_scenario("iter_tasks")
+def iter_tasks(ctx):
+    def run():
+        n = 0
+        for _ in ctx.store.iter_tasks(show_completed=True):
+            n += 1
+        return n
+    return run, ctx.tasks
+
+
+def _register_exports():
+    for fmt in ("csv", "jsonl", "ics"):
+        @memory_scenario(f"export[{fmt}]")
+        def export(ctx, fmt=fmt):
+            import bulk_io
+
+            def run():
+                with open(os.devnull, "w", encoding="utf-8", newline="") as f:
+                    return bulk_io.export_tasks(fmt, f, ctx.store)
+            return run, ctx.tasks
+
+
+_register_exports()
+
+
+@memory_scenario("sync[event_bodies]")
+def sync_bodies(ctx):
+    from google_sync import task_to_event_body
+
+    def run():
+        rows = ctx.store.get_tasks(show_completed=True, sort_by="id")
+        rules = ctx.store.get_recurrences(include_completed=True)
+        return [task_to_event_body(r, rules.get(r[0], (None,))[0]) for r in rows]
+    return run, ctx.tasks
+
+
+def _fake_gcal_process():
+    """A fake_gcal server in a child process, so its stored events stay out of the measurement."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    proc = subprocess.Popen([sys.executable, "-m", "floppy_zwang", "--db", ":memory:", "fake-gcal", "--port", str(port)],
+                            cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}/"
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("fake-gcal did not start")
+            time.sleep(0.05)
+
+
+@memory_scenario("sync[push]")
+def sync_push(ctx):
+    try:
+        import googleapiclient  # noqa: F401
+    except ImportError:
+        return "google-api-python-client not installed"
+    import google_sync
+
+    proc, url = _fake_gcal_process()
+    ctx.cleanup.append(proc.terminate)
+    google_sync.GCAL_URL = url
+    service = google_sync.google_get_service()
+    rows = ctx.store.get_tasks(show_completed=True, sort_by="id", limit=SYNC_ROWS)
+    return (lambda: google_sync.push_tasks_to_google(rows, ctx.store, service)), len(rows)
+
+
+@memory_scenario("load_tasks", gui=True)
+def load_tasks(ctx):
+    app = ctx.gui()
+
+    def run():
+        app.load_tasks()
+        app.root.update_idletasks()
+    return run, ctx.tasks
+
+
+# --- output ---
+
+def _mb(value):
+    return "-" if value is None else f"{value / MB:.1f}"
+
+
+def print_table(entries, out=None):
+    print(f"{'scenario':<44}{'rows':>9}{'peak MB':>9}{'B/row':>8}{'held MB':>9}{'kept MB':>9}"
+          f"{'rss MB':>8}{'rss kept':>9}{'budget MB':>10}  status", file=out)
+    for e in entries:
+        if e.get("skipped"):
+            print(f"{e['fullname']:<44}  skipped: {e['skipped']}", file=out)
+            continue
+        s = e["stats"]
+        budget = e.get("budget")
+        status = "-" if budget is None else ("ok" if budget["passed"] else "OVER BUDGET")
+        print(f"{e['fullname']:<44}{e['rows']:>9}{_mb(s['peak']):>9}{s['peak'] / max(e['rows'], 1):>8.0f}"
+              f"{_mb(s['held']):>9}{_mb(s['retained']):>9}{_mb(s['rss_peak']):>8}{_mb(s['rss_kept']):>9}"
+              f"{_mb(None if budget is None else budget['limit']):>10}  {status}", file=out)
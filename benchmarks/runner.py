@@ -0,0 +1,154 @@
+"""
+Timing, result files and baseline comparison.
+
+Timing follows pytest-benchmark: one warm-up call, then rounds of one call
+each until MIN_TIME has elapsed (at least MIN_ROUNDS, at most MAX_ROUNDS),
+reporting min/max/mean/stddev/median/IQR/ops per scenario. Result files are
+JSON in the same spirit ({"machine_info", "commit_info", "benchmarks": [...]})
+so they can be kept next to a git revision and compared later.
+"""
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+
+MIN_TIME = 0.5
+MIN_ROUNDS = 5
+MAX_ROUNDS = 1000
+# compare() flags a scenario whose median grew by more than this fraction.
+DEFAULT_THRESHOLD = 0.10
+
+
+def measure(fn, min_time=MIN_TIME, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+    """Time fn() repeatedly and return its stats dict (seconds)."""
+    fn()  # warm-up: caches, lazy imports, first-page faults
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_rounds and (len(samples) < min_rounds or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _stats(samples)
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    q1, _, q3 = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else (ordered[0],) * 3
+    mean = statistics.fmean(ordered)
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": mean,
+        "stddev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "median": statistics.median(ordered),
+        "iqr": q3 - q1,
+        "ops": 1.0 / mean if mean else 0.0,
+        "rounds": len(ordered),
+        "total": sum(ordered),
+    }
+
+
+def machine_info():
+    return {
+        "node": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "sqlite_version": sqlite3.sqlite_version,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def commit_info():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+    def git(*args):
+        try:
+            out = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return out.stdout.strip() if out.returncode == 0 else None
+
+    return {
+        "id": git("rev-parse", "HEAD"),
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def result_document(benchmarks, params):
+    return {
+        "machine_info": machine_info(),
+        "commit_info": commit_info(),
+        "datetime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "params": params,
+        "benchmarks": benchmarks,
+    }
+
+
+def save(doc, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+        f.write("\n")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_table(benchmarks, out=None):
+    print(f"{'scenario':<56}{'median ms':>12}{'min ms':>12}{'iqr ms':>10}{'rounds':>8}", file=out)
+    for b in benchmarks:
+        if b.get("skipped"):
+            print(f"{b['fullname']:<56}{'skipped: ' + b['skipped']:>42}", file=out)
+            continue
+        s = b["stats"]
+        print(f"{b['fullname']:<56}{s['median'] * 1000:>12.3f}{s['min'] * 1000:>12.3f}"
+              f"{s['iqr'] * 1000:>10.3f}{s['rounds']:>8}", file=out)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, stat="median"):
+    """
+    Match scenarios by fullname and return rows (fullname, old, new, change,
+    status) where status is "regression", "improvement", "ok", "new" or
+    "missing". change is new/old - 1 for the given stat.
+    """
+    old = {b["fullname"]: b for b in baseline["benchmarks"] if not b.get("skipped")}
+    new = {b["fullname"]: b for b in current["benchmarks"] if not b.get("skipped")}
+    rows = []
+    for name in sorted(old.keys() | new.keys()):
+        if name not in new:
+            rows.append((name, old[name]["stats"][stat], None, None, "missing"))
+            continue
+        if name not in old:
+            rows.append((name, None, new[name]["stats"][stat], None, "new"))
+            continue
+        a, b = old[name]["stats"][stat], new[name]["stats"][stat]
+        change = b / a - 1 if a else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, a, b, change, status))
+    return rows
+
+
+def print_comparison(rows, out=None):
+    def ms(v):
+        return "-" if v is None else f"{v * 1000:.3f}"
+
+    print(f"{'scenario':<56}{'baseline ms':>13}{'current ms':>13}{'change':>9}  status", file=out)
+    for name, a, b, change, status in rows:
+        pct = "" if change is None else f"{change:+.1%}"
+        flag = status.upper() if status == "regression" else status
+        print(f"{name:<56}{ms(a):>13}{ms(b):>13}{pct:>9}  {flag}", file=out)
@@ -0,0 +1,207 @@
+"""
+Benchmark scenarios for the hot paths, registered with @scenario.
+
+A scenario function takes a Context and returns the zero-argument callable to
+time; anything before the return is setup and is not timed. GUI scenarios
+drive a real TaskerApp and need a display: an existing $DISPLAY, or an Xvfb
+server started for the run when Xvfb is installed. Otherwise they are
+reported as skipped.
+"""
+import os
+import shutil
+import subprocess
+import time
+
+SORT_MODES = ("due_date", "priority", "title", "id", "default")
+PAGE = 200
+
+
+class Scenario:
+    def __init__(self, name, group, fn, gui=False):
+        self.name = name
+        self.group = group
+        self.fn = fn
+        self.gui = gui
+
+
+SCENARIOS = []
+
+
+def scenario(name, group, gui=False):
+    def register(fn):
+        SCENARIOS.append(Scenario(name, group, fn, gui))
+        return fn
+    return register
+
+
+class Context:
+    """The populated store for one (backend, size) pair, plus a lazily built app."""
+
+    def __init__(self, store, backend, tasks):
+        self.store = store
+        self.backend = backend
+        self.tasks = tasks
+        self._root = None
+        self.app = None
+        self.cleanup = []   # callables run by close(), e.g. servers a scenario started
+
+    def gui(self):
+        if self.app is None:
+            import tkinter as tk
+
+            import ui
+
+            self._root = tk.Tk()
+            self.app = ui.TaskerApp(self._root, self.store)
+            # No archive/backup passes, reminder thread or lag heartbeat while timing.
+            self.app.reminders.stop()
+            self.app.lag.stop()
+            for job in self._root.tk.splitlist(self._root.tk.call("after", "info")):
+                self._root.after_cancel(job)
+            self._root.update()
+        return self.app
+
+    def close(self):
+        while self.cleanup:
+            self.cleanup.pop()()
+        if self._root is not None:
+            self._root.destroy()
+            self._root = self.app = None
+
+
+# --- display for GUI scenarios ---
+
+def start_display():
+    """
+    Make sure Tk can open a window. Returns (xvfb_process or None, None) when a
+    display is available, or (None, reason) when GUI scenarios must be skipped.
+    """
+    try:
+        import tkinter  # noqa: F401
+    except ImportError:
+        return None, "tkinter not available"
+    if os.environ.get("DISPLAY"):
+        return None, None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        return None, "no display and Xvfb not installed"
+    display = f":{90 + os.getpid() % 100}"
+    proc = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    if proc.poll() is not None:
+        return None, "Xvfb failed to start"
+    os.environ["DISPLAY"] = display
+    return proc, None
+
+
+def stop_display(proc):
+    if proc is not None:
+        proc.terminate()
+        proc.wait(5)
+        os.environ.pop("DISPLAY", None)
+
+
+# --- store queries ---
+
+def _register_sorts():
+    for sort_by in SORT_MODES:
+        # The main list: top-level tasks including completed ones, as the UI fetches it.
+        @scenario(f"get_tasks[sort={sort_by}]", "get_tasks")
+        def full(ctx, sort_by=sort_by):
+            return lambda: ctx.store.get_tasks(show_completed=True, sort_by=sort_by, top_level_only=True)
+
+        @scenario(f"get_tasks[sort={sort_by},page]", "get_tasks")
+        def page(ctx, sort_by=sort_by):
+            return lambda: ctx.store.get_tasks(sort_by=sort_by, limit=PAGE)
+
+
+_register_sorts()
+
+
+@scenario("get_tasks[tag=work]", "tag_filter")
+def tag_common(ctx):
+    # Substring match, so this also picks up "Work-Admin".
+    return lambda: ctx.store.get_tasks(filter_tag="work", show_completed=True)
+
+
+@scenario("get_tasks[tag=project-150]", "tag_filter")
+def tag_rare(ctx):
+    return lambda: ctx.store.get_tasks(filter_tag="project-150", show_completed=True)
+
+
+@scenario("get_tasks[tag=work,open]", "tag_filter")
+def tag_open(ctx):
+    return lambda: ctx.store.get_tasks(filter_tag="work", sort_by="priority")
+
+
+@scenario("search_tasks[page]", "search")
+def search(ctx):
+    return lambda: ctx.store.search_tasks("invoice", limit=PAGE)
+
+
+@scenario("fuzzy_search_titles[typo]", "search")
+def fuzzy_search(ctx):
+    return lambda: ctx.store.fuzzy_search_titles("refactr bakup scrpt")
+
+
+@scenario("changes_since[1000]", "changes")
+def changes_page(ctx):
+    since = max(ctx.store.latest_change_seq() - 1000, 0)
+    return lambda: ctx.store.changes_since(since, limit=1000)
+
+
+@scenario("get_stats", "stats")
+def stats(ctx):
+    return ctx.store.get_stats
+
+
+@scenario("task_to_event_body[x1000]", "sync")
+def event_bodies(ctx):
+    from google_sync import task_to_event_body
+
+    rows = ctx.store.get_tasks(show_completed=True, sort_by="id", limit=1000)
+    return lambda: [task_to_event_body(r) for r in rows]
+
+
+# --- UI ---
+
+@scenario("load_tasks", "ui", gui=True)
+def load_tasks(ctx):
+    app = ctx.gui()
+
+    def run():
+        app.load_tasks()
+        app.root.update_idletasks()
+    return run
+
+
+@scenario("load_tasks[tag=work]", "ui", gui=True)
+def load_tasks_tag(ctx):
+    app = ctx.gui()
+
+    def run():
+        app.filter_tag_var.set("work")
+        try:
+            app.load_tasks()
+            app.root.update_idletasks()
+        finally:
+            app.filter_tag_var.set("")
+    return run
+
+
+def _register_column_sorts():
+    for col in ("title", "due", "priority"):
+        @scenario(f"sort_by_column[{col}]", "ui", gui=True)
+        def sort_column(ctx, col=col):
+            app = ctx.gui()
+            app.filter_tag_var.set("")
+            app.load_tasks()
+
+            def run():
+                app.sort_by_column(col)
+                app.root.update_idletasks()
+            return run
+
+
+_register_column_sorts()
@@ -0,0 +1,411 @@
+"""
+Conformance and benchmark suite for the TaskStore backends.
+
+    python benchmarks/store_suite.py [--backends sqlite,sqlite-memory,memory] [--tasks 20000]
+
+The conformance pass replays one seeded workload against every backend and
+compares each query result with the first backend's, then runs the
+behaviour checks (check_*) on each backend; the exit status is non-zero on
+any difference or failed check. The benchmark pass then times common operations
+on --tasks rows per backend.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+import bulk_io  # noqa: E402
+import db  # noqa: E402
+from reminders import ReminderScheduler  # noqa: E402
+from store import MemoryTaskStore, SqliteTaskStore  # noqa: E402
+from tagindex import TagIndex  # noqa: E402
+
+# Every 12 months from February, so the 30th never exists.
+EMPTY_RULE = "FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=30"
+TAGS = ["work", "home", "errands", "urgent", "reading", "health", "Work-Admin", ""]
+
+# Row fields each sort mode orders by; ties may come back in any order.
+SORT_FIELDS = {
+    "priority": lambda r: (-(r[4] or 0), not r[3], r[3] or ""),
+    "title": lambda r: r[1].lower(),
+    "id": lambda r: r[0],
+    "default": lambda r: (-(r[4] or 0), r[3] is None, r[3] or "9999-99-99", r[1].lower()),
+    "due_date": lambda r: (not r[3], r[3] or ""),
+}
+
+
+def make_backend(name, tmpdir):
+    if name == "sqlite":
+        store = SqliteTaskStore(os.path.join(tmpdir, f"suite-{time.monotonic_ns()}.db"))
+    elif name == "sqlite-memory":
+        store = SqliteTaskStore(":memory:")
+    elif name == "memory":
+        store = MemoryTaskStore()
+    else:
+        raise SystemExit(f"unknown backend {name!r}")
+    store.init()
+    return store
+
+
+def _task_args(rng, today, i):
+    due = None if rng.random() < 0.2 else (today + datetime.timedelta(days=rng.randint(-30, 60))).isoformat()
+    tags = ",".join(rng.sample(TAGS, rng.randint(0, 2)))
+    return (f"Task {i} {rng.choice(['alpha', 'Beta', 'gamma', 'delta'])}", f"details {i}", due,
+            rng.randint(0, 5), tags)
+
+
+def _sorted_result(rows, sort_by):
+    """Rows plus their sort keys in order, so tie order does not matter."""
+    return sorted(rows), [SORT_FIELDS[sort_by](r) for r in rows]
+
+
+def _raises(fn, *args):
+    try:
+        fn(*args)
+    except ValueError:
+        return "ValueError"
+    return "ok"
+
+
+def conformance_results(store, seed=1234, n=300):
+    """Run the seeded workload on store and return {check name: result}."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    events = []
+
+    def listener(op, tid):
+        events.append((op, tid))
+    store.add_change_listener(listener)
+    out = {}
+
+    ids = [store.add_task(*_task_args(rng, today, i)) for i in range(n)]
+    for tid in rng.sample(ids, n // 5):
+        store.set_parent(tid, rng.choice(ids[:20]) if tid not in ids[:20] else None)
+    for tid in rng.sample(ids, n // 4):
+        row = store.get_task(tid)
+        store.update_task(tid, row[1] + " (edited)", row[2], row[3], rng.randint(0, 5), row[5], rng.random() < 0.6)
+    for tid in rng.sample(ids, n // 20):
+        store.delete_task(tid)
+    out["bulk_add"] = store.add_tasks_bulk(
+        [(None,) + _task_args(rng, today, n + i) + (0,) for i in range(50)]
+        + [(ids[0], "replaced", "", None, 1, "home", 0), (10_000, "explicit id", "", None, 0, "", 0)],
+        batch_size=16,
+    )
+    out["bulk_skip"] = store.add_tasks_bulk([(ids[1], "not replaced", "", None, 0, "", 0)], upsert=False)
+    out["completed_bulk"] = store.set_completed_bulk(ids[30:40], True)
+    out["deleted_bulk"] = store.delete_tasks_bulk(ids[40:45] + [99_999])
+    out["next_id"] = store.add_task("after bulk")
+    log = "".join(f"{i:05d} WARN retrying upload (attempt {i % 7})\n" for i in range(400))
+    big = store.add_task("pasted log", log, None, 2, "work")
+    store.update_task(ids[6], "log attached", log + "gamma", None, 1, "work", 0)
+
+    dated = [r[0] for r in store.get_tasks() if r[3]][:6]
+    for tid, rule in zip(dated, ["daily", "FREQ=WEEKLY;BYDAY=MO,TH", "monthly", "FREQ=DAILY;INTERVAL=3;COUNT=5"]):
+        store.set_recurrence(tid, rule)
+    store.complete_occurrence(dated[0], (today + datetime.timedelta(days=1)).isoformat())
+    store.complete_occurrence(dated[1], today.isoformat())
+    store.map_task_to_gc(ids[2], "event-2")
+    store.map_task_to_gc(ids[3], "event-3")
+
+    out["recurrence_needs_due"] = _raises(store.set_recurrence, store.add_task("undated"), "weekly")
+    out["recurrence_never"] = _raises(store.set_recurrence, store.add_task("february", "", f"{today.year}-02-10"),
+                                      EMPTY_RULE)
+    out["cycle"] = _raises(store.set_parent, ids[0], ids[0])
+
+    for sort_by in SORT_FIELDS:
+        out[f"get_tasks/{sort_by}"] = _sorted_result(store.get_tasks(sort_by=sort_by), sort_by)
+        out[f"get_tasks/{sort_by}/all"] = _sorted_result(store.get_tasks(show_completed=True, sort_by=sort_by),
+                                                        sort_by)
+    out["get_tasks/page"] = store.get_tasks(show_completed=True, sort_by="id", limit=25, offset=40)
+    for tag in ("work", "WORK", "admin", "rk", "nope"):
+        out[f"get_tasks/tag={tag}"] = sorted(store.get_tasks(filter_tag=tag, show_completed=True))
+    out["get_tasks/top_level"] = sorted(store.get_tasks(show_completed=True, top_level_only=True))
+    out["get_tasks/children"] = sorted(store.get_tasks(show_completed=True, parent_id=ids[5]))
+    out["iter_tasks"] = list(store.iter_tasks(chunk_size=7))
+    out["iter_tasks/ids"] = [r[0] for r in out["iter_tasks"]] == [
+        r[0] for r in store.get_tasks(show_completed=True, sort_by="id")]
+    out["large_description"] = (store.get_task(big)[2] == log, store.search_tasks("attempt 3", limit=3))
+    out["search"] = store.search_tasks("ALPHA")
+    out["search/open/page"] = store.search_tasks("edited", show_completed=False, limit=5, offset=3)
+    for query in ("Tsk 12 gama", "replcaed", "pasted lg", "ALPHA (edtied)", "xyzzy", "ab"):
+        out[f"fuzzy/{query}"] = store.fuzzy_search_titles(query, limit=10)
+    out["fuzzy/open"] = store.fuzzy_search_titles("task 7 dleta", show_completed=False, limit=10)
+    out["get_task"] = [store.get_task(t) for t in (ids[0], ids[1], ids[42], 10_000, 123_456)]
+
+    out["stats"] = store.get_stats()
+    month = today.replace(day=1)
+    out["due_counts"] = store.get_due_counts(month.isoformat(), (month + datetime.timedelta(days=62)).isoformat())
+    first = store.get_upcoming_due(today.isoformat(), 10)
+    out["upcoming"] = (first, store.get_upcoming_due(today.isoformat(), 10, after=(first[-1][2], first[-1][0])))
+    for mode in ("priority", "due", "tag"):
+        counts = store.get_group_counts(mode)
+        out[f"groups/{mode}"] = counts
+        out[f"groups/{mode}/all"] = store.get_group_counts(mode, show_completed=True, filter_tag="o")
+        for key, _ in counts:
+            out[f"groups/{mode}/{key}"] = _sorted_result(store.get_group_tasks(mode, key), "default")
+
+    out["parents"] = sorted(store.get_parent_ids())
+    out["rollups"] = store.get_rollups(ids[:25] + [123_456])
+    out["subtree"] = store.get_subtree(ids[0])
+    out["recurrences"] = store.get_recurrences()
+    out["occurrences_done"] = store.get_completed_occurrences(dated)
+    out["gc"] = [store.get_gc_event_id(t) for t in ids[:5]]
+    out["task_tags"] = store.get_task_tags()
+    index = TagIndex(store).build()
+    store.update_task(ids[7], "retagged", "", None, 0, "health, Homework", 0)
+    index.wait()
+    out["tag_suggest"] = [index.suggest(p) for p in ("", "w", "HO", "home", "x")]
+    index.close()
+
+    time.sleep(1.1)  # SQLite timestamps have one-second resolution
+    before_archive = store.latest_change_seq()
+    out["archived"] = store.archive_completed(older_than_days=0, batch_size=50, pause=0)
+    out["archive_search"] = sorted(store.search_archive(filter_tag="home"))
+    out["after_archive"] = sorted(store.get_tasks(show_completed=True))
+    out["fuzzy/after_archive"] = store.fuzzy_search_titles("task 7 dleta", limit=10)
+    store.remove_change_listener(listener)
+    out["events"] = events
+
+    feed = store.changes_since(0, limit=None)
+    out["changes"] = [c[:3] + c[4:] for c in feed if c[0] <= before_archive]
+    # Archiving picks tasks in no particular order.
+    out["changes/archive"] = sorted(c[1:3] for c in feed if c[0] > before_archive)
+    out["changes/paged"] = [c[0] for c in store.changes_since(feed[100][0], limit=5)]
+    latest = store.latest_change_seq()
+    out["changes/latest"] = latest == feed[-1][0]
+    out["changes/compacted"] = store.compact_changes(max_rows=10, batch_size=64, pause=0)
+    try:
+        store.changes_since(latest - 11)
+        out["changes/gap"] = None
+    except db.ChangeFeedGap as e:
+        out["changes/gap"] = latest - e.floor
+    out["changes/tail"] = [c[:2] for c in store.changes_since(latest - 10)]
+    store.delete_task(ids[0])
+    out["changes/tombstone"] = [c[1:3] for c in store.changes_since(latest)]
+    return out
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def check_reminder_restart(new_store):
+    """A scheduler started after the reminder hour must not re-fire today's reminders."""
+    store = new_store()
+    try:
+        return _reminder_restart(store)
+    finally:
+        store.close()
+
+
+def _reminder_restart(store):
+    today = datetime.date.today()
+    tomorrow = (today + datetime.timedelta(days=1)).isoformat()
+    plain = store.add_task("due today", "", today.isoformat(), 0, "")
+    later = store.add_task("due tomorrow", "", tomorrow, 0, "")
+    daily = store.add_task("daily", "", today.isoformat(), 0, "")
+    store.set_recurrence(daily, "daily")
+    failures = []
+
+    def run(start_hour, then_hour):
+        now = [datetime.datetime.combine(today, datetime.time(start_hour))]
+        fired = []
+        scheduler = ReminderScheduler(store, callback=lambda tid, title, due: fired.append((tid, due)),
+                                      hour=9, clock=lambda: now[0])
+        scheduler.start()
+        try:
+            _wait_for(lambda: scheduler.upcoming())
+            now[0] = datetime.datetime.combine(today, datetime.time(then_hour))
+            scheduler._on_change("bulk", None)  # wake the worker at the new time
+            _wait_for(lambda: fired, timeout=0.5)
+            return sorted(fired), sorted((e[1], e[3]) for e in scheduler.upcoming())
+        finally:
+            scheduler.stop()
+
+    fired, upcoming = run(10, 10)
+    if fired:
+        failures.append(f"restart after the reminder hour fired {fired}")
+    if upcoming != sorted([(later, tomorrow), (daily, tomorrow)]):
+        failures.append(f"restart after the reminder hour left {upcoming} scheduled")
+    fired, _ = run(8, 10)
+    if fired != sorted([(plain, today.isoformat()), (daily, today.isoformat())]):
+        failures.append(f"start before the reminder hour fired {fired}")
+    return failures
+
+
+def check_bulk_roundtrip(new_store):
+    """Export then import in every bulk_io format keeps tasks and recurrence rules."""
+    source = new_store()
+    failures = []
+    try:
+        today = datetime.date.today().isoformat()
+        ids = [source.add_task("plain", "line one\nline, two", today, 2, "work,home"),
+               source.add_task("weekly", "", today, 0, "errands"),
+               source.add_task("undated"),
+               source.add_task("every third day", "", today, 1, "")]
+        source.set_recurrence(ids[1], "FREQ=WEEKLY;BYDAY=MO,TH")
+        source.set_recurrence(ids[3], "FREQ=DAILY;INTERVAL=3;COUNT=5")
+        source.set_completed_bulk([ids[3]], True)
+        expected = (source.get_tasks(show_completed=True, sort_by="id"),
+                    source.get_recurrences(include_completed=True))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for fmt in bulk_io.FORMATS:
+                target = new_store()
+                try:
+                    path = os.path.join(tmpdir, f"export.{fmt}")
+                    bulk_io.export_tasks(fmt, path, source)
+                    bulk_io.import_tasks(fmt, path, target)
+                    got = (target.get_tasks(show_completed=True, sort_by="id"),
+                           target.get_recurrences(include_completed=True))
+                finally:
+                    target.close()
+                if got != expected:
+                    failures.append(f"{fmt} round trip\n  expected {expected!r:.300}\n  got      {got!r:.300}")
+    finally:
+        source.close()
+    return failures
+
+
+def check_empty_recurrence(new_store):
+    """A stored rule that never produces a date must not hang occurrence queries."""
+    store = new_store()
+    try:
+        today = datetime.date.today()
+        # add_tasks_bulk stores rules as given, like rows written before normalize_rule checked them.
+        store.add_tasks_bulk([(None, "never", "", f"{today.year - 1}-02-10", 0, "", 0, EMPTY_RULE)])
+        year = today.replace(month=1, day=1)
+        thread = threading.Thread(
+            target=lambda: store.get_due_counts(year.isoformat(), year.replace(year=year.year + 1).isoformat()),
+            daemon=True)
+        thread.start()
+        thread.join(10)
+        return ["get_due_counts did not return for a rule without dates"] if thread.is_alive() else []
+    finally:
+        store.close()
+
+
+def check_default_order(new_store):
+    """The default sort keeps the UI's order: within a priority, dated tasks first, then '' and NULL."""
+    store = new_store()
+    try:
+        store.add_task("d none", "", None, 1)
+        store.add_task("c blank", "", "", 1)
+        store.add_task("b dated", "", "2026-01-01", 1)
+        store.add_task("a blank", "", "", 1)
+        store.add_task("e top", "", None, 2)
+        expected = ["e top", "b dated", "a blank", "c blank", "d none"]
+        got = [r[1] for r in store.get_tasks(sort_by="default")]
+        paged = [r[1] for r in store.get_tasks(sort_by="default", limit=2, offset=2)]
+        failures = []
+        if got != expected:
+            failures.append(f"default order {got}, expected {expected}")
+        if paged != expected[2:4]:
+            failures.append(f"default order page {paged}, expected {expected[2:4]}")
+        return failures
+    finally:
+        store.close()
+
+
+CHECKS = [check_reminder_restart, check_bulk_roundtrip, check_empty_recurrence, check_default_order]
+
+
+def run_checks(names, tmpdir):
+    failures = 0
+    for name in names:
+        for check in CHECKS:
+            problems = check(lambda: make_backend(name, tmpdir))
+            for problem in problems:
+                failures += 1
+                print(f"FAILED {name}: {check.__name__}: {problem}")
+    print(f"checks: {len(CHECKS)} x {len(names)} backends, {failures} failures")
+    return failures
+
+
+def run_conformance(names, tmpdir):
+    results = {}
+    for name in names:
+        store = make_backend(name, tmpdir)
+        try:
+            results[name] = conformance_results(store)
+        finally:
+            store.close()
+    reference = names[0]
+    failures = 0
+    for name in names[1:]:
+        for check, expected in results[reference].items():
+            got = results[name].get(check)
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH {name} vs {reference}: {check}\n  expected {expected!r:.300}\n  got      {got!r:.300}")
+    print(f"conformance: {len(results[reference])} checks x {len(names)} backends, {failures} mismatches")
+    return failures
+
+
+def _time(fn, repeat=1):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def run_benchmarks(names, tmpdir, n_tasks):
+    rng = random.Random(42)
+    today = datetime.date.today()
+    rows = [(None,) + _task_args(rng, today, i) + (int(rng.random() < 0.3),) for i in range(n_tasks)]
+    month = today.replace(day=1).isoformat()
+    month_end = (today.replace(day=1) + datetime.timedelta(days=31)).isoformat()
+    cases = [
+        ("get_tasks page", lambda s: s.get_tasks(sort_by="default", limit=200), 20),
+        ("get_tasks tag", lambda s: s.get_tasks(filter_tag="urgent"), 5),
+        ("search", lambda s: s.search_tasks("gamma", limit=200), 5),
+        ("fuzzy search", lambda s: s.fuzzy_search_titles("tsak 123 gama"), 5),
+        ("get_task x1000", lambda s: [s.get_task(i) for i in range(1, 1001)], 1),
+        ("update x200", lambda s: [s.update_task(i, "t", "", None, 1, "", 0) for i in range(1, 201)], 1),
+        ("stats", lambda s: s.get_stats(), 20),
+        ("due counts month", lambda s: s.get_due_counts(month, month_end), 20),
+        ("upcoming 256", lambda s: s.get_upcoming_due(today.isoformat(), 256), 20),
+        ("group counts tag", lambda s: s.get_group_counts("tag"), 3),
+    ]
+    print(f"\n{'operation':<20}" + "".join(f"{name:>16}" for name in names) + f"   ({n_tasks} tasks, ms)")
+    timings = {}
+    for name in names:
+        store = make_backend(name, tmpdir)
+        try:
+            timings[("bulk insert", name)] = _time(lambda: store.add_tasks_bulk(iter(rows)))
+            for label, fn, repeat in cases:
+                timings[(label, name)] = _time(lambda: fn(store), repeat)
+        finally:
+            store.close()
+    for label in ["bulk insert"] + [c[0] for c in cases]:
+        print(f"{label:<20}" + "".join(f"{timings[(label, name)] * 1000:>16.2f}" for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="sqlite,sqlite-memory,memory")
+    parser.add_argument("--tasks", type=int, default=20000, help="rows for the benchmark pass")
+    parser.add_argument("--skip-bench", action="store_true")
+    args = parser.parse_args()
+
+    names = [b.strip() for b in args.backends.split(",") if b.strip()]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        failures = run_conformance(names, tmpdir)
+        failures += run_checks(names, tmpdir)
+        if not args.skip_bench:
+            run_benchmarks(names, tmpdir, args.tasks)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
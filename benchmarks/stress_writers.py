@@ -0,0 +1,95 @@
+"""
+Multi-process contention test: N writer and M reader processes on one tasks.db.
+
+    python benchmarks/stress_writers.py [--writers 4] [--readers 4] [--writes 500]
+
+Every writer inserts --writes uniquely titled tasks (one transaction each, and
+marks every tenth done) while readers loop over get_tasks(). Afterwards the
+store is checked for lost or duplicated writes; the exit status is non-zero
+if any are found or a process failed.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "floppy_zwang"))
+
+import db  # noqa: E402
+
+
+def _writer(path, wid, n, start, results):
+    db.DB_FILENAME = path
+    start.wait()
+    t0 = time.perf_counter()
+    for i in range(n):
+        tid = db.add_task(f"w{wid}-{i}", "", "2026-01-01", i % 6, f"writer{wid}")
+        if i % 10 == 0:
+            db.update_task(tid, f"w{wid}-{i}", "", "2026-01-01", i % 6, f"writer{wid}", 1)
+    results.put(("writer", wid, n, time.perf_counter() - t0))
+
+
+def _reader(path, rid, start, stop, results):
+    db.DB_FILENAME = path
+    start.wait()
+    t0 = time.perf_counter()
+    reads = 0
+    while not stop.is_set():
+        db.get_tasks(show_completed=True, limit=200)
+        reads += 1
+    results.put(("reader", rid, reads, time.perf_counter() - t0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500, help="tasks inserted per writer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tasks.db")
+        db.DB_FILENAME = path
+        db.init_db()
+
+        start, stop, results = mp.Event(), mp.Event(), mp.Queue()
+        writers = [mp.Process(target=_writer, args=(path, w, args.writes, start, results))
+                   for w in range(args.writers)]
+        readers = [mp.Process(target=_reader, args=(path, r, start, stop, results))
+                   for r in range(args.readers)]
+        for p in writers + readers:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in writers:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        for p in readers:
+            p.join()
+
+        stats = [results.get() for _ in range(len(writers) + len(readers) - sum(p.exitcode != 0 for p in writers + readers))]
+        failed = [p for p in writers + readers if p.exitcode != 0]
+
+        conn = db.db_get_connection()
+        titles = [t for (t,) in conn.execute("SELECT title FROM tasks")]
+        done = conn.execute("SELECT COUNT(*) FROM tasks WHERE completed=1").fetchone()[0]
+        conn.close()
+
+    expected = {f"w{w}-{i}" for w in range(args.writers) for i in range(args.writes)}
+    lost = expected - set(titles)
+    dupes = len(titles) - len(set(titles))
+    expected_done = args.writers * len(range(0, args.writes, 10))
+    writes = sum(s[2] for s in stats if s[0] == "writer")
+    reads = sum(s[2] for s in stats if s[0] == "reader")
+
+    print(f"writers    {args.writers} x {args.writes} inserts in {elapsed:.2f}s -> {writes / elapsed:.0f} inserts/s")
+    print(f"readers    {args.readers} -> {reads / elapsed:.0f} reads/s")
+    print(f"lost={len(lost)} duplicated={dupes} done={done}/{expected_done} failed_processes={len(failed)}")
+    return 1 if lost or dupes or done != expected_done or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Online backups of the task database through the SQLite backup API.
+
+backup_database() copies the live database a few pages at a time
+(Connection.backup), pausing between steps. The copy runs inside one read
+transaction on the source, so in WAL mode it reads a fixed snapshot while the
+app, the API server and the CLI keep committing to the WAL: nobody waits on
+the backup, and the backup is never restarted by their writes (which is what
+happens to a stepped backup without a pinned snapshot).
+Snapshots are written to a temporary name, checked with PRAGMA quick_check,
+then renamed into BACKUP_DIR as tasks-YYYYmmdd-HHMMSS.db; only the newest
+BACKUP_KEEP are kept.
+
+    python -m floppy_zwang backup
+    python -m floppy_zwang backups
+    python -m floppy_zwang restore backups/tasks-20260101-120000.db
+"""
+import datetime
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import db
+
+BACKUP_DIR = os.environ.get("FLOPPY_ZWANG_BACKUP_DIR") or None  # default: backups/ next to the database
+BACKUP_KEEP = int(os.environ.get("FLOPPY_ZWANG_BACKUP_KEEP", "7"))
+# Pages copied per step and the pause after each step.
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.01
+SNAPSHOT_PREFIX = "tasks-"
+SNAPSHOT_SUFFIX = ".db"
+
+
+def backup_dir(src_path=None):
+    if BACKUP_DIR:
+        return Path(BACKUP_DIR)
+    src_path = src_path or db.database_path()
+    if src_path.startswith("file:"):
+        return Path.cwd() / "backups"
+    return Path(src_path).resolve().parent / "backups"
+
+
+def _connect(path):
+    return sqlite3.connect(path, timeout=db.BUSY_TIMEOUT, isolation_level=None,
+                           uri=str(path).startswith("file:"), check_same_thread=False)
+
+
+def _connect_readonly(path):
+    # mode=ro never creates the file, so a mistyped snapshot path can't turn
+    # into an empty database that then gets copied over the live one.
+    if not Path(path).is_file():
+        raise FileNotFoundError(f"{path}: no such snapshot")
+    return sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _quick_check(path):
+    conn = _connect_readonly(path)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"{path}: integrity check failed: {result}")
+
+
+def _copy(src, dst, pages, pause, progress):
+    def step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        if remaining and pause:
+            time.sleep(pause)
+    src.backup(dst, pages=pages, progress=step)
+
+
+def backup_database(dest=None, src_path=None, pages=BACKUP_PAGES, pause=BACKUP_PAUSE, progress=None):
+    """
+    Snapshot src_path (default: the configured database) to dest, or to a new
+    timestamped file in backup_dir(). progress(copied_pages, total_pages) is
+    called after every step. Returns the snapshot path.
+    """
+    src_path = src_path or db.database_path()
+    if dest is None:
+        directory = backup_dir(src_path)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        dest = directory / f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}"
+    dest = Path(dest)
+    tmp = dest.with_name(dest.name + ".partial")
+
+    src = _connect(src_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Pin a read snapshot for the whole copy. (With a rollback journal this
+            # would block writers throughout, so there the copy may restart instead.)
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        _copy(src, dst, pages, pause, progress)
+        # The copy inherits WAL mode from the source; a snapshot is a single self-contained file.
+        dst.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        dst.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+    dst.close()
+    try:
+        _quick_check(tmp)
+    except sqlite3.DatabaseError:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, dest)
+    return dest
+
+
+def list_backups(directory=None):
+    """Snapshot paths in directory (default backup_dir()), oldest first."""
+    directory = Path(directory) if directory else backup_dir()
+    if not directory.is_dir():
+        return []
+    return sorted(
+        p for p in directory.iterdir()
+        if p.name.startswith(SNAPSHOT_PREFIX) and p.name.endswith(SNAPSHOT_SUFFIX)
+    )
+
+
+def rotate_backups(keep=None, directory=None):
+    """Delete all but the newest `keep` snapshots. Returns the deleted paths."""
+    keep = BACKUP_KEEP if keep is None else keep
+    snapshots = list_backups(directory)
+    stale = snapshots[:-keep] if keep > 0 else snapshots
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return stale
+
+
+def run_scheduled_backup(keep=None, src_path=None):
+    """One scheduled run: snapshot the database, then rotate. Returns the snapshot path."""
+    path = backup_database(src_path=src_path)
+    rotate_backups(keep, path.parent)
+    return path
+
+
+def restore_backup(snapshot, dest_path=None, pages=-1, pause=0, progress=None):
+    """
+    Replace the contents of dest_path (default: the configured database) with
+    snapshot. The copy goes through the backup API into the live database, so
+    it is atomic for other connections and WAL files stay consistent. The
+    destination stays write-locked until the copy finishes, hence one step.
+    The change feed continues after its pre-restore seq, and its consumers get
+    ChangeFeedGap (the snapshot's seqs were already handed out).
+    Raises FileNotFoundError for a missing snapshot and sqlite3.DatabaseError
+    for one that fails quick_check or has no tasks table; the live database
+    is left untouched in both cases.
+    """
+    _quick_check(snapshot)
+    dest_path = dest_path or db.database_path()
+    src = _connect_readonly(snapshot)
+    try:
+        has_tasks = src.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks'").fetchone()
+    except BaseException:
+        src.close()
+        raise
+    if not has_tasks:
+        src.close()
+        raise sqlite3.DatabaseError(f"{snapshot}: not a task database (no tasks table)")
+    dst = _connect(dest_path)
+    try:
+        high_water = db.change_feed_high_water(dst)
+        _copy(src, dst, pages, pause, progress)
+        db.fence_change_feed(dst, high_water)
+    finally:
+        src.close()
+        dst.close()
+    db.notify_change("bulk", None)
@@ -0,0 +1,261 @@
+"""
+Streaming bulk import/export of tasks as CSV, JSON Lines or iCalendar.
+
+Both directions go through a TaskStore. Exports read through
+store.iter_tasks() so memory stays flat regardless of store size; imports
+parse lazily and write through store.add_tasks_bulk() batches.
+Every format carries the recurrence rule of repeating tasks: a `recurrence`
+column (CSV) or field (JSON Lines) after the task columns, an RRULE line in
+iCalendar.
+"""
+import csv
+import datetime
+import json
+import logging
+
+import recurrence
+from db import TASK_COLUMNS
+from google_sync import task_to_event_body
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl", "ics")
+
+ICS_PRODID = "-//floppy-zwang//tasks//EN"
+
+
+def export_tasks(fmt, path, store, filter_tag=None, show_completed=True, chunk_size=1000, progress=None):
+    """
+    Write store's matching tasks to path (or an open text file) in fmt.
+    Returns the number of tasks written.
+    """
+    _check_format(fmt)
+    rows = store.iter_tasks(filter_tag=filter_tag, show_completed=show_completed, chunk_size=chunk_size)
+    rules = _export_rules(store)
+    writer = {"csv": _write_csv, "jsonl": _write_jsonl, "ics": _write_ics}[fmt]
+    if hasattr(path, "write"):
+        return writer(path, rows, rules, chunk_size, progress)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return writer(f, rows, rules, chunk_size, progress)
+
+
+def import_tasks(fmt, path, store, batch_size=5000, upsert=True, progress=None):
+    """
+    Load tasks from path into store. Records carrying an id replace the task
+    with that id (or are skipped when upsert is false); records without one
+    are added. Returns the number of records processed.
+    """
+    _check_format(fmt)
+    reader = {"csv": _read_csv, "jsonl": _read_jsonl, "ics": _read_ics}[fmt]
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return store.add_tasks_bulk(reader(f), batch_size=batch_size, upsert=upsert, progress=progress)
+
+
+def _check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def _counted(rows, chunk_size, progress):
+    n = 0
+    for n, row in enumerate(rows, 1):
+        yield row
+        if progress and n % chunk_size == 0:
+            progress(n)
+    if progress and n % chunk_size:
+        progress(n)
+
+
+# --- records <-> task rows ---
+
+EXPORT_COLUMNS = TASK_COLUMNS + ("recurrence",)
+
+
+def _export_rules(store):
+    # Only repeating tasks have a rule, so this stays small next to the streamed rows.
+    return {tid: rule for tid, (rule, _) in store.get_recurrences(include_completed=True).items()}
+
+
+def _to_row(rec):
+    """Task row for an import record, with its recurrence rule (or None) as the eighth element."""
+    tid = rec.get("id")
+    title = rec.get("title") or ""
+    due = rec.get("due_date") or None
+    rule = None
+    if rec.get("recurrence") and due:
+        try:
+            rule = recurrence.normalize_rule(rec["recurrence"], due)
+        except ValueError as e:
+            logger.warning("Dropping recurrence of %r: %s", title, e)
+    return (
+        int(tid) if tid not in (None, "") else None,
+        title,
+        rec.get("description") or "",
+        due,
+        int(rec.get("priority") or 0),
+        rec.get("tags") or "",
+        int(bool(int(rec.get("completed") or 0))),
+        rule,
+    )
+
+
+# --- CSV ---
+
+def _write_csv(f, rows, rules, chunk_size, progress):
+    w = csv.writer(f)
+    w.writerow(EXPORT_COLUMNS)
+    n = 0
+    for n, row in enumerate(_counted(rows, chunk_size, progress), 1):
+        w.writerow(tuple(row) + (rules.get(row[0], ""),))
+    return n
+
+
+def _read_csv(f):
+    for rec in csv.DictReader(f):
+        yield _to_row(rec)
+
+
+# --- JSON Lines ---
+
+def _write_jsonl(f, rows, rules, chunk_size, progress):
+    n = 0
+    for n, row in enumerate(_counted(rows, chunk_size, progress), 1):
+        f.write(json.dumps(dict(zip(EXPORT_COLUMNS, tuple(row) + (rules.get(row[0]),))), ensure_ascii=False))
+        f.write("\n")
+    return n
+
+
+def _read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield _to_row(json.loads(line))
+
+
+# --- iCalendar ---
+
+def _ics_escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _ics_unescape(text):
+    out = []
+    chars = iter(text)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append("\n" if nxt in "nN" else nxt)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _ics_fold(line):
+    # RFC 5545: lines longer than 75 octets continue on lines starting with a space.
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    parts = []
+    cur = ""
+    for ch in line:
+        if len((cur + ch).encode("utf-8")) > (75 if not parts else 74):
+            parts.append(cur)
+            cur = ""
+        cur += ch
+    parts.append(cur)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_time(when):
+    if "date" in when:
+        return ";VALUE=DATE", when["date"].replace("-", "")
+    dt = datetime.datetime.fromisoformat(when["dateTime"])
+    return "", dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _write_ics(f, rows, rules, chunk_size, progress):
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + f"PRODID:{ICS_PRODID}\r\n")
+    n = 0
+    for n, task in enumerate(_counted(rows, chunk_size, progress), 1):
+        tid, title, desc, due, priority, tags, completed = task
+        body = task_to_event_body(task, rules.get(tid))
+        start_param, start = _ics_time(body["start"])
+        end_param, end = _ics_time(body["end"])
+        f.write("BEGIN:VEVENT\r\n")
+        f.write(f"UID:task-{tid}@floppy-zwang\r\n")
+        f.write(f"DTSTAMP:{stamp}\r\n")
+        f.write(f"DTSTART{start_param}:{start}\r\n")
+        f.write(f"DTEND{end_param}:{end}\r\n")
+        for line in body.get("recurrence", ()):
+            f.write(_ics_fold(line))
+        f.write(_ics_fold("SUMMARY:" + _ics_escape(body["summary"])))
+        f.write(_ics_fold("DESCRIPTION:" + _ics_escape(body["description"])))
+        f.write(f"X-FLOPPY-PRIORITY:{priority or 0}\r\n")
+        f.write(_ics_fold("X-FLOPPY-TAGS:" + _ics_escape(tags or "")))
+        f.write(f"X-FLOPPY-COMPLETED:{int(bool(completed))}\r\n")
+        f.write("END:VEVENT\r\n")
+    f.write("END:VCALENDAR\r\n")
+    return n
+
+
+def _ics_lines(f):
+    pending = None
+    for raw in f:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and pending is not None:
+            pending += raw[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = raw
+    if pending is not None:
+        yield pending
+
+
+def _read_ics(f):
+    event = None
+    for line in _ics_lines(f):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            yield _event_to_row(event)
+            event = None
+        elif event is not None:
+            event[name] = (params, value)
+
+
+def _event_to_row(event):
+    uid = event.get("UID", ("", ""))[1]
+    tid = None
+    if uid.startswith("task-") and uid.endswith("@floppy-zwang"):
+        tid = uid[len("task-"):-len("@floppy-zwang")]
+
+    title = _ics_unescape(event.get("SUMMARY", ("", ""))[1])
+    if title.startswith("[Task] "):
+        title = title[len("[Task] "):]
+
+    desc = _ics_unescape(event.get("DESCRIPTION", ("", ""))[1])
+    tags = _ics_unescape(event.get("X-FLOPPY-TAGS", ("", ""))[1])
+    trailer = f"\n\nTags: {tags}"
+    if desc.endswith(trailer):
+        desc = desc[:-len(trailer)]
+
+    params, start = event.get("DTSTART", ("", ""))
+    due = None
+    if "VALUE=DATE" in params.upper() and len(start) == 8:
+        due = f"{start[:4]}-{start[4:6]}-{start[6:8]}"
+
+    return _to_row({
+        "id": tid,
+        "title": title,
+        "description": desc,
+        "due_date": due,
+        "priority": event.get("X-FLOPPY-PRIORITY", ("", "0"))[1],
+        "tags": tags,
+        "completed": event.get("X-FLOPPY-COMPLETED", ("", "0"))[1],
+        "recurrence": event.get("RRULE", ("", ""))[1],
+    })
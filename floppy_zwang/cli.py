@@ -0,0 +1,331 @@
+"""
+Headless command line interface: python -m floppy_zwang <command> ...
+
+Never imports tkinter or ttkbootstrap. Task output is JSON Lines, one object
+per task, so it can be piped into jq or another tool. `add -`, `done -` and
+`delete -` read their input from stdin and apply it in a single transaction.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+
+import db
+import tracing
+
+
+def _emit(obj, out=None):
+    out = out or sys.stdout
+    out.write(json.dumps(obj, ensure_ascii=False))
+    out.write("\n")
+
+
+def _emit_rows(rows):
+    for row in rows:
+        _emit(dict(zip(db.TASK_COLUMNS, row)))
+
+
+def _stdin_ids():
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            yield int(json.loads(line)["id"]) if line.startswith("{") else int(line)
+
+
+def _ids(args):
+    if args.ids == ["-"]:
+        return list(_stdin_ids())
+    return [int(i) for i in args.ids]
+
+
+def _stdin_task_rows():
+    for n, line in enumerate(sys.stdin, 1):
+        if not line.strip():
+            continue
+        try:
+            r = json.loads(line)
+            if not isinstance(r, dict) or not r.get("title"):
+                raise ValueError("a task needs a title")
+            yield (None, r["title"], r.get("description") or "", r.get("due_date") or None,
+                   int(r.get("priority") or 0), r.get("tags") or "", int(bool(r.get("completed"))))
+        except ValueError as e:  # includes json.JSONDecodeError
+            raise ValueError(f"line {n}: {e}: {line.strip()[:200]}") from None
+
+
+def cmd_add(args):
+    if args.title == "-":
+        # One batch, so a bad record stops the import before anything is written.
+        try:
+            added = db.add_tasks_bulk(_stdin_task_rows(), batch_size=sys.maxsize)
+        except ValueError as e:
+            print(f"add failed, nothing added: {e}", file=sys.stderr)
+            return 1
+        _emit({"added": added})
+    else:
+        tid = db.add_task(args.title, args.description, args.due, args.priority, args.tags)
+        _emit(dict(zip(db.TASK_COLUMNS, db.get_task(tid))))
+
+
+def cmd_list(args):
+    rows = db.iter_tasks(filter_tag=args.tag, show_completed=args.all, sort_by=args.sort)
+    if args.limit is not None:
+        rows = (r for _, r in zip(range(args.limit), rows))
+    _emit_rows(rows)
+
+
+def cmd_search(args):
+    if args.fuzzy:
+        _emit_rows(db.fuzzy_search_titles(args.query, show_completed=args.all, limit=args.limit or 50))
+        return
+    _emit_rows(db.search_tasks(args.query, show_completed=args.all, limit=args.limit))
+
+
+def cmd_done(args):
+    _emit({"updated": db.set_completed_bulk(_ids(args), 0 if args.undo else 1)})
+
+
+def cmd_delete(args):
+    _emit({"deleted": db.delete_tasks_bulk(_ids(args))})
+
+
+def cmd_export(args):
+    import bulk_io
+    from store import SqliteTaskStore
+
+    path = sys.stdout if args.path == "-" else args.path
+    store = SqliteTaskStore()
+    try:
+        n = bulk_io.export_tasks(args.format, path, store, filter_tag=args.tag, show_completed=not args.open_only)
+    finally:
+        store.close()
+    _emit({"exported": n}, sys.stderr)
+
+
+def cmd_import(args):
+    import bulk_io
+    from store import SqliteTaskStore
+
+    store = SqliteTaskStore()
+    try:
+        n = bulk_io.import_tasks(args.format, args.path, store, batch_size=args.batch_size,
+                                 upsert=not args.no_upsert)
+    finally:
+        store.close()
+    _emit({"imported": n})
+
+
+def cmd_sync(args):
+    import google_sync
+    from store import SqliteTaskStore
+
+    if args.gcal_url:
+        google_sync.GCAL_URL = args.gcal_url
+    store = SqliteTaskStore()
+    try:
+        status = 0
+        tasks = []
+        for tid in dict.fromkeys(_ids(args)):
+            task = store.get_task(tid)
+            if not task:
+                _emit({"id": tid, "error": "not found"})
+                status = 1
+                continue
+            tasks.append(task)
+        if not tasks:
+            return status
+        for tid, result in google_sync.push_tasks_to_google(tasks, store):
+            if isinstance(result, Exception):
+                _emit({"id": tid, "error": str(result)})
+                status = 1
+                continue
+            store.map_task_to_gc(tid, result)
+            _emit({"id": tid, "event_id": result})
+        return status
+    finally:
+        store.close()
+
+
+def cmd_changes(args):
+    try:
+        changes = db.changes_since(args.since, args.limit)
+    except db.ChangeFeedGap as e:
+        print(f"{e}; re-read all tasks and continue from --since {db.latest_change_seq()}", file=sys.stderr)
+        return 3
+    for seq, op, tid, at, fields in changes:
+        _emit({"seq": seq, "op": op, "id": tid, "changed_at": at, "fields": list(fields)})
+
+
+def cmd_compact_changes(args):
+    _emit({"removed": db.compact_changes(args.days, args.max_rows), "latest_seq": db.latest_change_seq()})
+
+
+def cmd_backup(args):
+    import backup
+
+    path = backup.backup_database(args.dest)
+    stale = backup.rotate_backups(args.keep, path.parent) if args.dest is None else []
+    _emit({"backup": str(path), "rotated": [str(p) for p in stale]})
+
+
+def cmd_backups(args):
+    import backup
+
+    for path in backup.list_backups(args.dir):
+        _emit({"backup": str(path), "size": path.stat().st_size})
+
+
+def cmd_restore(args):
+    import backup
+
+    try:
+        backup.restore_backup(args.snapshot)
+    except (FileNotFoundError, sqlite3.DatabaseError) as e:
+        print(f"restore failed: {e}", file=sys.stderr)
+        return 1
+    _emit({"restored": args.snapshot, "db": db.database_path()})
+
+
+def cmd_compress(args):
+    changed = db.compress_descriptions(args.min_size)
+    if args.vacuum:
+        conn = db.db_get_connection()
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    _emit({"compressed": changed, "vacuumed": args.vacuum})
+
+
+def cmd_serve(args):
+    import logconfig
+    import server
+
+    logconfig.setup()
+    server.serve(args.host, args.port, args.pool_size)
+
+
+def cmd_fake_gcal(args):
+    import fake_gcal
+    import logconfig
+
+    logconfig.setup()
+    fake_gcal.serve(args.host, args.port, args.profile, args.seed)
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="python -m floppy_zwang", description="Headless task store access.")
+    p.add_argument("--db", help="path to tasks.db (default: $FLOPPY_ZWANG_DB or the app database)")
+    p.add_argument("--trace", metavar="FILE", help="record timing spans and write them to FILE as JSON")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("add", help="add a task, or JSON Lines records from stdin with '-'")
+    s.add_argument("title")
+    s.add_argument("--description", default="")
+    s.add_argument("--due", default=None, help="YYYY-MM-DD")
+    s.add_argument("--priority", type=int, default=0)
+    s.add_argument("--tags", default="")
+    s.set_defaults(func=cmd_add)
+
+    s = sub.add_parser("list", help="list tasks")
+    s.add_argument("--tag")
+    s.add_argument("--all", action="store_true", help="include completed tasks")
+    s.add_argument("--sort", default="due_date", choices=["due_date", "priority", "title", "id"])
+    s.add_argument("--limit", type=int)
+    s.set_defaults(func=cmd_list)
+
+    s = sub.add_parser("search", help="search title, description and tags")
+    s.add_argument("query")
+    s.add_argument("--all", action="store_true", help="include completed tasks")
+    s.add_argument("--limit", type=int)
+    s.add_argument("--fuzzy", action="store_true", help="typo-tolerant title search, best match first")
+    s.set_defaults(func=cmd_search)
+
+    s = sub.add_parser("done", help="mark tasks done ('-' reads ids from stdin)")
+    s.add_argument("ids", nargs="+")
+    s.add_argument("--undo", action="store_true", help="mark as not done instead")
+    s.set_defaults(func=cmd_done)
+
+    s = sub.add_parser("delete", help="delete tasks ('-' reads ids from stdin)")
+    s.add_argument("ids", nargs="+")
+    s.set_defaults(func=cmd_delete)
+
+    s = sub.add_parser("export", help="export tasks to a file ('-' for stdout)")
+    s.add_argument("format", choices=["csv", "jsonl", "ics"])
+    s.add_argument("path")
+    s.add_argument("--tag")
+    s.add_argument("--open-only", action="store_true")
+    s.set_defaults(func=cmd_export)
+
+    s = sub.add_parser("import", help="import tasks from a file")
+    s.add_argument("format", choices=["csv", "jsonl", "ics"])
+    s.add_argument("path")
+    s.add_argument("--batch-size", type=int, default=5000)
+    s.add_argument("--no-upsert", action="store_true", help="skip records whose id already exists")
+    s.set_defaults(func=cmd_import)
+
+    s = sub.add_parser("sync", help="push tasks to Google Calendar ('-' reads ids from stdin)")
+    s.add_argument("ids", nargs="+")
+    s.add_argument("--gcal-url", help="Calendar API endpoint to use instead of Google's, e.g. a fake-gcal server "
+                                      "(default: $FLOPPY_ZWANG_GCAL_URL)")
+    s.set_defaults(func=cmd_sync)
+
+    s = sub.add_parser("changes", help="change feed entries after a seq, oldest first (exit 3 once compacted)")
+    s.add_argument("--since", type=int, default=0, help="last seq already processed")
+    s.add_argument("--limit", type=int, default=None)
+    s.set_defaults(func=cmd_changes)
+
+    s = sub.add_parser("compact-changes", help="drop old change feed entries")
+    s.add_argument("--days", type=int, default=None, help="keep this many days (default $FLOPPY_ZWANG_CHANGES_DAYS or 30)")
+    s.add_argument("--max-rows", type=int, default=None,
+                   help="keep at most this many entries (default $FLOPPY_ZWANG_CHANGES_MAX or 200000)")
+    s.set_defaults(func=cmd_compact_changes)
+
+    s = sub.add_parser("backup", help="snapshot the database online and rotate old snapshots")
+    s.add_argument("--dest", help="write the snapshot here instead of the backup directory")
+    s.add_argument("--keep", type=int, default=None, help="snapshots to keep (default $FLOPPY_ZWANG_BACKUP_KEEP or 7)")
+    s.set_defaults(func=cmd_backup)
+
+    s = sub.add_parser("backups", help="list snapshots")
+    s.add_argument("--dir", help="backup directory (default: backups/ next to the database)")
+    s.set_defaults(func=cmd_backups)
+
+    s = sub.add_parser("restore", help="replace the database contents with a snapshot")
+    s.add_argument("snapshot")
+    s.set_defaults(func=cmd_restore)
+
+    s = sub.add_parser("compress-descriptions", help="compress existing large descriptions in place")
+    s.add_argument("--min-size", type=int, default=None,
+                   help="bytes (default $FLOPPY_ZWANG_COMPRESS_MIN or 2048)")
+    s.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return the freed pages")
+    s.set_defaults(func=cmd_compress)
+
+    s = sub.add_parser("serve", help="run the local HTTP/JSON API")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--pool-size", type=int, default=8)
+    s.set_defaults(func=cmd_serve)
+
+    s = sub.add_parser("fake-gcal", help="run a local fake Google Calendar API for sync testing")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8099)
+    s.add_argument("--profile", default="clean", choices=["clean", "slow", "flaky", "throttled", "quota", "hostile"],
+                   help="latency and fault injection (see fake_gcal.PROFILES)")
+    s.add_argument("--seed", type=int, default=None, help="seed for the injected faults")
+    s.set_defaults(func=cmd_fake_gcal)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        tracing.enable()
+        tracing.TRACE_FILE = args.trace
+    tracing.setup_from_env()
+    if args.db:
+        db.configure(args.db)
+    db.init_db()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,155 @@
+import datetime
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
 import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
 from pathlib import Path
 
-DB_FILENAME = str(Path(__file__).resolve().parent.joinpath("../tasks.db"))
+import recurrence
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DB_FILENAME = os.environ.get("FLOPPY_ZWANG_DB") or str(Path(__file__).resolve().parent.joinpath("../tasks.db"))
+
+# Seconds SQLite itself waits on a locked database before raising "database is locked".
+BUSY_TIMEOUT = float(os.environ.get("FLOPPY_ZWANG_BUSY_TIMEOUT", "5.0"))
+# Extra attempts (with jittered exponential backoff) for writes that still hit SQLITE_BUSY.
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+# Completed tasks untouched for this many days are moved to tasks_archive.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("FLOPPY_ZWANG_ARCHIVE_DAYS", "30"))
+# Keep the archive in a separate ATTACHed database file instead of tasks.db.
+ARCHIVE_DB = os.environ.get("FLOPPY_ZWANG_ARCHIVE_DB") or None
+
+# Descriptions of at least this many UTF-8 bytes are stored zlib-compressed
+# (0 turns compression off for new writes).
+DESCRIPTION_COMPRESS_MIN = int(os.environ.get("FLOPPY_ZWANG_COMPRESS_MIN", "2048"))
+COMPRESSED_MARKER = b"\x01"
+
+# Fuzzy title search: per query trigram, how many of its newest postings are
+# counted, and how much of the query a title must contain to be returned.
+FUZZY_SCAN_LIMIT = int(os.environ.get("FLOPPY_ZWANG_FUZZY_SCAN", "2000"))
+FUZZY_MIN_SIMILARITY = 0.3
+
+# The change feed keeps entries for this many days, and at most this many entries.
+CHANGES_RETAIN_DAYS = int(os.environ.get("FLOPPY_ZWANG_CHANGES_DAYS", "30"))
+CHANGES_MAX_ROWS = int(os.environ.get("FLOPPY_ZWANG_CHANGES_MAX", "200000"))
+
+
+def add_change_listener(callback):
+    """Register callback(op, task_id), called after every task write to the current database."""
+    current_context().listeners.append(callback)
+
+
+def remove_change_listener(callback):
+    listeners = current_context().listeners
+    if callback in listeners:
+        listeners.remove(callback)
+
+
+def notify_change(op, task_id):
+    """Call the current database's listeners; for writes made outside this module (e.g. a restore)."""
+    current_context().notify_change(op, task_id)
+
+
+# --- Description compression ---
+#
+# A compressed description is a BLOB: COMPRESSED_MARKER followed by a zlib
+# stream. Plain descriptions stay TEXT. get_task() and iter_tasks() return the
+# full text; list queries return NULL for compressed descriptions so their
+# payload is never read (typeof() is answered from the record header).
+
+def is_large_description(text):
+    return bool(DESCRIPTION_COMPRESS_MIN and text and len(text.encode("utf-8")) >= DESCRIPTION_COMPRESS_MIN)
+
+
+def _compress(text):
+    return COMPRESSED_MARKER + zlib.compress(text.encode("utf-8"), 6)
+
+
+def encode_description(text):
+    return _compress(text) if is_large_description(text) else text
+
+
+def decode_description(value):
+    if isinstance(value, bytes):
+        if value[:1] == COMPRESSED_MARKER:
+            return zlib.decompress(value[1:]).decode("utf-8")
+        return value.decode("utf-8", "replace")
+    return value
+
+
+def _list_description(col="description"):
+    return f"CASE WHEN typeof({col}) = 'blob' THEN NULL ELSE {col} END"
+
+
+def _decode_row(row):
+    return row[:2] + (decode_description(row[2]),) + row[3:]
+
+
+def _connect(path, **kwargs):
+    # Implicit transactions start with BEGIN IMMEDIATE, so a writer takes the
+    # write lock up front (and waits on busy_timeout) instead of failing at commit.
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level="IMMEDIATE",
+                           uri=path.startswith("file:"), **kwargs)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.create_function("task_description", 1, decode_description, deterministic=True)
+    if tracing.enabled():
+        conn.set_trace_callback(tracing.on_statement)
+    return conn
+
+
+def _is_busy(exc):
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def _call_with_busy_retry(fn, *args, **kwargs):
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if attempt == BUSY_RETRIES or not _is_busy(e):
+                raise
+            time.sleep(random.uniform(0, BUSY_BACKOFF * 2 ** attempt))
+
+
+def busy_retry(fn):
+    """Retry a write function with jittered backoff when the database stays locked."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return _call_with_busy_retry(fn, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def _write_connection():
+    conn = db_get_connection()
+    try:
+        yield conn
+        _refresh_title_index(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 
 def init_db():
-    conn = sqlite3.connect(DB_FILENAME)
+    conn = _connect(database_path())
+    # WAL lets readers (UI, sync worker, API server) proceed while one writer commits.
+    conn.execute("PRAGMA journal_mode=WAL")
     c = conn.cursor()
     c.execute(
         """
@@ -31,60 +175,311 @@ def init_db():
         )
         """
     )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_open_due ON tasks(completed, due_date)")
+    _ensure_column(conn, "tasks", "parent_id", "INTEGER REFERENCES tasks(id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_id)")
+    _ensure_column(conn, "tasks", "recurrence", "TEXT")
+    # Repeating tasks are few; queries for them write +completed / +due_date so the
+    # planner walks this index instead of every open task in idx_tasks_open_due.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_recurring ON tasks(id) WHERE recurrence IS NOT NULL")
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_exceptions (
+            task_id INTEGER NOT NULL,
+            occurrence_date TEXT NOT NULL,
+            PRIMARY KEY (task_id, occurrence_date)
+        ) WITHOUT ROWID
+        """
+    )
     conn.commit()
+    _ensure_archive_schema(conn)
+    _ensure_stats_schema(conn)
+    _ensure_title_index(conn)
+    _ensure_change_feed_schema(conn)
     conn.close()
 
 
-def db_get_connection():
-    return sqlite3.connect(DB_FILENAME)
+def _ensure_column(conn, table, column, decl, schema="main"):
+    """Add a column to an existing table created before the column existed."""
+    cols = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {column} {decl}")
 
 
-def add_task(title, description="", due_date=None, priority=0, tags=""):
-    conn = db_get_connection()
-    c = conn.cursor()
-    c.execute(
+def _attach_archive(conn):
+    """Return the schema holding the archive tables, attaching ARCHIVE_DB if configured."""
+    if not ARCHIVE_DB:
+        return "main"
+    if "archive" not in {row[1] for row in conn.execute("PRAGMA database_list")}:
+        conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB,))
+    return "archive"
+
+
+def _ensure_archive_schema(conn):
+    schema = _attach_archive(conn)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_date TEXT,
+            priority INTEGER DEFAULT 0,
+            tags TEXT,
+            completed INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    _ensure_column(conn, "tasks_archive", "parent_id", "INTEGER", schema)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.gc_mapping_archive (
+            task_id INTEGER UNIQUE,
+            gc_event_id TEXT
+        )
         """
-        INSERT INTO tasks (title, description, due_date, priority, tags, completed)
-        VALUES (?, ?, ?, ?, ?, 0)
-        """,
-        (title, description, due_date, priority, tags),
     )
     conn.commit()
-    tid = c.lastrowid
-    conn.close()
+
+
+class _PooledConnection(sqlite3.Connection):
+    """Connection whose close() hands it back to its pool instead of closing."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+
+class ConnectionPool:
+    """
+    Keeps up to `size` idle connections to one database file for reuse across
+    threads. Connections are only ever used by one thread at a time.
+    """
+
+    def __init__(self, path, size=8):
+        self.path = path
+        self.size = size
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = _connect(self.path, factory=_PooledConnection, check_same_thread=False)
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if conn.pool is self and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return True
+        conn.pool = None
+        return False
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+
+class DatabaseContext:
+    """
+    Everything this module keeps per database: its path (a file path or a
+    "file:" URI), an optional ConnectionPool, the data_version() connection and
+    the change listeners. The module functions act on the context made current
+    with using() on the calling thread, or on default_context, which follows
+    DB_FILENAME. Each SqliteTaskStore owns one, so stores on different files
+    (or next to the pooled API server) never share connections or listeners.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self.pool = None
+        self.listeners = []
+        self._version_lock = threading.Lock()
+        self._version_conn = None
+        self._version_path = None
+
+    def __repr__(self):
+        return f"DatabaseContext({self.path!r})"
+
+    @property
+    def path(self):
+        return self._path or DB_FILENAME
+
+    def connect(self):
+        pool = self.pool
+        if pool is not None and pool.path == self.path:
+            return pool.acquire()
+        return _connect(self.path)
+
+    def enable_pooling(self, size=8):
+        self.disable_pooling()
+        self.pool = ConnectionPool(self.path, size)
+        return self.pool
+
+    def disable_pooling(self):
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.close_all()
+
+    def data_version(self):
+        with self._version_lock:
+            if self._version_conn is None or self._version_path != self.path:
+                if self._version_conn is not None:
+                    self._version_conn.close()
+                self._version_path = self.path
+                self._version_conn = _connect(self._version_path, check_same_thread=False)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def notify_change(self, op, task_id):
+        for callback in list(self.listeners):
+            callback(op, task_id)
+
+    def close(self):
+        """Drop the pool and cached connections (the context stays usable)."""
+        self.disable_pooling()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+
+
+default_context = DatabaseContext()
+_current = contextvars.ContextVar("floppy_zwang_db", default=None)
+
+
+def current_context():
+    return _current.get() or default_context
+
+
+@contextmanager
+def using(context):
+    """Run the module functions called inside the block against context (on this thread only)."""
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def database_path():
+    """Path of the database the module functions currently act on."""
+    return current_context().path
+
+
+def enable_pooling(size=8):
+    """Serve db_get_connection() from a ConnectionPool (used by long-running servers)."""
+    return current_context().enable_pooling(size)
+
+
+def disable_pooling():
+    current_context().disable_pooling()
+
+
+def db_get_connection():
+    return current_context().connect()
+
+
+def configure(path):
+    """
+    Point default_context at another database: a file path or a "file:" URI
+    (e.g. a shared-cache in-memory database). Drops the pool and cached
+    connections opened for the previous one.
+    """
+    global DB_FILENAME
+    if path == DB_FILENAME:
+        return
+    default_context.close()
+    DB_FILENAME = path
+
+
+def data_version():
+    """
+    Counter that changes whenever any other connection (in this or another
+    process) commits to the database. Read from one dedicated connection per
+    context, as PRAGMA data_version values are only comparable on the same
+    connection.
+    """
+    return current_context().data_version()
+
+
+@busy_retry
+def add_task(title, description="", due_date=None, priority=0, tags="", parent_id=None):
+    with _write_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            INSERT INTO tasks (title, description, due_date, priority, tags, completed, parent_id)
+            VALUES (?, ?, ?, ?, ?, 0, ?)
+            """,
+            (title, encode_description(description), due_date, priority, tags, parent_id),
+        )
+        tid = c.lastrowid
+    notify_change("insert", tid)
     return tid
 
 
+@busy_retry
 def update_task(task_id, title, description, due_date, priority, tags, completed):
-    conn = db_get_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        UPDATE tasks SET title=?, description=?, due_date=?, priority=?, tags=?, completed=?,
-        updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-        """,
-        (title, description, due_date, priority, tags, completed, task_id),
-    )
-    conn.commit()
-    conn.close()
+    with _write_connection() as conn:
+        conn.execute(
+            """
+            UPDATE tasks SET title=?, description=?, due_date=?, priority=?, tags=?, completed=?,
+            updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+            """,
+            (title, encode_description(description), due_date, priority, tags, completed, task_id),
+        )
+    notify_change("update", task_id)
 
 
+@busy_retry
 def delete_task(task_id):
-    conn = db_get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-    c.execute("DELETE FROM gc_mapping WHERE task_id=?", (task_id,))
-    conn.commit()
-    conn.close()
+    with _write_connection() as conn:
+        _reparent_children(conn, [(task_id,)])
+        conn.execute("DELETE FROM tasks WHERE id=?", (task_id,))
+        conn.execute("DELETE FROM gc_mapping WHERE task_id=?", (task_id,))
+        conn.execute("DELETE FROM task_exceptions WHERE task_id=?", (task_id,))
+    notify_change("delete", task_id)
 
 
-def get_tasks(filter_tag=None, show_completed=False, sort_by="due_date"):
-    conn = db_get_connection()
-    c = conn.cursor()
-    q = "SELECT id, title, description, due_date, priority, tags, completed FROM tasks"
+def _reparent_children(conn, ids):
+    # Sub-tasks of a deleted task move up to its parent (or the top level).
+    conn.executemany(
+        "UPDATE tasks SET parent_id=(SELECT parent_id FROM tasks WHERE id=?) WHERE parent_id=?",
+        [(tid, tid) for (tid,) in ids],
+    )
+
+
+TASK_COLUMNS = ("id", "title", "description", "due_date", "priority", "tags", "completed")
+
+
+def _tasks_query(filter_tag=None, show_completed=False, sort_by="due_date", limit=None, offset=0,
+                 parent_id=None, top_level_only=False, condition=None, full_description=False):
+    description = "description" if full_description else _list_description()
+    q = f"SELECT id, title, {description}, due_date, priority, tags, completed FROM tasks"
     args = []
     where = []
+    if condition is not None:
+        where.append(condition[0])
+        args += condition[1]
+    if parent_id is not None:
+        where.append("parent_id=?")
+        args.append(parent_id)
+    elif top_level_only:
+        where.append("parent_id IS NULL")
     if not show_completed:
         where.append("completed=0")
     if filter_tag:
@@ -97,15 +492,125 @@ def get_tasks(filter_tag=None, show_completed=False, sort_by="due_date"):
         q += " ORDER BY priority DESC, due_date IS NULL, due_date ASC"
     elif sort_by == "title":
         q += " ORDER BY title COLLATE NOCASE ASC"
+    elif sort_by == "id":
+        q += " ORDER BY id ASC"
+    elif sort_by == "default":
+        # Same order as the UI's default sort: priority, then due date, then title.
+        # Undated tasks come after dated ones; the edit dialog saves no date as ''.
+        q += (" ORDER BY priority DESC, due_date IS NULL, COALESCE(NULLIF(due_date, ''), '9999-99-99') ASC, "
+              "title COLLATE NOCASE ASC")
     else:
         q += " ORDER BY (due_date IS NULL), due_date ASC"
+    if limit is not None or offset:
+        q += " LIMIT ? OFFSET ?"
+        args += [-1 if limit is None else limit, offset]
+    return q, args
 
-    c.execute(q, args)
+
+def get_tasks(filter_tag=None, show_completed=False, sort_by="due_date", limit=None, offset=0,
+              parent_id=None, top_level_only=False):
+    """
+    Task rows matching the filters. parent_id restricts to direct sub-tasks
+    of that task; top_level_only to tasks without a parent. Compressed (large)
+    descriptions come back as None; use get_task() for the full row.
+    """
+    conn = db_get_connection()
+    c = conn.cursor()
+    c.execute(*_tasks_query(filter_tag, show_completed, sort_by, limit, offset, parent_id, top_level_only))
     rows = c.fetchall()
     conn.close()
     return rows
 
 
+def iter_tasks(filter_tag=None, show_completed=True, sort_by="id", chunk_size=1000):
+    """
+    Like get_tasks(), but yields rows from fetchmany() chunks instead of one
+    big list, with full descriptions (this feeds exports).
+    """
+    # Connect now rather than on the first next(), while the caller's context is current.
+    conn = db_get_connection()
+    return _iter_chunks(conn, _tasks_query(filter_tag, show_completed, sort_by, full_description=True), chunk_size)
+
+
+def _iter_chunks(conn, query, chunk_size):
+    c = conn.cursor()
+    try:
+        c.execute(*query)
+        while True:
+            chunk = c.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                yield _decode_row(row)
+    finally:
+        c.close()
+        conn.close()
+
+
+def add_tasks_bulk(rows, batch_size=5000, upsert=True, progress=None):
+    """
+    Write task rows (id, title, description, due_date, priority, tags, completed)
+    with executemany, committing every batch_size rows. Rows whose id is None
+    get a new id; rows with an id replace the existing task when upsert is true
+    and are skipped otherwise. A row may carry an eighth element, a recurrence
+    rule; an upsert without one keeps the task's existing rule.
+    progress(n_written) is called after each batch. Returns the number of rows
+    processed.
+    """
+    cols = "title, description, due_date, priority, tags, completed, recurrence"
+    insert_new = f"INSERT INTO tasks ({cols}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    if upsert:
+        insert_id = (
+            f"INSERT INTO tasks (id, {cols}) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title=excluded.title, description=excluded.description, "
+            "due_date=excluded.due_date, priority=excluded.priority, tags=excluded.tags, "
+            "completed=excluded.completed, recurrence=COALESCE(excluded.recurrence, recurrence), "
+            "updated_at=CURRENT_TIMESTAMP"
+        )
+    else:
+        insert_id = f"INSERT OR IGNORE INTO tasks (id, {cols}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+    conn = db_get_connection()
+    c = conn.cursor()
+    total = 0
+
+    def write(batch):
+        try:
+            batch = [r[:2] + (encode_description(r[2]),) + tuple(r[3:7]) + (r[7] if len(r) > 7 else None,)
+                     for r in batch]
+            c.executemany(insert_id, [r for r in batch if r[0] is not None])
+            c.executemany(insert_new, [r[1:] for r in batch if r[0] is None])
+            _refresh_title_index(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def flush(batch):
+        _call_with_busy_retry(write, batch)
+
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                total += len(batch)
+                batch = []
+                if progress:
+                    progress(total)
+        if batch:
+            flush(batch)
+            total += len(batch)
+            if progress:
+                progress(total)
+    finally:
+        conn.close()
+        if total:
+            notify_change("bulk", None)
+    return total
+
+
 def get_task(task_id):
     conn = db_get_connection()
     c = conn.cursor()
@@ -115,18 +620,1068 @@ def get_task(task_id):
     )
     row = c.fetchone()
     conn.close()
-    return row
+    return _decode_row(row) if row else None
 
 
-def map_task_to_gc(task_id, event_id):
+def search_tasks(query, show_completed=True, limit=None, offset=0):
+    """
+    Tasks whose title, description or tags contain query (case-insensitive).
+    Rows are list rows: compressed descriptions are searched but returned as None.
+    """
     conn = db_get_connection()
     c = conn.cursor()
-    c.execute(
-        "INSERT OR REPLACE INTO gc_mapping (task_id, gc_event_id) VALUES (?, ?)",
-        (task_id, event_id),
+    q = (
+        f"SELECT id, title, {_list_description()}, due_date, priority, tags, completed FROM tasks "
+        "WHERE (title LIKE ? OR tags LIKE ? OR task_description(description) LIKE ?)"
     )
+    pattern = f"%{query}%"
+    args = [pattern, pattern, pattern]
+    if not show_completed:
+        q += " AND completed=0"
+    q += " ORDER BY id ASC LIMIT ? OFFSET ?"
+    args += [-1 if limit is None else limit, offset]
+    c.execute(q, args)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+# --- Fuzzy title search (task_titles) ---
+#
+# task_titles is an FTS5 table of task titles using the trigram tokenizer,
+# used only as a trigram -> task ids map. Triggers on tasks queue the id of
+# every inserted, retitled or deleted task in task_titles_stale, and each
+# write transaction re-indexes the queued ids before it commits
+# (_refresh_title_index), so add_task/update_task keep the index current
+# incrementally. Writing task_titles from the triggers themselves would make
+# FTS5 flush its pending terms once per row, which doubles the cost of a
+# bulk import. Ids queued by other writers are scored on every search until
+# the next refresh.
+#
+# Candidates are the tasks containing every query trigram, plus the ones
+# sharing the most trigrams among the newest FUZZY_SCAN_LIMIT postings of each
+# query trigram (bm25 over an OR of all trigrams reads every posting and takes
+# about a second at 1M tasks). They are ranked in Python by
+# title_similarity(). Without FTS5 trigram support (SQLite < 3.34) every
+# title is scored instead.
+
+
+def title_trigrams(text, pad=True):
+    """Distinct lower-cased 3-character windows of text, spaces included; pad adds one space each side."""
+    text = " ".join((text or "").lower().split())
+    if pad:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def title_similarity(query_grams, title):
+    """(share of the query's trigrams found in title, Jaccard similarity of the two trigram sets)."""
+    grams = title_trigrams(title)
+    shared = len(query_grams & grams)
+    return shared / len(query_grams), shared / (len(query_grams) + len(grams) - shared)
+
+
+def rank_fuzzy_matches(query, rows, limit=50, min_similarity=None):
+    """
+    Order task rows by similarity of their titles to query, best first, and
+    keep the first limit whose title contains at least min_similarity of the
+    query's trigrams. Ties go to the newer task.
+    """
+    if min_similarity is None:
+        min_similarity = FUZZY_MIN_SIMILARITY
+    grams = title_trigrams(query)
+    scored = []
+    for row in rows:
+        contained, jaccard = title_similarity(grams, row[1])
+        if contained >= min_similarity:
+            scored.append((-contained, -jaccard, -row[0], row))
+    scored.sort(key=lambda s: s[:3])
+    return [s[3] for s in scored[:limit]]
+
+
+_TITLE_INDEX_TRIGGERS = {
+    "trg_task_titles_insert": ("AFTER INSERT ON tasks", "NEW.id"),
+    "trg_task_titles_update": ("AFTER UPDATE OF title ON tasks", "NEW.id"),
+    "trg_task_titles_delete": ("AFTER DELETE ON tasks", "OLD.id"),
+}
+
+
+def _ensure_title_index(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS task_titles_stale (task_id INTEGER PRIMARY KEY)")
+    for name, (event, tid) in _TITLE_INDEX_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} "
+                     f"BEGIN INSERT OR IGNORE INTO task_titles_stale (task_id) VALUES ({tid}); END")
+    if not _has_title_index(conn):
+        try:
+            conn.execute("CREATE VIRTUAL TABLE task_titles USING fts5(title, tokenize='trigram', detail='none')")
+        except sqlite3.OperationalError as e:
+            logger.warning("Fuzzy title search will scan every title: no FTS5 trigram index (%s)", e)
+        else:
+            started = time.perf_counter()
+            conn.execute("INSERT INTO task_titles (rowid, title) SELECT id, title FROM tasks")
+            conn.execute("DELETE FROM task_titles_stale")
+            logger.info("Built the title trigram index in %.1fs", time.perf_counter() - started)
     conn.commit()
+
+
+def _has_title_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='task_titles'"
+    ).fetchone() is not None
+
+
+def _refresh_title_index(conn):
+    """Re-index the titles queued in task_titles_stale; runs inside the caller's write transaction."""
+    if conn.execute("SELECT 1 FROM task_titles_stale LIMIT 1").fetchone() is None:
+        return
+    if _has_title_index(conn):
+        conn.execute("DELETE FROM task_titles WHERE rowid IN (SELECT task_id FROM task_titles_stale)")
+        conn.execute("INSERT INTO task_titles (rowid, title) "
+                     "SELECT id, title FROM tasks WHERE id IN (SELECT task_id FROM task_titles_stale)")
+    conn.execute("DELETE FROM task_titles_stale")
+
+
+def _fts_term(gram):
+    return '"' + gram.replace('"', '""') + '"'
+
+
+def _fuzzy_candidates(conn, query, limit):
+    """Ids of tasks worth scoring against query, from task_titles."""
+    pool = max(4 * limit, 200)
+    match = "SELECT rowid FROM task_titles WHERE task_titles MATCH ? ORDER BY rowid DESC LIMIT ?"
+    # Titles containing every trigram: the query typed correctly, or nearly so.
+    every = " AND ".join(map(_fts_term, sorted(title_trigrams(query, pad=False))))
+    ids = {row[0] for row in conn.execute(match, (every, pool))}
+    shared = Counter()
+    for gram in title_trigrams(query):
+        shared.update(row[0] for row in conn.execute(match, (_fts_term(gram), FUZZY_SCAN_LIMIT)))
+    ids.update(tid for tid, _ in shared.most_common(pool))
+    return ids
+
+
+def fuzzy_search_titles(query, show_completed=True, limit=50):
+    """
+    Tasks whose titles resemble query despite typos ("kuberntes upgrde"),
+    ranked by rank_fuzzy_matches(). Rows are list rows, as in search_tasks().
+    Queries shorter than three characters match nothing.
+    """
+    if not title_trigrams(query, pad=False):
+        return []
+    conn = db_get_connection()
+    try:
+        q = f"SELECT id, title, {_list_description()}, due_date, priority, tags, completed FROM tasks"
+        args = []
+        if _has_title_index(conn):
+            q += " WHERE (id IN (SELECT value FROM json_each(?)) OR id IN (SELECT task_id FROM task_titles_stale))"
+            args.append(json.dumps(sorted(_fuzzy_candidates(conn, query, limit))))
+            if not show_completed:
+                q += " AND completed=0"
+        elif not show_completed:
+            q += " WHERE completed=0"
+        return rank_fuzzy_matches(query, conn.execute(q, args), limit)
+    finally:
+        conn.close()
+
+
+@busy_retry
+def set_completed_bulk(task_ids, completed=1):
+    """Mark several tasks done (or not done) in one transaction. Returns rows changed."""
+    params = [(int(bool(completed)), tid) for tid in task_ids]
+    with _write_connection() as conn:
+        c = conn.cursor()
+        c.executemany("UPDATE tasks SET completed=?, updated_at=CURRENT_TIMESTAMP WHERE id=?", params)
+        changed = c.rowcount
+    if changed:
+        notify_change("bulk", None)
+    return changed
+
+
+@busy_retry
+def delete_tasks_bulk(task_ids):
+    """Delete several tasks and their calendar mappings in one transaction."""
+    ids = [(tid,) for tid in task_ids]
+    with _write_connection() as conn:
+        c = conn.cursor()
+        _reparent_children(conn, ids)
+        c.executemany("DELETE FROM tasks WHERE id=?", ids)
+        changed = c.rowcount
+        c.executemany("DELETE FROM gc_mapping WHERE task_id=?", ids)
+        c.executemany("DELETE FROM task_exceptions WHERE task_id=?", ids)
+    if changed:
+        notify_change("bulk", None)
+    return changed
+
+
+# --- Aggregate counters (task_stats) ---
+#
+# task_stats holds one row per counter and is kept current by triggers on
+# tasks, so reading a counter never scans tasks. Keys:
+#   total, open, done          all tasks / by completion
+#   priority:<n>               open tasks per priority
+#   due:<YYYY-MM-DD>           open tasks per due date (overdue = range sum)
+#   tag:<name>                 open tasks per comma-separated tag
+
+
+def _tags_json(col):
+    # Turn a comma-separated tags value into a JSON array for json_each().
+    escaped = f"replace(replace(COALESCE({col}, ''), '\\', '\\\\'), '\"', '\\\"')"
+    for code in (9, 10, 13):
+        escaped = f"replace({escaped}, char({code}), ' ')"
+    arr = f"'[\"' || replace({escaped}, ',', '\",\"') || '\"]'"
+    return f"(CASE WHEN json_valid({arr}) THEN {arr} ELSE '[]' END)"
+
+
+def _stats_add_sql(r):
+    """Statements adding row alias r (NEW) to the counters."""
+    upsert = "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value"
+    is_open = f"COALESCE({r}.completed, 0) = 0"
+    return [
+        f"INSERT INTO task_stats (key, value) VALUES ('total', 1) {upsert};",
+        f"INSERT INTO task_stats (key, value) VALUES "
+        f"(CASE WHEN {is_open} THEN 'open' ELSE 'done' END, 1) {upsert};",
+        f"INSERT INTO task_stats (key, value) SELECT 'priority:' || COALESCE({r}.priority, 0), 1 "
+        f"WHERE {is_open} {upsert};",
+        f"INSERT INTO task_stats (key, value) SELECT 'due:' || {r}.due_date, 1 "
+        f"WHERE {is_open} AND {r}.due_date IS NOT NULL {upsert};",
+        f"INSERT INTO task_stats (key, value) SELECT 'tag:' || trim(j.value), 1 "
+        f"FROM json_each({_tags_json(r + '.tags')}) AS j "
+        f"WHERE {is_open} AND trim(j.value) <> '' {upsert};",
+    ]
+
+
+def _stats_remove_sql(r):
+    """Statements removing row alias r (OLD) from the counters, dropping emptied keys."""
+    is_open = f"COALESCE({r}.completed, 0) = 0"
+    tag_keys = (
+        f"SELECT 'tag:' || trim(j.value) FROM json_each({_tags_json(r + '.tags')}) AS j "
+        f"WHERE trim(j.value) <> ''"
+    )
+    return [
+        f"UPDATE task_stats SET value = value - 1 WHERE key IN "
+        f"('total', CASE WHEN {is_open} THEN 'open' ELSE 'done' END);",
+        f"UPDATE task_stats SET value = value - 1 WHERE {is_open} AND "
+        f"(key = 'priority:' || COALESCE({r}.priority, 0) OR key = 'due:' || {r}.due_date);",
+        f"UPDATE task_stats SET value = value - "
+        f"(SELECT COUNT(*) FROM json_each({_tags_json(r + '.tags')}) AS j "
+        f"WHERE 'tag:' || trim(j.value) = task_stats.key) "
+        f"WHERE {is_open} AND key IN ({tag_keys});",
+        f"DELETE FROM task_stats WHERE value <= 0 AND key NOT IN ('total', 'open', 'done') AND "
+        f"(key = 'priority:' || COALESCE({r}.priority, 0) OR key = 'due:' || {r}.due_date "
+        f"OR key IN ({tag_keys}));",
+    ]
+
+
+def _stats_fresh_sql():
+    """SELECT key, value computing every counter from scratch."""
+    is_open = "COALESCE(completed, 0) = 0"
+    return f"""
+        SELECT 'total', COUNT(*) FROM tasks
+        UNION ALL
+        SELECT CASE WHEN {is_open} THEN 'open' ELSE 'done' END, COUNT(*) FROM tasks GROUP BY 1
+        UNION ALL
+        SELECT 'priority:' || COALESCE(priority, 0), COUNT(*) FROM tasks WHERE {is_open} GROUP BY 1
+        UNION ALL
+        SELECT 'due:' || due_date, COUNT(*) FROM tasks
+        WHERE {is_open} AND due_date IS NOT NULL GROUP BY 1
+        UNION ALL
+        SELECT 'tag:' || trim(j.value), COUNT(*) FROM tasks, json_each({_tags_json('tasks.tags')}) AS j
+        WHERE {is_open} AND trim(j.value) <> '' GROUP BY 1
+    """
+
+
+def _ensure_stats_schema(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='task_stats'"
+    ).fetchone()
+    conn.execute("CREATE TABLE IF NOT EXISTS task_stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    add_new, remove_old = _stats_add_sql("NEW"), _stats_remove_sql("OLD")
+    triggers = {
+        "trg_task_stats_insert": ("AFTER INSERT ON tasks", add_new),
+        "trg_task_stats_delete": ("AFTER DELETE ON tasks", remove_old),
+        "trg_task_stats_update": ("AFTER UPDATE OF completed, priority, due_date, tags ON tasks",
+                                  remove_old + add_new),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {' '.join(body)} END")
+    if not exists:
+        conn.execute("INSERT INTO task_stats (key, value) " + _stats_fresh_sql())
+    conn.commit()
+
+
+def get_task_tags():
+    """{task_id: tags} for every task with a non-empty tags string (feeds the tag index)."""
+    conn = db_get_connection()
+    try:
+        return dict(conn.execute("SELECT id, tags FROM tasks WHERE tags <> ''"))
+    finally:
+        conn.close()
+
+
+def get_stats():
+    """
+    Counters from task_stats: total/open/done/overdue plus open tasks
+    by_priority {priority: n} and by_tag {tag: n}.
+    """
+    today = datetime.date.today().isoformat()
+    conn = db_get_connection()
+    c = conn.cursor()
+    fixed = dict(c.execute("SELECT key, value FROM task_stats WHERE key IN ('total', 'open', 'done')"))
+    overdue = c.execute(
+        "SELECT COALESCE(SUM(value), 0) FROM task_stats WHERE key > 'due:' AND key < ?",
+        (f"due:{today}",),
+    ).fetchone()[0]
+    by_priority = {
+        int(k[len("priority:"):]): v
+        for k, v in c.execute("SELECT key, value FROM task_stats WHERE key >= 'priority:' AND key < 'priority;'")
+        if v > 0
+    }
+    by_tag = {
+        k[len("tag:"):]: v
+        for k, v in c.execute("SELECT key, value FROM task_stats WHERE key >= 'tag:' AND key < 'tag;'")
+        if v > 0
+    }
+    conn.close()
+    return {
+        "total": fixed.get("total", 0),
+        "open": fixed.get("open", 0),
+        "done": fixed.get("done", 0),
+        "overdue": overdue,
+        "by_priority": by_priority,
+        "by_tag": by_tag,
+    }
+
+
+@busy_retry
+def check_stats(repair=False):
+    """
+    Recompute every counter from tasks and compare with task_stats.
+    Returns {key: (stored, actual)} for mismatches; with repair=True the
+    table is rebuilt from the fresh values in the same transaction.
+    """
+    with _write_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        stored = {k: v for k, v in conn.execute("SELECT key, value FROM task_stats") if v}
+        actual = {k: v for k, v in conn.execute(_stats_fresh_sql()) if v}
+        mismatches = {
+            k: (stored.get(k, 0), actual.get(k, 0))
+            for k in stored.keys() | actual.keys()
+            if stored.get(k, 0) != actual.get(k, 0)
+        }
+        if repair and mismatches:
+            conn.execute("DELETE FROM task_stats")
+            conn.executemany("INSERT INTO task_stats (key, value) VALUES (?, ?)", actual.items())
+    return mismatches
+
+
+# --- Archive of old completed tasks ---
+
+@busy_retry
+def _archive_batch(age_modifier, batch_size):
+    with _write_connection() as conn:
+        schema = _attach_archive(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        ids = [
+            (tid,) for (tid,) in conn.execute(
+                # Leaves only: a parent is archived once all its sub-tasks have been.
+                "SELECT id FROM tasks WHERE completed=1 AND updated_at < datetime('now', ?) "
+                "AND NOT EXISTS (SELECT 1 FROM tasks c WHERE c.parent_id = tasks.id) LIMIT ?",
+                (age_modifier, batch_size),
+            )
+        ]
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO {schema}.tasks_archive
+                (id, title, description, due_date, priority, tags, completed, created_at, updated_at, parent_id)
+            SELECT id, title, description, due_date, priority, tags, completed, created_at, updated_at, parent_id
+            FROM tasks WHERE id=?
+            """,
+            ids,
+        )
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {schema}.gc_mapping_archive (task_id, gc_event_id) "
+            "SELECT task_id, gc_event_id FROM gc_mapping WHERE task_id=?",
+            ids,
+        )
+        conn.executemany("DELETE FROM gc_mapping WHERE task_id=?", ids)
+        conn.executemany("DELETE FROM task_exceptions WHERE task_id=?", ids)
+        conn.executemany("DELETE FROM tasks WHERE id=?", ids)
+    return len(ids)
+
+
+def archive_completed(older_than_days=None, batch_size=200, pause=0.05, stop_event=None):
+    """
+    Move completed tasks not updated for older_than_days (default ARCHIVE_AFTER_DAYS)
+    and their gc_mapping rows into the archive. Works in short transactions of
+    batch_size rows with a pause between them so other writers are never held
+    up for long. Returns the number of tasks moved.
+    """
+    if older_than_days is None:
+        older_than_days = ARCHIVE_AFTER_DAYS
+    age_modifier = f"-{int(older_than_days)} days"
+    total = 0
+    while True:
+        moved = _archive_batch(age_modifier, batch_size)
+        total += moved
+        if moved < batch_size or (stop_event is not None and stop_event.is_set()):
+            break
+        time.sleep(pause)
+    if total:
+        notify_change("bulk", None)
+    return total
+
+
+def search_archive(query=None, filter_tag=None, limit=None, offset=0):
+    """Archived tasks (newest first) whose title/description contain query and tags contain filter_tag."""
+    conn = db_get_connection()
+    schema = _attach_archive(conn)
+    q = (f"SELECT id, title, {_list_description()}, due_date, priority, tags, completed "
+         f"FROM {schema}.tasks_archive")
+    args = []
+    where = []
+    if query:
+        where.append("(title LIKE ? OR task_description(description) LIKE ?)")
+        args += [f"%{query}%", f"%{query}%"]
+    if filter_tag:
+        where.append("tags LIKE ?")
+        args.append(f"%{filter_tag}%")
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+    args += [-1 if limit is None else limit, offset]
+    rows = conn.execute(q, args).fetchall()
+    conn.close()
+    return rows
+
+
+# --- Change feed (task_changes) ---
+#
+# Triggers append one entry per task write to task_changes, so a consumer
+# keeps a cursor (the last seq it processed) and reads only what changed
+# since, instead of re-reading tasks:
+#
+#     seq         strictly increasing (AUTOINCREMENT: never reused, even after compaction)
+#     op          insert, update or delete (a tombstone: the task is gone, archived included)
+#     task_id
+#     changed_at  UTC, as CURRENT_TIMESTAMP
+#     fields      for updates, the columns that changed ("title,completed")
+#
+# Updates that change nothing (or only updated_at) are not logged. Entries
+# carry ids, not data: consumers fetch the current rows with get_task().
+# compact_changes() drops the oldest entries; a cursor that falls behind
+# them gets ChangeFeedGap and must start over from a full read.
+
+CHANGE_FIELDS = ("title", "description", "due_date", "priority", "tags", "completed", "parent_id", "recurrence")
+
+
+class ChangeFeedGap(Exception):
+    """
+    Entries after the cursor were compacted away (or discarded by a restore):
+    take latest_change_seq(), re-read all tasks, resume from it.
+    """
+
+    def __init__(self, since, floor):
+        super().__init__(f"Changes after seq {since} are gone (the feed now starts after seq {floor})")
+        self.since = since
+        self.floor = floor
+
+
+def _ensure_change_feed_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            fields TEXT
+        )
+        """
+    )
+    changed = " || ".join(f"CASE WHEN OLD.{f} IS NOT NEW.{f} THEN ',{f}' ELSE '' END" for f in CHANGE_FIELDS)
+    any_changed = " OR ".join(f"OLD.{f} IS NOT NEW.{f}" for f in CHANGE_FIELDS)
+    triggers = {
+        "trg_task_changes_insert": ("AFTER INSERT ON tasks",
+                                    "INSERT INTO task_changes (op, task_id) VALUES ('insert', NEW.id);"),
+        "trg_task_changes_update": (f"AFTER UPDATE ON tasks WHEN {any_changed}",
+                                    f"INSERT INTO task_changes (op, task_id, fields) "
+                                    f"VALUES ('update', NEW.id, substr({changed}, 2));"),
+        "trg_task_changes_delete": ("AFTER DELETE ON tasks",
+                                    "INSERT INTO task_changes (op, task_id) VALUES ('delete', OLD.id);"),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    conn.commit()
+
+
+def change_feed_high_water(conn):
+    """Highest seq the change feed of the database behind conn has handed out (0 if none)."""
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='task_changes'").fetchone()
+    except sqlite3.OperationalError:  # no AUTOINCREMENT table created yet
+        return 0
+    return row[0] if row else 0
+
+
+def _change_floor(conn):
+    """Highest seq compacted away: the oldest entry kept follows it (0 if nothing was)."""
+    oldest = conn.execute("SELECT MIN(seq) FROM task_changes").fetchone()[0]
+    if oldest is not None:
+        return oldest - 1
+    return change_feed_high_water(conn)
+
+
+def fence_change_feed(conn, high_water):
+    """
+    For a database whose contents were just replaced wholesale (restore_backup):
+    drop its change entries and put the feed's floor at high_water + 1, its
+    seq before the replacement plus one. Every consumer then gets
+    ChangeFeedGap and re-reads, and no seq is handed out twice. Returns the
+    new floor.
+    """
+    _ensure_change_feed_schema(conn)
+    floor = max(high_water, change_feed_high_water(conn)) + 1
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM task_changes")
+        if not conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name='task_changes'", (floor,)).rowcount:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('task_changes', ?)", (floor,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return floor
+
+
+def latest_change_seq():
+    """seq of the newest change. Read it before a full read of tasks, then follow changes_since() from it."""
+    conn = db_get_connection()
+    try:
+        return change_feed_high_water(conn)
+    finally:
+        conn.close()
+
+
+def changes_since(seq=0, limit=1000):
+    """
+    Up to limit change entries after seq, oldest first, as
+    (seq, op, task_id, changed_at, fields) with fields a tuple of column
+    names (empty for inserts and deletes). Pass the last seq returned to get
+    the next page; an empty list means the consumer is up to date. Raises
+    ChangeFeedGap when entries after seq have been compacted away.
+    """
+    conn = db_get_connection()
+    try:
+        conn.execute("BEGIN")  # the floor check and the page come from one snapshot
+        floor = _change_floor(conn)
+        if seq < floor:
+            raise ChangeFeedGap(seq, floor)
+        rows = conn.execute(
+            "SELECT seq, op, task_id, changed_at, fields FROM task_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, -1 if limit is None else limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r[:4] + (tuple(r[4].split(",")) if r[4] else (),) for r in rows]
+
+
+def _compact_changes_batch(cutoff_seq, batch_size):
+    with _write_connection() as conn:
+        oldest = conn.execute("SELECT MIN(seq) FROM task_changes").fetchone()[0]
+        if oldest is None or oldest > cutoff_seq:
+            return 0
+        return conn.execute(
+            "DELETE FROM task_changes WHERE seq <= ?", (min(cutoff_seq, oldest + batch_size - 1),)
+        ).rowcount
+
+
+def compact_changes(max_age_days=None, max_rows=None, batch_size=5000, pause=0.05, stop_event=None):
+    """
+    Drop change entries older than max_age_days (default CHANGES_RETAIN_DAYS)
+    and all but the newest max_rows (default CHANGES_MAX_ROWS). Only the oldest
+    entries are ever removed, in transactions of batch_size rows. Returns the
+    number removed.
+    """
+    if max_age_days is None:
+        max_age_days = CHANGES_RETAIN_DAYS
+    if max_rows is None:
+        max_rows = CHANGES_MAX_ROWS
+    conn = db_get_connection()
+    try:
+        newest, by_age = conn.execute(
+            "SELECT MAX(seq), (SELECT MAX(seq) FROM task_changes WHERE changed_at < datetime('now', ?)) "
+            "FROM task_changes",
+            (f"-{int(max_age_days)} days",),
+        ).fetchone()
+    finally:
+        conn.close()
+    if newest is None:
+        return 0
+    cutoff = max(by_age or 0, newest - max_rows)
+    total = 0
+    while True:
+        removed = _call_with_busy_retry(_compact_changes_batch, cutoff, batch_size)
+        total += removed
+        if removed < batch_size or (stop_event is not None and stop_event.is_set()):
+            break
+        time.sleep(pause)
+    return total
+
+
+# --- Description compression migration ---
+
+@busy_retry
+def _compress_batch(archive, after_id, min_size, batch_size):
+    with _write_connection() as conn:
+        table = f"{_attach_archive(conn)}.tasks_archive" if archive else "tasks"
+        rows = conn.execute(
+            f"SELECT id, description FROM {table} WHERE id > ? AND typeof(description) = 'text' "
+            f"AND length(CAST(description AS BLOB)) >= ? ORDER BY id LIMIT ?",
+            (after_id, min_size, batch_size),
+        ).fetchall()
+        # updated_at is left alone: the content is unchanged and archiving keys on it.
+        conn.executemany(f"UPDATE {table} SET description=? WHERE id=?",
+                         [(_compress(text), tid) for tid, text in rows])
+    return rows[-1][0] if rows else None, len(rows)
+
+
+def compress_descriptions(min_size=None, batch_size=500, pause=0.01, progress=None):
+    """
+    Migration: compress the plain descriptions of at least min_size bytes
+    (default DESCRIPTION_COMPRESS_MIN) already stored in tasks and the archive,
+    batch_size rows per short write transaction. progress(n) is called after
+    each batch. Returns the number of rows rewritten; VACUUM afterwards to
+    return the freed pages to the file system.
+    """
+    min_size = DESCRIPTION_COMPRESS_MIN if min_size is None else min_size
+    if not min_size:
+        return 0
+    total = 0
+    for archive in (False, True):
+        after_id = 0
+        while after_id is not None:
+            after_id, n = _compress_batch(archive, after_id, min_size, batch_size)
+            total += n
+            if progress and n:
+                progress(total)
+            if n == batch_size:
+                time.sleep(pause)
+    return total
+
+
+# --- Sub-task hierarchy ---
+
+def get_parent_ids():
+    """Ids of all tasks that have at least one sub-task."""
+    conn = db_get_connection()
+    rows = conn.execute("SELECT DISTINCT parent_id FROM tasks WHERE parent_id IS NOT NULL").fetchall()
+    conn.close()
+    return {pid for (pid,) in rows}
+
+
+def get_subtree(task_id):
+    """
+    The task and all its descendants, depth first, as
+    (id, title, description, due_date, priority, tags, completed, parent_id, depth)
+    with list-row descriptions (None when compressed).
+    """
+    conn = db_get_connection()
+    rows = conn.execute(
+        f"""
+        WITH RECURSIVE sub(id, depth, path) AS (
+            SELECT id, 0, printf('%010d', id) FROM tasks WHERE id=?
+            UNION ALL
+            SELECT t.id, sub.depth + 1, sub.path || '/' || printf('%010d', t.id)
+            FROM tasks t JOIN sub ON t.parent_id = sub.id
+        )
+        SELECT t.id, t.title, {_list_description('t.description')}, t.due_date, t.priority, t.tags,
+               t.completed, t.parent_id, sub.depth
+        FROM sub JOIN tasks t ON t.id = sub.id
+        ORDER BY sub.path
+        """,
+        (task_id,),
+    ).fetchall()
     conn.close()
+    return rows
+
+
+def get_rollups(task_ids):
+    """
+    Rolled-up completion for each task in task_ids: {id: (done, total)} counted
+    over all descendants (the task itself when it has none).
+    """
+    ids = list(task_ids)
+    if not ids:
+        return {}
+    conn = db_get_connection()
+    rows = conn.execute(
+        """
+        WITH RECURSIVE sub(root, id, depth) AS (
+            SELECT DISTINCT value, value, 0 FROM json_each(?)
+            UNION ALL
+            SELECT sub.root, t.id, sub.depth + 1 FROM tasks t JOIN sub ON t.parent_id = sub.id
+        )
+        SELECT sub.root, MAX(sub.depth) > 0,
+               SUM(CASE WHEN sub.depth > 0 THEN t.completed <> 0 ELSE 0 END),
+               SUM(sub.depth > 0),
+               MAX(CASE WHEN sub.depth = 0 THEN t.completed <> 0 END)
+        FROM sub JOIN tasks t ON t.id = sub.id
+        GROUP BY sub.root
+        """,
+        (json.dumps(ids),),
+    ).fetchall()
+    conn.close()
+    return {
+        root: (done, total) if has_children else (int(own_done), 1)
+        for root, has_children, done, total, own_done in rows
+    }
+
+
+@busy_retry
+def set_parent(task_id, parent_id):
+    """Move a task under parent_id (None for top level). Refuses to create cycles."""
+    with _write_connection() as conn:
+        if parent_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            cycle = conn.execute(
+                """
+                WITH RECURSIVE sub(id) AS (
+                    SELECT ? UNION SELECT t.id FROM tasks t JOIN sub ON t.parent_id = sub.id
+                )
+                SELECT 1 FROM sub WHERE id=?
+                """,
+                (task_id, parent_id),
+            ).fetchone()
+            if cycle:
+                raise ValueError(f"Task {parent_id} is a sub-task of {task_id}")
+        conn.execute("UPDATE tasks SET parent_id=?, updated_at=CURRENT_TIMESTAMP WHERE id=?", (parent_id, task_id))
+    notify_change("update", task_id)
+
+
+# --- Grouped views ---
+
+GROUP_MODES = ("tag", "due", "priority")
+DUE_BUCKETS = ("overdue", "today", "week", "later", "none")
+
+
+def _due_bucket_expr():
+    today = datetime.date.today()
+    expr = (
+        "CASE WHEN due_date IS NULL OR due_date = '' THEN 'none' "
+        "WHEN due_date < ? THEN 'overdue' WHEN due_date = ? THEN 'today' "
+        "WHEN due_date <= ? THEN 'week' ELSE 'later' END"
+    )
+    return expr, [today.isoformat(), today.isoformat(), (today + datetime.timedelta(days=7)).isoformat()]
+
+
+def _group_condition(group_by, key):
+    if group_by == "priority":
+        return "COALESCE(priority, 0) = ?", [int(key)]
+    if group_by == "due":
+        expr, args = _due_bucket_expr()
+        return f"{expr} = ?", args + [key]
+    if group_by == "tag":
+        if not key:
+            return "trim(COALESCE(tags, '')) = ''", []
+        # The LIKE is a cheap pre-filter so the JSON split only runs on candidate rows.
+        return (
+            f"tags LIKE ? AND EXISTS (SELECT 1 FROM json_each({_tags_json('tasks.tags')}) AS j "
+            f"WHERE trim(j.value) = ?)",
+            [f"%{key}%", key],
+        )
+    raise ValueError(f"Unknown group mode {group_by!r}")
+
+
+def get_group_counts(group_by, filter_tag=None, show_completed=False):
+    """
+    [(key, count)] for every non-empty group, from one GROUP BY query, in
+    display order. Keys are priorities, DUE_BUCKETS names, or tag names
+    ('' for untagged tasks; a task with several tags counts in each).
+    """
+    where = []
+    args = []
+    if not show_completed:
+        where.append("completed=0")
+    if filter_tag:
+        where.append("tags LIKE ?")
+        args.append(f"%{filter_tag}%")
+    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+
+    if group_by == "priority":
+        q = f"SELECT COALESCE(priority, 0) AS k, COUNT(*) FROM tasks{where_sql} GROUP BY k ORDER BY k DESC"
+    elif group_by == "due":
+        expr, bucket_args = _due_bucket_expr()
+        q = f"SELECT {expr} AS k, COUNT(*) FROM tasks{where_sql} GROUP BY k"
+        args = bucket_args + args
+    elif group_by == "tag":
+        q = (
+            f"SELECT k, COUNT(*) FROM ("
+            f"SELECT DISTINCT tasks.id, COALESCE(trim(j.value), '') AS k FROM tasks "
+            f"LEFT JOIN json_each({_tags_json('tasks.tags')}) AS j ON trim(j.value) <> ''{where_sql}"
+            f") GROUP BY k ORDER BY k = '', k COLLATE NOCASE"
+        )
+    else:
+        raise ValueError(f"Unknown group mode {group_by!r}")
+
+    conn = db_get_connection()
+    rows = conn.execute(q, args).fetchall()
+    conn.close()
+    if group_by == "due":
+        rows.sort(key=lambda r: DUE_BUCKETS.index(r[0]))
+    return rows
+
+
+def get_group_tasks(group_by, key, filter_tag=None, show_completed=False, sort_by="default",
+                    limit=None, offset=0):
+    """One page of the tasks in group `key` of get_group_counts(group_by, ...)."""
+    conn = db_get_connection()
+    c = conn.cursor()
+    c.execute(*_tasks_query(filter_tag, show_completed, sort_by, limit, offset,
+                            condition=_group_condition(group_by, key)))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def get_upcoming_due(start_date, limit, after=None):
+    """
+    Open, non-repeating tasks due on or after start_date as (id, title, due_date, priority),
+    ordered by (due_date, id). Pass the last (due_date, id) seen as `after` to read the
+    next page; each page is one range scan of idx_tasks_open_due.
+    """
+    q = ("SELECT id, title, due_date, priority FROM tasks "
+         "WHERE completed=0 AND recurrence IS NULL AND due_date >= ?")
+    args = [start_date]
+    if after is not None:
+        q += " AND (due_date, id) > (?, ?)"
+        args.extend(after)
+    q += " ORDER BY due_date, id LIMIT ?"
+    args.append(limit)
+    conn = db_get_connection()
+    rows = conn.execute(q, args).fetchall()
+    conn.close()
+    return rows
+
+
+# --- Recurring tasks ---
+#
+# A repeating task is a single row whose due_date is the first occurrence and
+# whose recurrence column holds the rule. Completing one occurrence records it
+# in task_exceptions; occurrences are never materialised as rows.
+
+@busy_retry
+def set_recurrence(task_id, rule):
+    """Set (or clear, with a falsy rule) the recurrence rule of a task."""
+    rule = recurrence.normalize_rule(rule)
+    with _write_connection() as conn:
+        if rule:
+            row = conn.execute("SELECT due_date FROM tasks WHERE id=?", (task_id,)).fetchone()
+            if not row or not row[0]:
+                raise ValueError("A repeating task needs a due date for its first occurrence.")
+            recurrence.normalize_rule(rule, row[0])  # rejects rules that never produce a date
+        conn.execute(
+            "UPDATE tasks SET recurrence=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+            (rule, task_id),
+        )
+        if not rule:
+            conn.execute("DELETE FROM task_exceptions WHERE task_id=?", (task_id,))
+    notify_change("update", task_id)
+
+
+def get_recurrence(task_id):
+    conn = db_get_connection()
+    row = conn.execute("SELECT recurrence FROM tasks WHERE id=?", (task_id,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def get_recurrences(include_completed=False):
+    """{task_id: (rule, first_due_date)} for repeating tasks (open series only by default)."""
+    q = "SELECT id, recurrence, due_date FROM tasks WHERE recurrence IS NOT NULL"
+    if not include_completed:
+        q += " AND +completed=0"
+    conn = db_get_connection()
+    rows = conn.execute(q).fetchall()
+    conn.close()
+    return {tid: (rule, due) for tid, rule, due in rows}
+
+
+@busy_retry
+def complete_occurrence(task_id, occurrence_date, completed=True):
+    """Mark one occurrence (ISO date) of a repeating task done, or undo that."""
+    with _write_connection() as conn:
+        if completed:
+            conn.execute(
+                "INSERT OR IGNORE INTO task_exceptions (task_id, occurrence_date) VALUES (?, ?)",
+                (task_id, occurrence_date),
+            )
+        else:
+            conn.execute(
+                "DELETE FROM task_exceptions WHERE task_id=? AND occurrence_date=?",
+                (task_id, occurrence_date),
+            )
+    notify_change("update", task_id)
+
+
+def get_completed_occurrences(task_ids, start_date=None, end_date=None):
+    """{task_id: {date, ...}} of completed occurrences, optionally within [start_date, end_date)."""
+    ids = list(task_ids)
+    if not ids:
+        return {}
+    q = "SELECT task_id, occurrence_date FROM task_exceptions WHERE task_id IN (SELECT value FROM json_each(?))"
+    args = [json.dumps(ids)]
+    if start_date:
+        q += " AND occurrence_date >= ?"
+        args.append(start_date)
+    if end_date:
+        q += " AND occurrence_date < ?"
+        args.append(end_date)
+    conn = db_get_connection()
+    rows = conn.execute(q, args).fetchall()
+    conn.close()
+    done = {}
+    for tid, day in rows:
+        done.setdefault(tid, set()).add(datetime.date.fromisoformat(day))
+    return done
+
+
+def iter_occurrences(task_id, rule, first_due, start, end, completed=()):
+    """Lazily yield open occurrence dates of one series inside the [start, end) window."""
+    dtstart = datetime.date.fromisoformat(first_due)
+    for day in recurrence.occurrences(rule, dtstart, start, end):
+        if day not in completed:
+            yield day
+
+
+def get_due_counts(start_date, end_date):
+    """
+    Open-task load per due date in [start_date, end_date) (ISO strings).
+    Returns {iso_date: (count, max_priority)} from a single GROUP BY, plus the
+    open occurrences of repeating tasks generated for the window only.
+    """
+    conn = db_get_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT due_date, COUNT(*), MAX(priority) FROM tasks
+        WHERE completed=0 AND due_date >= ? AND due_date < ? AND recurrence IS NULL
+        GROUP BY due_date
+        """,
+        (start_date, end_date),
+    )
+    counts = {due: (n, prio or 0) for due, n, prio in c.fetchall()}
+    series = c.execute(
+        "SELECT id, recurrence, due_date, priority FROM tasks "
+        "WHERE +completed=0 AND recurrence IS NOT NULL AND +due_date < ?",
+        (end_date,),
+    ).fetchall()
+    conn.close()
+    if series:
+        start, end = datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date)
+        done = get_completed_occurrences([s[0] for s in series], start_date, end_date)
+        for tid, rule, due, prio in series:
+            try:
+                days = list(iter_occurrences(tid, rule, due, start, end, done.get(tid, ())))
+            except ValueError:
+                continue
+            for day in days:
+                n, max_prio = counts.get(day.isoformat(), (0, 0))
+                counts[day.isoformat()] = (n + 1, max(max_prio, prio or 0))
+    return counts
+
+
+def _month_start(year, month):
+    return f"{year:04d}-{month:02d}-01"
+
+
+def _shift_month(year, month, delta):
+    idx = year * 12 + (month - 1) + delta
+    return idx // 12, idx % 12 + 1
+
+
+class DueCountCache:
+    """
+    Month-keyed cache of get_due_counts() results for the calendar popup.
+    A miss loads the month together with its neighbours in one range query;
+    prefetch() fills in neighbours so prev/next navigation never waits on SQLite.
+    Cleared whenever a task is written through this module (or through
+    `source`, any object with get_due_counts() and add_change_listener()).
+    Change listeners run on writer threads (tag index, reminders, sync), so
+    the months are guarded by a lock; the query itself runs outside it, and a
+    result is dropped if the cache was cleared while it was being read.
+    """
+
+    def __init__(self, max_months=12, source=None):
+        self.max_months = max_months
+        self._months = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by invalidate()
+        # Looked up at call time so the traced db.get_due_counts is used.
+        self._get_due_counts = source.get_due_counts if source is not None else (
+            lambda start, end: get_due_counts(start, end))
+        (source.add_change_listener if source is not None else add_change_listener)(self._on_change)
+
+    def get(self, year, month):
+        key = (year, month)
+        with self._lock:
+            if key in self._months:
+                self._months.move_to_end(key)
+                return self._months[key]
+        counts = self._load(_shift_month(year, month, -1), _shift_month(year, month, 1))[key]
+        with self._lock:
+            if key in self._months:
+                self._months.move_to_end(key)
+        return counts
+
+    def prefetch(self, year, month):
+        with self._lock:
+            missing = [
+                _shift_month(year, month, d) for d in (-1, 1)
+                if _shift_month(year, month, d) not in self._months
+            ]
+        if missing:
+            self._load(missing[0], missing[-1])
+
+    def invalidate(self):
+        with self._lock:
+            self._months.clear()
+            self._generation += 1
+
+    def _on_change(self, op, task_id):
+        self.invalidate()
+
+    def _load(self, first, last):
+        """Query months first..last, cache them unless invalidated meanwhile, and return them."""
+        with self._lock:
+            generation = self._generation
+        end = _shift_month(*last, 1)
+        counts = self._get_due_counts(_month_start(*first), _month_start(*end))
+        months = {}
+        ym = first
+        while ym != end:
+            months[ym] = {}
+            ym = _shift_month(*ym, 1)
+        for due, value in counts.items():
+            try:
+                key, day = (int(due[:4]), int(due[5:7])), int(due[8:10])
+            except ValueError:
+                continue
+            if key in months:
+                months[key][day] = value
+        with self._lock:
+            if generation == self._generation:
+                self._months.update(months)
+                while len(self._months) > self.max_months:
+                    self._months.popitem(last=False)
+        return months
+
+
+@busy_retry
+def map_task_to_gc(task_id, event_id):
+    with _write_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO gc_mapping (task_id, gc_event_id) VALUES (?, ?)",
+            (task_id, event_id),
+        )
 
 
 def get_gc_event_id(task_id):
@@ -136,3 +1691,20 @@ def get_gc_event_id(task_id):
     r = c.fetchone()
     conn.close()
     return r[0] if r else None
+
+
+# Public queries and writes are traced as "db.<name>" spans (a no-op check while
+# tracing is off). iter_tasks/iter_occurrences are generators and are left alone.
+_TRACED = (
+    "add_task", "update_task", "delete_task", "get_task", "get_tasks", "search_tasks", "fuzzy_search_titles",
+    "add_tasks_bulk", "set_completed_bulk", "delete_tasks_bulk",
+    "get_stats", "get_task_tags", "get_due_counts", "get_upcoming_due", "get_group_counts", "get_group_tasks",
+    "get_parent_ids", "get_subtree", "get_rollups", "set_parent",
+    "set_recurrence", "get_recurrence", "get_recurrences", "complete_occurrence", "get_completed_occurrences",
+    "archive_completed", "search_archive", "compress_descriptions",
+    "latest_change_seq", "changes_since", "compact_changes",
+    "map_task_to_gc", "get_gc_event_id",
+)
+for _name in _TRACED:
+    globals()[_name] = tracing.traced(f"db.{_name}", rows=True)(globals()[_name])
+del _name
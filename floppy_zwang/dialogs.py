@@ -1,76 +1,120 @@
 import datetime
 import tkinter as tk
-from tkinter import ttk
+from tkinter import messagebox, ttk
 
+from recurrence import PRESETS, normalize_rule
 from widgets import DateEntry
 from widgets import PlaceholderEntry
+from widgets import TagCompleter
 
 class EditDialog:
-    def __init__(self, parent, task_row, on_save):
+    """
+    Task editor window. The form is built once; open() repopulates it for
+    another task and Save/Cancel only hide the window so it can be reused.
+    """
+
+    def __init__(self, parent, task_row, on_save, store, tag_index=None):
         self.parent = parent
-        self.task_row = task_row
-        self.on_save = on_save
+        self.store = store
+        self.tag_index = tag_index
 
         self.window = tk.Toplevel(parent)
+        self.window.withdraw()
         self.window.title("Edit Task")
         self.window.transient(parent)
-        self.window.grab_set()
         self.window.protocol("WM_DELETE_WINDOW", self.cancel)
 
         self.build_ui()
+        self.open(task_row, on_save)
+
+    def exists(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def open(self, task_row, on_save=None):
+        self.task_row = task_row
+        if on_save is not None:
+            self.on_save = on_save
+        self.populate(task_row)
 
         self.window.update_idletasks()
         self.window.deiconify()
+        self.window.grab_set()
         self.window.focus_force()
 
     def build_ui(self):
-        tid, title, desc, due, priority, tags, completed = self.task_row
-
         frm = ttk.Frame(self.window, padding=10)
         frm.pack(fill="both", expand=True)
 
         ttk.Label(frm, text="Title:").grid(row=0, column=0, sticky="w")
         self.title_e = ttk.Entry(frm, width=60)
-        self.title_e.insert(0, title or "")
         self.title_e.grid(row=0, column=1, columnspan=3, sticky="we", padx=4, pady=2)
 
         ttk.Label(frm, text="Due date:").grid(row=1, column=0, sticky="w")
-        self.due_e = DateEntry(frm)
-        if due:
-            try:
-                self.due_e.set_date(datetime.datetime.strptime(due, "%Y-%m-%d").date())
-            except Exception:
-                self.due_e.set_date(due)
+        self.due_e = DateEntry(frm, day_counts=self.store.due_counts)
         self.due_e.grid(row=1, column=1, sticky="w", padx=4, pady=2)
 
         ttk.Label(frm, text="Priority:").grid(row=1, column=2, sticky="w")
         self.priority_e = ttk.Spinbox(frm, from_=0, to=5, width=4)
-        self.priority_e.delete(0, "end")
-        self.priority_e.insert(0, str(priority or 0))
         self.priority_e.grid(row=1, column=3, sticky="w", padx=4, pady=2)
 
         ttk.Label(frm, text="Tags:").grid(row=2, column=0, sticky="w")
         self.tags_e = ttk.Entry(frm, width=40)
-        self.tags_e.insert(0, tags or "")
         self.tags_e.grid(row=2, column=1, sticky="w", padx=4, pady=2)
+        if self.tag_index is not None:
+            TagCompleter(self.tags_e, self.tag_index)
 
         ttk.Label(frm, text="Completed:").grid(row=2, column=2, sticky="w")
-        self.completed_var = tk.IntVar(value=1 if completed else 0)
+        self.completed_var = tk.IntVar(value=0)
         ttk.Checkbutton(frm, variable=self.completed_var).grid(row=2, column=3, sticky="w", padx=4, pady=2)
 
-        ttk.Label(frm, text="Description:").grid(row=3, column=0, sticky="nw", pady=(6,0))
+        ttk.Label(frm, text="Repeat:").grid(row=3, column=0, sticky="w")
+        # Presets or any RRULE body, e.g. FREQ=WEEKLY;BYDAY=MO,WE
+        self.repeat_e = ttk.Combobox(frm, width=38, values=[""] + list(PRESETS))
+        self.repeat_e.grid(row=3, column=1, sticky="w", padx=4, pady=2)
+
+        ttk.Label(frm, text="Description:").grid(row=4, column=0, sticky="nw", pady=(6,0))
         self.desc_e = tk.Text(frm, width=60, height=8)
-        self.desc_e.insert("1.0", desc or "")
-        self.desc_e.grid(row=3, column=1, columnspan=3, sticky="we", padx=4, pady=2)
+        self.desc_e.grid(row=4, column=1, columnspan=3, sticky="we", padx=4, pady=2)
 
         btn_frame = ttk.Frame(frm)
-        btn_frame.grid(row=4, column=1, columnspan=3, sticky="e", pady=(8, 0))
+        btn_frame.grid(row=5, column=1, columnspan=3, sticky="e", pady=(8, 0))
 
         ttk.Button(btn_frame, text="Save", command=self.ok).pack(side="right", padx=(4,0))
         ttk.Button(btn_frame, text="Cancel", command=self.cancel).pack(side="right")
 
         frm.columnconfigure(1, weight=1)
 
+    def populate(self, task_row):
+        tid, title, desc, due, priority, tags, completed = task_row
+
+        self.title_e.delete(0, "end")
+        self.title_e.insert(0, title or "")
+
+        self.due_e.set_date("")
+        if due:
+            try:
+                self.due_e.set_date(datetime.datetime.strptime(due, "%Y-%m-%d").date())
+            except Exception:
+                self.due_e.set_date(due)
+
+        self.priority_e.delete(0, "end")
+        self.priority_e.insert(0, str(priority or 0))
+
+        self.tags_e.delete(0, "end")
+        self.tags_e.insert(0, tags or "")
+
+        self.completed_var.set(1 if completed else 0)
+
+        rule = self.store.get_recurrence(tid) if tid is not None else None
+        preset = {v: k for k, v in PRESETS.items()}.get(rule)
+        self.repeat_e.set(preset or rule or "")
+
+        self.desc_e.delete("1.0", "end")
+        self.desc_e.insert("1.0", desc or "")
+
     def ok(self):
         tid, *_ = self.task_row
         due_val = ""
@@ -91,9 +135,23 @@ class EditDialog:
             int(bool(self.completed_var.get())),
         )
         try:
-            self.on_save(data)
+            rule = normalize_rule(self.repeat_e.get())
+            if rule and data[3]:
+                normalize_rule(rule, data[3])
+        except ValueError as e:
+            messagebox.showerror("Repeat", str(e), parent=self.window)
+            return
+        if rule and not data[3]:
+            messagebox.showerror("Repeat", "A repeating task needs a due date.", parent=self.window)
+            return
+        try:
+            self.on_save(data, rule)
         finally:
-            self.window.destroy()
+            self.hide()
 
     def cancel(self):
-        self.window.destroy()
+        self.hide()
+
+    def hide(self):
+        self.window.grab_release()
+        self.window.withdraw()
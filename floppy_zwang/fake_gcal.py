@@ -0,0 +1,371 @@
+"""
+Local stand-in for the Google Calendar v3 API (stdlib only), so the sync code
+can be run, timed and broken on purpose without a Google account.
+
+    python -m floppy_zwang fake-gcal [--port 8099] [--profile flaky]
+    FLOPPY_ZWANG_GCAL_URL=http://127.0.0.1:8099/ python -m floppy_zwang sync 1 2 3
+
+With FLOPPY_ZWANG_GCAL_URL set, google_sync.google_get_service() builds the
+real client against this server with dummy credentials. Implemented calls,
+with the request and response shapes googleapiclient expects:
+
+    POST   /calendar/v3/calendars/<cal>/events           insert
+    GET    /calendar/v3/calendars/<cal>/events/<id>      get
+    PATCH  /calendar/v3/calendars/<cal>/events/<id>      patch
+    DELETE /calendar/v3/calendars/<cal>/events/<id>      delete
+    GET    /calendar/v3/calendars/<cal>/events           list: maxResults, pageToken,
+                                                         showDeleted, syncToken -> nextSyncToken
+    POST   /batch/calendar/v3                            multipart/mixed batch of the above
+
+Events live in memory. Every change gets a sequence number; a sync token is
+the sequence a listing ended at, so an incremental list returns what changed
+since (deleted events as status "cancelled"), and an unknown token answers
+410 fullSyncRequired.
+
+A FaultProfile adds latency to every HTTP request, fails a fraction of API
+calls with 429 or 500/503, and enforces a per-minute quota answering 403
+rateLimitExceeded, with Google's error bodies. Batch parts are counted and
+failed one by one, as the real API does. FakeCalendar.stats counts calls and
+answers by status.
+"""
+import collections
+import email.parser
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.client import responses
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8099
+MAX_RESULTS = 250
+MAX_BATCH = 1000
+QUOTA_WINDOW = 60.0
+
+
+class FaultProfile:
+    def __init__(self, name, latency_ms=0, jitter_ms=0, error_rate=0.0, throttle_rate=0.0, quota_per_minute=None):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate              # calls answered 500/503
+        self.throttle_rate = throttle_rate        # calls answered 429
+        self.quota_per_minute = quota_per_minute  # calls over this answer 403 rateLimitExceeded
+
+    def __repr__(self):
+        return (f"FaultProfile({self.name!r}, latency_ms={self.latency_ms}, jitter_ms={self.jitter_ms}, "
+                f"error_rate={self.error_rate}, throttle_rate={self.throttle_rate}, "
+                f"quota_per_minute={self.quota_per_minute})")
+
+
+PROFILES = {
+    "clean": FaultProfile("clean"),
+    "slow": FaultProfile("slow", latency_ms=150, jitter_ms=100),
+    "flaky": FaultProfile("flaky", latency_ms=30, jitter_ms=20, error_rate=0.05),
+    "throttled": FaultProfile("throttled", latency_ms=30, jitter_ms=20, throttle_rate=0.10),
+    "quota": FaultProfile("quota", latency_ms=30, jitter_ms=20, quota_per_minute=300),
+    "hostile": FaultProfile("hostile", latency_ms=80, jitter_ms=60, error_rate=0.05, throttle_rate=0.05,
+                            quota_per_minute=600),
+}
+
+
+class CalendarError(Exception):
+    def __init__(self, status, reason, message, domain="global"):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.domain = domain
+
+    def body(self):
+        return {"error": {
+            "errors": [{"domain": self.domain, "reason": self.reason, "message": str(self)}],
+            "code": self.status,
+            "message": str(self),
+        }}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class FakeCalendar:
+    """The events of every calendar, plus fault injection and counters. Thread-safe."""
+
+    def __init__(self, profile="clean", seed=None):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._events = {}       # calendar id -> {event id: event dict}
+        self._seq = 0
+        self._calls = collections.deque()  # call times inside the quota window
+        self.stats = collections.Counter()
+
+    # --- faults ---
+
+    def delay(self):
+        p = self.profile
+        if p.latency_ms or p.jitter_ms:
+            with self._lock:
+                ms = p.latency_ms + self._rng.uniform(0, p.jitter_ms)
+            time.sleep(ms / 1000)
+
+    def _check_faults(self):
+        p = self.profile
+        if p.quota_per_minute:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] > QUOTA_WINDOW:
+                self._calls.popleft()
+            if len(self._calls) >= p.quota_per_minute:
+                raise CalendarError(403, "rateLimitExceeded", "Rate Limit Exceeded", domain="usageLimits")
+            self._calls.append(now)
+        roll = self._rng.random()
+        if roll < p.throttle_rate:
+            raise CalendarError(429, "rateLimitExceeded", "Rate Limit Exceeded", domain="usageLimits")
+        if roll < p.throttle_rate + p.error_rate:
+            status = self._rng.choice((500, 503))
+            raise CalendarError(status, "backendError", "Backend Error")
+
+    # --- API calls ---
+
+    def call(self, method, path, query, body):
+        """One API call; returns (status, response dict or None). Faults are raised as CalendarError."""
+        parts = [unquote(p) for p in path.split("/") if p]
+        if parts[:3] != ["calendar", "v3", "calendars"] or len(parts) not in (5, 6) or parts[4] != "events":
+            raise CalendarError(404, "notFound", "Not Found")
+        cal, event_id = parts[3], (parts[5] if len(parts) == 6 else None)
+        with self._lock:
+            self.stats["calls"] += 1
+            self._check_faults()
+            events = self._events.setdefault(cal, {})
+            if event_id is None:
+                if method == "POST":
+                    return 200, self._insert(events, body)
+                if method == "GET":
+                    return 200, self._list(events, query)
+            elif method in ("GET", "PATCH", "PUT", "DELETE"):
+                event = events.get(event_id)
+                if event is None or (event["status"] == "cancelled" and method != "GET"):
+                    raise CalendarError(404 if event is None else 410, "notFound" if event is None else "deleted",
+                                        "Not Found" if event is None else "Resource has been deleted")
+                if method == "GET":
+                    return 200, self._public(event)
+                if method == "DELETE":
+                    self._touch(event, {"status": "cancelled"})
+                    return 204, None
+                if method == "PUT":
+                    event = {k: v for k, v in event.items() if k.startswith("_") or k in ("kind", "id", "status", "created", "htmlLink")}
+                    events[event_id] = event
+                self._touch(event, body or {})
+                return 200, self._public(event)
+        raise CalendarError(405, "methodNotAllowed", "Method Not Allowed")
+
+    def _touch(self, event, changes):
+        self._seq += 1
+        event.update({k: v for k, v in changes.items() if k not in ("id", "kind", "etag", "created", "updated")})
+        event["_seq"] = self._seq
+        event["sequence"] = event.get("sequence", -1) + 1
+        event["updated"] = _now()
+        event["etag"] = f'"{self._seq}"'
+
+    def _insert(self, events, body):
+        body = body or {}
+        if "start" not in body or "end" not in body:
+            raise CalendarError(400, "required", "Missing end time." if "start" in body else "Missing start time.")
+        event_id = body.get("id") or uuid.uuid4().hex
+        if event_id in events:
+            raise CalendarError(409, "duplicate", "The requested identifier already exists.")
+        event = events[event_id] = {"kind": "calendar#event", "id": event_id, "status": "confirmed",
+                                    "created": _now(), "htmlLink": f"http://fake-gcal/event?eid={event_id}"}
+        self._touch(event, body)
+        return self._public(event)
+
+    def _list(self, events, query):
+        limit = min(int(query.get("maxResults", MAX_RESULTS)), MAX_RESULTS)
+        if "pageToken" in query:
+            try:
+                offset, since, upto = (int(x) for x in query["pageToken"].split("."))
+            except ValueError:
+                raise CalendarError(400, "invalid", "Invalid page token value.")
+        else:
+            offset, upto = 0, self._seq
+            since = self._since(query["syncToken"]) if "syncToken" in query else 0
+        incremental = since > 0 or "syncToken" in query
+        show_deleted = incremental or query.get("showDeleted", "false").lower() == "true"
+        changed = sorted((e for e in events.values()
+                          if since < e["_seq"] <= upto and (show_deleted or e["status"] != "cancelled")),
+                         key=lambda e: e["_seq"])
+        page = changed[offset:offset + limit]
+        out = {"kind": "calendar#events", "updated": _now(), "items": [self._public(e) for e in page]}
+        if offset + limit < len(changed):
+            out["nextPageToken"] = f"{offset + limit}.{since}.{upto}"
+        else:
+            out["nextSyncToken"] = f"s{upto}"
+        return out
+
+    def _since(self, token):
+        try:
+            since = int(token[1:]) if token.startswith("s") else -1
+        except ValueError:
+            since = -1
+        if not 0 <= since <= self._seq:
+            raise CalendarError(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+        return since
+
+    @staticmethod
+    def _public(event):
+        return {k: v for k, v in event.items() if not k.startswith("_")}
+
+    def events(self, calendar_id="primary", deleted=False):
+        with self._lock:
+            return [self._public(e) for e in self._events.get(calendar_id, {}).values()
+                    if deleted or e["status"] != "cancelled"]
+
+    def answer(self, method, path, query, body):
+        """call() with errors turned into Google's error responses; counts the status."""
+        try:
+            status, out = self.call(method, path, query, body)
+        except CalendarError as e:
+            status, out = e.status, e.body()
+        except (ValueError, TypeError, KeyError) as e:
+            status, out = 400, CalendarError(400, "invalid", str(e)).body()
+        with self._lock:
+            self.stats[status] += 1
+        return status, out
+
+
+def _parse_batch(content_type, payload):
+    """The parts of a multipart/mixed batch as (content id, method, path, query, body)."""
+    msg = email.parser.BytesParser().parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n"
+                                               + payload)
+    if not msg.is_multipart():
+        raise CalendarError(400, "invalid", "Batch request must be multipart/mixed.")
+    parts = []
+    for part in msg.get_payload():
+        inner = part.get_payload()
+        if isinstance(inner, list):
+            raise CalendarError(400, "invalid", "Nested multipart batch parts are not supported.")
+        request_line, _, rest = inner.replace("\r\n", "\n").partition("\n")
+        method, target = request_line.split()[:2]
+        headers, _, body = rest.partition("\n\n")
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts.append((part.get("Content-ID", ""), method.upper(), url.path, query,
+                      json.loads(body) if body.strip() else None))
+    return parts
+
+
+def _batch_response(answers):
+    boundary = f"batch_{uuid.uuid4().hex}"
+    chunks = []
+    for content_id, status, out in answers:
+        payload = "" if out is None else json.dumps(out)
+        inner = f"HTTP/1.1 {status} {responses.get(status, '')}\r\n"
+        if out is not None:
+            inner += f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(payload.encode())}\r\n"
+        rid = f"<response-{content_id.strip('<>')}>" if content_id else ""
+        chunks.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                      + (f"Content-ID: {rid}\r\n" if rid else "")
+                      + f"\r\n{inner}\r\n{payload}\r\n")
+    chunks.append(f"--{boundary}--\r\n")
+    return f"multipart/mixed; boundary={boundary}", "".join(chunks).encode("utf-8")
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    server_version = "fake-gcal"
+    protocol_version = "HTTP/1.1"
+    # Keep-alive connections: headers and body go out in separate writes.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+    def _handle(self, method):
+        calendar = self.server.calendar
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = self.rfile.read(length) if length else b""
+        calendar.delay()
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") in ("/batch/calendar/v3", "/batch") and method == "POST":
+            try:
+                parts = _parse_batch(self.headers.get("Content-Type", ""), payload)
+                if len(parts) > MAX_BATCH:
+                    raise CalendarError(400, "invalid", f"A batch may hold at most {MAX_BATCH} requests.")
+            except CalendarError as e:
+                self._send(e.status, "application/json", json.dumps(e.body()).encode("utf-8"))
+                return
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send(400, "application/json",
+                           json.dumps(CalendarError(400, "invalid", str(e)).body()).encode("utf-8"))
+                return
+            with calendar._lock:
+                calendar.stats["batches"] += 1
+            answers = [(cid, *calendar.answer(m, path, query, body)) for cid, m, path, query, body in parts]
+            self._send(200, *_batch_response(answers))
+            return
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = json.loads(payload) if payload.strip() else None
+        except ValueError as e:
+            status, out = 400, CalendarError(400, "parseError", str(e)).body()
+        else:
+            status, out = calendar.answer(method, url.path, query, body)
+        self._send(status, "application/json; charset=UTF-8", b"" if out is None else json.dumps(out).encode("utf-8"))
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        if payload:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, profile="clean", seed=None):
+    """A ThreadingHTTPServer whose .calendar is the FakeCalendar it serves; port 0 picks a free one."""
+    server = ThreadingHTTPServer((host, port), FakeCalendarHandler)
+    server.daemon_threads = True
+    server.calendar = FakeCalendar(profile, seed)
+    server.url = f"http://{host}:{server.server_address[1]}/"
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, profile="clean", seed=None):
+    """make_server() running on a daemon thread. Call .shutdown() when done."""
+    server = make_server(host, port, profile, seed)
+    threading.Thread(target=server.serve_forever, name="fake-gcal", daemon=True).start()
+    return server
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, profile="clean", seed=None):
+    server = make_server(host, port, profile, seed)
+    logger.info("Fake Google Calendar on %s (%r)", server.url, server.calendar.profile)
+    logger.info("Point the sync code at it with FLOPPY_ZWANG_GCAL_URL=%s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Answered: %s", dict(server.calendar.stats))
@@ -1,13 +1,23 @@
 import os
 import pickle
 import datetime
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from db import get_gc_event_id, map_task_to_gc
+import logging
+import random
+import time
+
+from tracing import traced
+
+logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
+# Talk to this endpoint (e.g. fake_gcal's http://127.0.0.1:8099/) with dummy credentials instead of Google.
+GCAL_URL = os.environ.get("FLOPPY_ZWANG_GCAL_URL") or None
+# Retries (exponential backoff) for 429, 5xx and 403 rateLimitExceeded answers.
+SYNC_RETRIES = int(os.environ.get("FLOPPY_ZWANG_SYNC_RETRIES", "5"))
+# Calendar accepts up to 50 calls per batch request.
+SYNC_BATCH_SIZE = 50
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SECRETS_DIR = os.path.join(BASE_DIR, "..", "secrets")
 
@@ -15,7 +25,26 @@ CREDENTIALS_FILE = os.path.join(SECRETS_DIR, "credentials.json")
 TOKEN_PICKLE = os.path.join(SECRETS_DIR, "token.pickle")
 
 
+@traced("sync.google_get_service")
 def google_get_service():
+    # Imported here so task_to_event_body() works without the Google client libraries.
+    try:
+        from googleapiclient.discovery import build
+    except ImportError as e:
+        raise RuntimeError("Google client libraries not installed. Run:\n"
+                           "pip install google-api-python-client google-auth-httplib2 google-auth-oauthlib") from e
+
+    if GCAL_URL:
+        from google.auth.credentials import AnonymousCredentials
+
+        logger.debug("Using the Calendar API at %s with dummy credentials", GCAL_URL)
+        return build("calendar", "v3", credentials=AnonymousCredentials(),
+                     client_options={"api_endpoint": GCAL_URL.rstrip("/") + "/calendar/v3/"},
+                     cache_discovery=False)
+
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     if os.path.exists(TOKEN_PICKLE):
         with open(TOKEN_PICKLE, "rb") as f:
@@ -25,7 +54,8 @@ def google_get_service():
         if creds and creds.expired and creds.refresh_token:
             try:
                 creds.refresh(Request())
-            except Exception:
+            except Exception as e:
+                logger.warning("Refreshing the Google token failed, signing in again: %s", e)
                 creds = None
 
         if not creds:
@@ -38,17 +68,21 @@ def google_get_service():
     return build("calendar", "v3", credentials=creds)
 
 
-def task_to_event_body(task):
+def task_to_event_body(task, recurrence=None):
     tid, title, desc, due, priority, tags, completed = task
 
     if due:
         dt = datetime.datetime.strptime(due, "%Y-%m-%d").date()
-        return {
+        body = {
             "summary": f"[Task] {title}",
             "description": (desc or "") + f"\n\nTags: {tags or ''}",
             "start": {"date": dt.isoformat()},
             "end": {"date": (dt + datetime.timedelta(days=1)).isoformat()},
         }
+        if recurrence:
+            # One recurring event per series; Calendar expands the occurrences.
+            body["recurrence"] = [f"RRULE:{recurrence}"]
+        return body
     else:
         now = datetime.datetime.now().replace(hour=18, minute=0, second=0, microsecond=0)
         return {
@@ -59,19 +93,122 @@ def task_to_event_body(task):
         }
 
 
-def push_task_to_google(task):
-    service = google_get_service()
-    event_body = task_to_event_body(task)
-    existing_id = get_gc_event_id(task[0])
+def _status(exc):
+    return getattr(getattr(exc, "resp", None), "status", None)
+
+
+def _retryable(exc):
+    status = _status(exc)
+    if status is None:
+        return isinstance(exc, OSError)
+    if status == 403:
+        content = getattr(exc, "content", b"") or b""
+        return b"rateLimitExceeded" in content or b"RateLimitExceeded" in content
+    return status == 429 or status >= 500
+
+
+def _gone(exc):
+    """The mapped event no longer exists on the calendar."""
+    return _status(exc) in (404, 410)
+
+
+@traced("sync.push_task_to_google")
+def push_task_to_google(task, store, service=None):
+    service = service or google_get_service()
+    event_body = task_to_event_body(task, store.get_recurrence(task[0]))
+    existing_id = store.get_gc_event_id(task[0])
 
     if existing_id:
         try:
             updated = service.events().patch(
                 calendarId="primary", eventId=existing_id, body=event_body
-            ).execute()
+            ).execute(num_retries=SYNC_RETRIES)
             return updated["id"]
-        except Exception:
-            pass
+        except Exception as e:
+            if not _gone(e):
+                raise
+            logger.info("Event %s of task %s is gone from the calendar; creating a new one", existing_id, task[0])
 
-    created = service.events().insert(calendarId="primary", body=event_body).execute()
+    created = service.events().insert(calendarId="primary", body=event_body).execute(num_retries=SYNC_RETRIES)
     return created["id"]
+
+
+@traced("sync.push_tasks_to_google", rows=True)
+def push_tasks_to_google(tasks, store, service=None, batch_size=SYNC_BATCH_SIZE):
+    """
+    push_task_to_google() for many tasks, batch_size calls per HTTP request.
+    Parts that fail with a retryable status are resent with backoff, up to
+    SYNC_RETRIES times. Returns [(task id, event id or the exception)] in
+    task order.
+    """
+    service = service or google_get_service()
+    results = {}
+    pending = [(task, store.get_gc_event_id(task[0])) for task in tasks]
+    for attempt in range(SYNC_RETRIES + 1):
+        if attempt:
+            delay = random.random() * 2 ** attempt
+            logger.info("Retrying %d calendar call(s) in %.1f s (attempt %d of %d)",
+                        len(pending), delay, attempt, SYNC_RETRIES)
+            time.sleep(delay)
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            retry.extend(_push_batch(service, store, pending[start:start + batch_size], results))
+        pending = retry
+        if not pending:
+            break
+    failed = [(task[0], results[task[0]]) for task in tasks if not isinstance(results[task[0]], str)]
+    for tid, error in failed:
+        logger.warning("Pushing task %s to Google Calendar failed: %s", tid, error)
+    logger.info("Pushed %d of %d task(s) to Google Calendar", len(tasks) - len(failed), len(tasks))
+    return [(task[0], results[task[0]]) for task in tasks]
+
+
+def _new_batch(service, callback):
+    if not GCAL_URL:
+        return service.new_batch_http_request(callback=callback)
+    # new_batch_http_request() takes its URL from the discovery document, not from api_endpoint.
+    from googleapiclient.http import BatchHttpRequest
+
+    return BatchHttpRequest(callback=callback, batch_uri=GCAL_URL.rstrip("/") + "/batch/calendar/v3")
+
+
+def _push_batch(service, store, chunk, results):
+    """One batch request; returns the (task, existing id) pairs to send again."""
+    retry = []
+    by_id = {}
+    answered = set()
+
+    def done(request_id, response, exception):
+        task, existing_id = by_id[request_id]
+        answered.add(task[0])
+        if exception is None:
+            results[task[0]] = response["id"]
+            return
+        results[task[0]] = exception
+        logger.debug("Calendar call for task %s failed: %s", task[0], exception)
+        if existing_id and _gone(exception):
+            retry.append((task, None))  # deleted on the calendar: create it again
+        elif _retryable(exception):
+            retry.append((task, existing_id))
+
+    batch = _new_batch(service, done)
+    for task, existing_id in chunk:
+        body = task_to_event_body(task, store.get_recurrence(task[0]))
+        if existing_id:
+            request = service.events().patch(calendarId="primary", eventId=existing_id, body=body)
+        else:
+            request = service.events().insert(calendarId="primary", body=body)
+        by_id[str(task[0])] = (task, existing_id)
+        batch.add(request, request_id=str(task[0]))
+    try:
+        batch.execute()
+    except Exception as e:
+        # The whole request failed (connection, 5xx on the batch itself): resend what got no answer.
+        if not _retryable(e):
+            raise
+        logger.debug("Batch request failed: %s", e)
+        for task, existing_id in chunk:
+            if task[0] not in answered:
+                results[task[0]] = e
+                retry.append((task, existing_id))
+    return retry
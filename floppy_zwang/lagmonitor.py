@@ -0,0 +1,222 @@
+"""
+Main-loop lag monitor for the Tk UI.
+
+A heartbeat scheduled with root.after() every `interval_ms` measures how late
+it runs; that lateness is the event-loop latency. A watchdog thread notices
+when the heartbeat has not run for `threshold_ms` and samples the main
+thread's Python stack (sys._current_frames) while the stall lasts, so the
+report shows what was running: load_tasks, a db.py query, tree inserts...
+When the loop comes back, the stall is queued as one JSON line for a
+rotating log file (STALL_LOG_BYTES x STALL_LOG_BACKUPS), written off the
+Tk thread.
+
+The optional overlay is a status label showing loop latency, the last timed
+query, rows rendered by the last load and running background jobs.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+STALL_THRESHOLD_MS = int(os.environ.get("FLOPPY_ZWANG_STALL_MS", "250"))
+STALL_LOG = os.environ.get("FLOPPY_ZWANG_STALL_LOG") or None
+STALL_LOG_BYTES = 1024 * 1024
+STALL_LOG_BACKUPS = 3
+HEARTBEAT_MS = 100
+# Stack samples kept per stall (the first and then one per threshold interval).
+MAX_SAMPLES = 5
+OVERLAY_REFRESH_MS = 500
+
+
+_stall_listeners = {}  # report path -> QueueListener writing that file
+
+
+def _stall_logger(path):
+    """
+    Logger for the JSON stall lines of one report file. Records are queued and
+    written by a listener thread, like the rest of the app's logging
+    (logconfig), so reporting a stall never does file I/O on the Tk thread.
+    """
+    log = logging.getLogger(f"{__name__}.stalls.{path}")
+    if path not in _stall_listeners:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=STALL_LOG_BYTES, backupCount=STALL_LOG_BACKUPS, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(records, handler)
+        listener.start()
+        _stall_listeners[path] = listener
+        log.addHandler(logging.handlers.QueueHandler(records))
+        log.setLevel(logging.INFO)
+        # The one-line summary goes to the main log from _report(); the JSON stays in this file.
+        log.propagate = False
+    return log
+
+
+def _close_stall_logs():
+    while _stall_listeners:
+        _, listener = _stall_listeners.popitem()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(_close_stall_logs)
+
+
+class LagMonitor:
+    def __init__(self, root, threshold_ms=STALL_THRESHOLD_MS, interval_ms=HEARTBEAT_MS, report_path=STALL_LOG,
+                 label=None):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.report_path = report_path
+        self.label = label
+
+        # Read by the overlay; written on the main thread (jobs from workers, under _lock).
+        self.latency = 0.0       # lateness of the last heartbeat, seconds
+        self.max_latency = 0.0   # since the overlay last refreshed
+        self.last_query = None   # (name, seconds)
+        self.rows_rendered = 0
+        self.jobs = 0
+        self.stalls = 0
+
+        self._lock = threading.Lock()
+        self._main_ident = threading.main_thread().ident
+        self._last_beat = None
+        self._stall = None       # {"since": beat time, "samples": [...]} while stalled
+        self._after_id = None
+        self._overlay_id = None
+        self._stop = threading.Event()
+        self._watchdog = None
+        self._reports = _stall_logger(report_path) if report_path else None
+
+    def start(self):
+        self._last_beat = time.perf_counter()
+        self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+        self._watchdog = threading.Thread(target=self._watch, name="lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        for job in (self._after_id, self._overlay_id):
+            if job is not None:
+                try:
+                    self.root.after_cancel(job)
+                except Exception:
+                    pass
+        self._after_id = self._overlay_id = None
+
+    # --- what the app reports ---
+
+    @contextmanager
+    def query(self, name):
+        """Time a store call made on the main thread for the overlay."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last_query = (name, time.perf_counter() - t0)
+
+    def job(self, fn):
+        """Wrap a background worker so it is counted as a pending job while it runs."""
+        def run(*args, **kwargs):
+            with self._lock:
+                self.jobs += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.jobs -= 1
+        return run
+
+    # --- heartbeat (main thread) ---
+
+    def _beat(self):
+        now = time.perf_counter()
+        late = max(0.0, now - self._last_beat - self.interval)
+        self.latency = late
+        self.max_latency = max(self.max_latency, late)
+        with self._lock:
+            stall, self._stall = self._stall, None
+            self._last_beat = now
+        if stall is not None:
+            self._report(stall, late)
+        if not self._stop.is_set():
+            self._after_id = self.root.after(int(self.interval * 1000), self._beat)
+
+    # --- watchdog (background thread) ---
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                since = self._last_beat
+                stalled_for = time.perf_counter() - since - self.interval
+                if stalled_for < self.threshold:
+                    continue
+                if self._stall is None or self._stall["since"] != since:
+                    self._stall = {"since": since, "samples": []}
+                samples = self._stall["samples"]
+                due = len(samples) < MAX_SAMPLES and stalled_for >= self.threshold * (len(samples) + 1)
+            if due:
+                stack = self._main_stack()
+                with self._lock:
+                    if self._stall is not None and self._stall["since"] == since:
+                        samples.append({"at_ms": round(stalled_for * 1000), "stack": stack})
+
+    def _main_stack(self):
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return []
+        return [line.rstrip() for line in traceback.format_stack(frame)]
+
+    def _report(self, stall, duration):
+        self.stalls += 1
+        query = {"name": self.last_query[0], "ms": round(self.last_query[1] * 1000, 1)} if self.last_query else None
+        record = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000),
+            "threshold_ms": round(self.threshold * 1000),
+            "last_query": query,
+            "rows_rendered": self.rows_rendered,
+            "jobs": self.jobs,
+            "samples": stall["samples"],
+        }
+        innermost = stall["samples"][0]["stack"][-1].strip().splitlines()[0] if stall["samples"] else "?"
+        logger.warning("Main loop stalled for %d ms (%s)", record["duration_ms"], innermost)
+        if self._reports is not None:
+            self._reports.info(json.dumps(record))
+
+    # --- overlay ---
+
+    def show_overlay(self, show=True):
+        if self.label is None:
+            return
+        if show and self._overlay_id is None:
+            self.label.pack(side="left", padx=(16, 0))
+            self._refresh_overlay()
+        elif not show and self._overlay_id is not None:
+            self.root.after_cancel(self._overlay_id)
+            self._overlay_id = None
+            self.label.pack_forget()
+
+    def toggle_overlay(self, event=None):
+        self.show_overlay(self._overlay_id is None)
+
+    def _refresh_overlay(self):
+        query = f"{self.last_query[0]} {self.last_query[1] * 1000:.0f} ms" if self.last_query else "-"
+        self.label.config(text=f"loop {self.latency * 1000:.0f} ms (max {self.max_latency * 1000:.0f})  ·  "
+                               f"last query {query}  ·  {self.rows_rendered} rows  ·  "
+                               f"{self.jobs} jobs  ·  {self.stalls} stalls")
+        self.max_latency = 0.0
+        self._overlay_id = self.root.after(OVERLAY_REFRESH_MS, self._refresh_overlay)
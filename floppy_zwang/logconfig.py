@@ -0,0 +1,141 @@
+"""
+Process-wide logging: a queue in front of the real handlers.
+
+setup() gives the root logger a single QueueHandler; a QueueListener thread
+formats the records and writes them to stderr and a rotating log file. A
+log call on the Tk thread (or a sync worker) is a level check plus a queue
+put, so a slow terminal or disk never stalls the event loop. Records are
+queued unformatted: the %-style message and any traceback are rendered on
+the listener thread. Callers pass values, not objects they mutate afterwards,
+and use logger.info("... %s", x) rather than f-strings so disabled levels
+cost nothing.
+
+Levels per logger come from a config file and then the environment:
+
+    FLOPPY_ZWANG_LOG_CONFIG=logging.ini      [levels] root = INFO, ui = DEBUG, ...
+    FLOPPY_ZWANG_LOG_LEVELS="INFO,google_sync=DEBUG,reminders=WARNING"
+
+A bare level sets the root logger; name=LEVEL sets that module's logger.
+FLOPPY_ZWANG_LOG_FILE overrides where the file sink writes.
+"""
+import atexit
+import configparser
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from pathlib import Path
+
+LOG_FILE = os.environ.get("FLOPPY_ZWANG_LOG_FILE") or None
+LOG_CONFIG = os.environ.get("FLOPPY_ZWANG_LOG_CONFIG") or None
+LOG_LEVELS = os.environ.get("FLOPPY_ZWANG_LOG_LEVELS", "")
+LOG_FORMAT = "[%(levelname)s] %(asctime)s %(name)s - %(message)s"
+LOG_FILE_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+DEFAULT_LEVEL = "INFO"
+
+_listener = None
+_queue_handler = None
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the record as is; the stdlib prepare() would format it on the caller's thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def parse_levels(spec):
+    """Parse "INFO,ui=DEBUG" into {"": "INFO", "ui": "DEBUG"} ("" is the root logger)."""
+    levels = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, level = item.rpartition("=")
+        levels["" if name.strip() in ("", "root") else name.strip()] = level.strip().upper()
+    return levels
+
+
+def read_levels(path):
+    """The [levels] section of an INI file, in parse_levels() form."""
+    parser = configparser.ConfigParser()
+    parser.optionxform = str  # logger names are case-sensitive
+    if not parser.read(path, encoding="utf-8"):
+        raise FileNotFoundError(path)
+    if not parser.has_section("levels"):
+        return {}
+    return {"" if name == "root" else name: level.strip().upper() for name, level in parser.items("levels")}
+
+
+def configured_levels():
+    levels = {"": DEFAULT_LEVEL}
+    if LOG_CONFIG:
+        levels.update(read_levels(LOG_CONFIG))
+    levels.update(parse_levels(LOG_LEVELS))
+    return levels
+
+
+def log_file_for(store):
+    """$FLOPPY_ZWANG_LOG_FILE, else floppy_zwang.log next to a file-backed store's database."""
+    if LOG_FILE:
+        return LOG_FILE
+    path = getattr(store, "path", None)
+    if not path or path.startswith("file:"):
+        return None
+    return str(Path(path).resolve().parent / "floppy_zwang.log")
+
+
+def apply_levels(levels):
+    for name, level in levels.items():
+        try:
+            logging.getLogger(name or None).setLevel(level)
+        except ValueError:
+            logging.getLogger(__name__).warning("Unknown log level %r for logger %r", level, name or "root")
+
+
+def setup(log_file=None, console=True, levels=None):
+    """
+    Route all logging through the queue. Idempotent; returns the listener.
+    levels defaults to configured_levels().
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8", delay=True))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    _queue_handler = _LazyQueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    apply_levels(configured_levels() if levels is None else levels)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+    return _listener
+
+
+def shutdown():
+    """Drain the queue and stop the listener thread."""
+    global _listener, _queue_handler
+    listener, _listener = _listener, None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -1,11 +1,30 @@
-from ttkbootstrap import Window
-from db import init_db
+import tkinter as tk
+
+import logconfig
+import tracing
+from store import SqliteTaskStore
 from ui import TaskerApp
 
-def main():
-    init_db()
-    root = Window(themename="darkly")
-    TaskerApp(root)
+try:
+    from ttkbootstrap import Window
+except ImportError:
+    # The UI only uses tkinter/ttk widgets; without ttkbootstrap it runs on a plain Tk root.
+    Window = None
+
+
+def make_root(theme="darkly"):
+    if Window is None:
+        return tk.Tk()
+    return Window(themename=theme)
+
+
+def main(themed=True):
+    tracing.setup_from_env()
+    store = SqliteTaskStore()
+    logconfig.setup(log_file=logconfig.log_file_for(store))
+    store.init()
+    root = make_root() if themed else tk.Tk()
+    TaskerApp(root, store)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""
+Recurrence rules for repeating tasks (an RRULE subset) and lazy occurrence generation.
+
+Supported: FREQ=DAILY|WEEKLY|MONTHLY|YEARLY with INTERVAL, COUNT, UNTIL,
+BYDAY (weekly, e.g. MO,WE) and BYMONTHDAY (monthly, negative counts from the
+month end). A series is one task row: its due_date is the first occurrence and
+the rule is stored in tasks.recurrence.
+"""
+import calendar
+import datetime
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+FREQS = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+PRESETS = {
+    "daily": "FREQ=DAILY",
+    "weekly": "FREQ=WEEKLY",
+    "monthly": "FREQ=MONTHLY",
+    "yearly": "FREQ=YEARLY",
+}
+# Consecutive periods without a candidate date after which a series is taken
+# to be exhausted. Productive rules go at most a few periods without one
+# (BYMONTHDAY=31 every other month, Feb 29 across a century year).
+MAX_EMPTY_PERIODS = 60
+
+
+def parse_rule(rule):
+    """Parse an RRULE string into a dict; raises ValueError for anything unsupported."""
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    parts = {}
+    for item in rule.split(";"):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Malformed recurrence part {item!r}")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQS:
+        raise ValueError(f"Unsupported FREQ {freq!r}")
+    parsed = {"freq": freq, "interval": 1, "count": None, "until": None, "byday": None, "bymonthday": None}
+    if "INTERVAL" in parts:
+        parsed["interval"] = int(parts.pop("INTERVAL"))
+        if parsed["interval"] < 1:
+            raise ValueError("INTERVAL must be positive")
+    if "COUNT" in parts:
+        parsed["count"] = int(parts.pop("COUNT"))
+    if "UNTIL" in parts:
+        parsed["until"] = datetime.datetime.strptime(parts.pop("UNTIL")[:8], "%Y%m%d").date()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        days = parts.pop("BYDAY").split(",")
+        if any(d not in WEEKDAYS for d in days):
+            raise ValueError(f"Unsupported BYDAY {','.join(days)!r}")
+        parsed["byday"] = sorted(WEEKDAYS.index(d) for d in days)
+    if "BYMONTHDAY" in parts:
+        if freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY is only supported with FREQ=MONTHLY")
+        days = [int(d) for d in parts.pop("BYMONTHDAY").split(",")]
+        if any(d == 0 or not -31 <= d <= 31 for d in days):
+            raise ValueError("BYMONTHDAY values must be 1..31 or -31..-1")
+        parsed["bymonthday"] = days
+    if parts:
+        raise ValueError(f"Unsupported recurrence parts: {', '.join(sorted(parts))}")
+    return parsed
+
+
+def normalize_rule(rule, dtstart=None):
+    """
+    Canonical RRULE text for rule (or a PRESETS name); None for an empty rule.
+    With dtstart (the first due date), also raises ValueError when the rule
+    never produces a date from there (e.g. BYMONTHDAY=30 every 12 months from
+    February).
+    """
+    rule = (rule or "").strip()
+    if not rule:
+        return None
+    rule = PRESETS.get(rule.lower(), rule)
+    p = parse_rule(rule)
+    if dtstart is not None:
+        if isinstance(dtstart, str):
+            dtstart = datetime.date.fromisoformat(dtstart)
+        if next(occurrences(p, dtstart), None) is None:
+            raise ValueError(f"The repeat rule never produces a date starting from {dtstart.isoformat()}.")
+    out = [f"FREQ={p['freq']}"]
+    if p["interval"] != 1:
+        out.append(f"INTERVAL={p['interval']}")
+    if p["byday"] is not None:
+        out.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in p["byday"]))
+    if p["bymonthday"] is not None:
+        out.append("BYMONTHDAY=" + ",".join(str(d) for d in p["bymonthday"]))
+    if p["count"] is not None:
+        out.append(f"COUNT={p['count']}")
+    if p["until"] is not None:
+        out.append(f"UNTIL={p['until']:%Y%m%d}")
+    return ";".join(out)
+
+
+def _add_months(year, month, n):
+    idx = year * 12 + (month - 1) + n
+    return idx // 12, idx % 12 + 1
+
+
+def _period_dates(p, dtstart, k):
+    """Candidate dates in the k-th period (k * INTERVAL units after dtstart's period)."""
+    n = k * p["interval"]
+    freq = p["freq"]
+    if freq == "DAILY":
+        return [dtstart + datetime.timedelta(days=n)]
+    if freq == "WEEKLY":
+        week = dtstart - datetime.timedelta(days=dtstart.weekday()) + datetime.timedelta(weeks=n)
+        days = p["byday"] if p["byday"] is not None else [dtstart.weekday()]
+        return [week + datetime.timedelta(days=d) for d in days]
+    if freq == "MONTHLY":
+        year, month = _add_months(dtstart.year, dtstart.month, n)
+        last = calendar.monthrange(year, month)[1]
+        out = []
+        for d in p["bymonthday"] if p["bymonthday"] is not None else [dtstart.day]:
+            day = d if d > 0 else last + 1 + d
+            if 1 <= day <= last:
+                out.append(datetime.date(year, month, day))
+        return sorted(set(out))
+    # YEARLY: skips years where the date does not exist (Feb 29).
+    try:
+        return [dtstart.replace(year=dtstart.year + n)]
+    except ValueError:
+        return []
+
+
+def _period_start(p, dtstart, k):
+    """First day of the k-th period; only MONTHLY and YEARLY periods can be empty."""
+    n = k * p["interval"]
+    if p["freq"] == "MONTHLY":
+        year, month = _add_months(dtstart.year, dtstart.month, n)
+        return datetime.date(year, month, 1)
+    if p["freq"] == "YEARLY":
+        return datetime.date(dtstart.year + n, dtstart.month, 1)
+    return None
+
+
+def _first_period(p, dtstart, start):
+    # Without COUNT nothing before the window matters, so skip straight to it.
+    if p["count"] is not None or start is None or start <= dtstart:
+        return 0
+    freq = p["freq"]
+    if freq == "DAILY":
+        units = (start - dtstart).days
+    elif freq == "WEEKLY":
+        units = (start - dtstart).days // 7
+    elif freq == "MONTHLY":
+        units = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+    else:
+        units = start.year - dtstart.year
+    return max(0, units // p["interval"] - 1)
+
+
+def occurrences(rule, dtstart, start=None, end=None):
+    """
+    Lazily yield occurrence dates of rule beginning at dtstart that fall in
+    [start, end). Without end the rule itself must be bounded (COUNT/UNTIL)
+    or the caller must stop iterating.
+    """
+    p = parse_rule(rule) if isinstance(rule, str) else rule
+    emitted = 0
+    empty = 0
+    k = _first_period(p, dtstart, start)
+    while True:
+        dates = _period_dates(p, dtstart, k)
+        if not dates:
+            # Bounds are otherwise only checked on produced dates, so a rule
+            # whose periods never produce one would loop forever.
+            period_start = _period_start(p, dtstart, k)
+            empty += 1
+            if (empty > MAX_EMPTY_PERIODS
+                    or (end is not None and period_start >= end)
+                    or (p["until"] is not None and period_start > p["until"])):
+                return
+        else:
+            empty = 0
+        for d in dates:
+            if d < dtstart:
+                continue
+            if p["until"] is not None and d > p["until"]:
+                return
+            if end is not None and d >= end:
+                return
+            emitted += 1
+            if start is None or d >= start:
+                yield d
+            if p["count"] is not None and emitted >= p["count"]:
+                return
+        k += 1
+
+
+def next_occurrence(rule, dtstart, after, skip=()):
+    """First occurrence on or after `after` that is not in skip (completed dates)."""
+    for d in occurrences(rule, dtstart, start=after):
+        if d not in skip:
+            return d
+        if (d - after).days > 366 * 50:
+            break
+    return None
@@ -0,0 +1,245 @@
+"""
+Due-date reminders.
+
+ReminderScheduler keeps a min-heap of the next `size` reminder times, filled by
+one keyset range query (store.get_upcoming_due; an idx_tasks_open_due range
+scan on SQLite). A worker thread sleeps until the head of the heap is due.
+Writes made through the store are applied to the heap one task at a time via
+its change listener, so nothing is rescanned; bulk writes cause one reload of
+the window.
+
+Reminders fire at REMINDER_HOUR local time on the due date. Repeating tasks
+keep exactly one entry, their next open occurrence. Delivered reminders are
+only remembered in memory, so reminders whose time passed before start() are
+treated as delivered by an earlier run: a restart after REMINDER_HOUR does
+not fire all of today's reminders again.
+"""
+import datetime
+import heapq
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+from recurrence import next_occurrence
+
+logger = logging.getLogger(__name__)
+
+REMINDER_HOUR = int(os.environ.get("FLOPPY_ZWANG_REMINDER_HOUR", "9"))
+HEAP_SIZE = 256
+# Upper bound on a single sleep so wall-clock jumps (suspend, DST) are picked up.
+MAX_SLEEP = 3600.0
+
+
+def notify_desktop(task_id, title, due_date):
+    """Default sink: a desktop notification where a notifier exists, else a log line."""
+    message = f"Due {due_date}"
+    try:
+        if sys.platform == "darwin" and shutil.which("osascript"):
+            script = 'display notification "%s" with title "%s"' % (
+                message, title.replace('"', "'"))
+            subprocess.run(["osascript", "-e", script], check=False, timeout=5)
+            return
+        if shutil.which("notify-send"):
+            subprocess.run(["notify-send", "-a", "floppy-zwang", title, message], check=False, timeout=5)
+            return
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug("Desktop notification failed: %s", e)
+    logger.info("Reminder: task %s %r is due %s", task_id, title, due_date)
+
+
+class ReminderScheduler:
+    """
+    callback(task_id, title, due_date) is called on the scheduler thread for
+    each reminder; clock() returns the current local datetime (both pluggable
+    for tests).
+    """
+
+    def __init__(self, store, callback=None, size=HEAP_SIZE, hour=REMINDER_HOUR, clock=datetime.datetime.now):
+        self.store = store
+        self.callback = callback or notify_desktop
+        self.size = size
+        self.hour = hour
+        self.clock = clock
+
+        # Owned by the worker thread.
+        self._heap = []        # (fire_at, task_id); superseded entries are skipped lazily
+        self._entries = {}     # task_id -> (fire_at, title, due_date, rule)
+        self._window = set()   # non-repeating task ids loaded by the range query
+        self._horizon = None   # (due_date, id) of the last row loaded, None if all fit
+        self._start = None     # first due date covered by the current window
+        self._fired = set()    # (task_id, due_date) already delivered
+        self._started = None   # clock() at start(); earlier reminders are not fired
+
+        # Shared with writers; guarded by _cond.
+        self._cond = threading.Condition()
+        self._pending = []
+        self._reload = True
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._started = self.clock()
+        self.store.add_change_listener(self._on_change)
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self.store.remove_change_listener(self._on_change)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def upcoming(self):
+        """Live (fire_at, task_id, title, due_date) entries in firing order (for inspection)."""
+        return sorted((e[0], tid, e[1], e[2]) for tid, e in self._entries.items())
+
+    def _on_change(self, op, task_id):
+        # Runs on the writer's thread: only record the change and wake the worker.
+        with self._cond:
+            if op == "bulk" or task_id is None:
+                self._reload = True
+            else:
+                self._pending.append((op, task_id))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                reload, self._reload = self._reload, False
+                pending, self._pending = self._pending, []
+            try:
+                if reload:
+                    self._load()
+                else:
+                    for op, task_id in dict.fromkeys(pending):
+                        self._refresh(op, task_id)
+                if self._horizon is not None and not self._window:
+                    self._fill()
+                for task_id, title, due in self._pop_due(self.clock()):
+                    try:
+                        self.callback(task_id, title, due)
+                    except Exception:
+                        logger.exception("Reminder callback failed for task %s", task_id)
+            except Exception:
+                logger.exception("Reminder scheduler error")
+            if self._horizon is not None and not self._window:
+                continue  # window drained: load the next page before sleeping
+            with self._cond:
+                if not (self._stopped or self._reload or self._pending):
+                    self._cond.wait(self._sleep_time())
+
+    # --- heap maintenance ---
+
+    def _fire_at(self, day):
+        return datetime.datetime.combine(day, datetime.time(self.hour))
+
+    def _first_day(self):
+        """First due date whose reminder is still to be delivered by this run."""
+        today = self.clock().date()
+        if self._started is not None and self._started.date() == today and self._fire_at(today) < self._started:
+            return today + datetime.timedelta(days=1)
+        return today
+
+    def _push(self, task_id, title, due, rule=None):
+        if (task_id, due) in self._fired:
+            return
+        fire_at = self._fire_at(datetime.date.fromisoformat(due))
+        self._entries[task_id] = (fire_at, title, due, rule)
+        heapq.heappush(self._heap, (fire_at, task_id))
+        if len(self._heap) > 2 * len(self._entries) + self.size:
+            self._compact()
+
+    def _compact(self):
+        self._heap = [(e[0], tid) for tid, e in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _drop(self, task_id):
+        self._entries.pop(task_id, None)
+        self._window.discard(task_id)
+
+    def _load(self):
+        self._heap, self._entries, self._window = [], {}, set()
+        self._horizon = None
+        first = self._first_day()
+        self._start = first.isoformat()
+        self._fill(after=None)
+        series = self.store.get_recurrences()
+        done = self.store.get_completed_occurrences(series, start_date=self._start)
+        for task_id, (rule, first_due) in series.items():
+            row = self.store.get_task(task_id)
+            if row:
+                self._push_next_occurrence(task_id, row[1], rule, first_due, first, done.get(task_id, set()))
+
+    def _fill(self, after=...):
+        if after is ...:
+            after = self._horizon
+        rows = self.store.get_upcoming_due(self._start, self.size, after=after)
+        for task_id, title, due, _priority in rows:
+            self._push(task_id, title, due)
+            self._window.add(task_id)
+        self._horizon = (rows[-1][2], rows[-1][0]) if len(rows) == self.size else None
+
+    def _push_next_occurrence(self, task_id, title, rule, first_due, after, done):
+        skip = done | {datetime.date.fromisoformat(d) for tid, d in self._fired if tid == task_id}
+        try:
+            nxt = next_occurrence(rule, datetime.date.fromisoformat(first_due), after, skip)
+        except ValueError:
+            return
+        if nxt is not None:
+            self._push(task_id, title, nxt.isoformat(), rule)
+
+    def _refresh(self, op, task_id):
+        self._drop(task_id)
+        if op == "delete":
+            return
+        row = self.store.get_task(task_id)
+        if not row or row[6] or not row[3]:
+            return
+        tid, title, desc, due, priority, tags, completed = row
+        first = self._first_day()
+        rule = self.store.get_recurrence(task_id)
+        if rule:
+            done = self.store.get_completed_occurrences([task_id], start_date=first.isoformat())
+            self._push_next_occurrence(task_id, title, rule, due, first, done.get(task_id, set()))
+        elif due >= first.isoformat() and (self._horizon is None or (due, task_id) <= self._horizon):
+            # Beyond the horizon the task is picked up by a later _fill().
+            self._push(task_id, title, due)
+            self._window.add(task_id)
+
+    def _live_head(self):
+        while self._heap:
+            fire_at, task_id = self._heap[0]
+            entry = self._entries.get(task_id)
+            if entry and entry[0] == fire_at:
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now):
+        fired = []
+        while (head := self._live_head()) is not None and head <= now:
+            _, task_id = heapq.heappop(self._heap)
+            fire_at, title, due, rule = self._entries.pop(task_id)
+            self._window.discard(task_id)
+            self._fired.add((task_id, due))
+            fired.append((task_id, title, due))
+            if rule:
+                row = self.store.get_task(task_id)
+                if row and not row[6] and row[3]:
+                    nxt_after = datetime.date.fromisoformat(due) + datetime.timedelta(days=1)
+                    done = self.store.get_completed_occurrences([task_id], start_date=nxt_after.isoformat())
+                    self._push_next_occurrence(task_id, row[1], rule, row[3], nxt_after, done.get(task_id, set()))
+        return fired
+
+    def _sleep_time(self):
+        head = self._live_head()
+        if head is None:
+            return MAX_SLEEP
+        return min(MAX_SLEEP, max(0.0, (head - self.clock()).total_seconds()))
@@ -0,0 +1,309 @@
+"""
+Local HTTP/JSON API over the task store (stdlib only).
+
+    python -m floppy_zwang serve [--host 127.0.0.1] [--port 8765]
+
+Endpoints:
+    GET    /tasks?tag=&all=1&sort=&limit=&offset=   paged list
+    GET    /tasks/search?q=&all=1&limit=&offset=    paged search
+    GET    /tasks/changes?since=&limit=             change feed after seq `since`; 410 once compacted
+    GET    /tasks/<id>
+    POST   /tasks            one task object, or a list of them (bulk add)
+    PUT    /tasks/<id>       update the given fields
+    DELETE /tasks/<id>
+    POST   /tasks/done       {"ids": [...], "completed": true}
+    POST   /tasks/delete     {"ids": [...]}
+    GET    /metrics          tracing histograms, Prometheus text format
+
+GET responses carry an ETag derived from the database data version and honour
+If-None-Match with 304. Requests run on a ThreadingHTTPServer over pooled
+connections (db.enable_pooling). List and search results have "description":
+null for large (compressed) descriptions; GET /tasks/<id> returns the text.
+"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE = 100
+MAX_PAGE = 1000
+
+# Distinguishes data versions of this server process from a previous one.
+_BOOT_ID = os.urandom(4).hex()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _task_dict(row):
+    return dict(zip(db.TASK_COLUMNS, row))
+
+
+def _limit_arg(params, default):
+    try:
+        limit = int(params.get("limit", default))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    # SQLite reads LIMIT -1 as "no limit", so anything below 1 must not reach a query.
+    if limit < 1:
+        raise ApiError(400, "limit must be at least 1")
+    return min(limit, MAX_PAGE)
+
+
+def _page_args(params):
+    limit = _limit_arg(params, DEFAULT_PAGE)
+    try:
+        offset = int(params.get("offset", 0))
+    except ValueError:
+        raise ApiError(400, "offset must be an integer")
+    if offset < 0:
+        raise ApiError(400, "offset must not be negative")
+    return limit, offset
+
+
+def _page(rows, limit, offset):
+    return {
+        "tasks": [_task_dict(r) for r in rows],
+        "next_offset": offset + limit if len(rows) == limit else None,
+    }
+
+
+def _flag(params, name):
+    return params.get(name, "0").lower() in ("1", "true", "yes")
+
+
+def _due_date(value):
+    """ISO date string for a due_date field, None when empty; ValueError (400) otherwise."""
+    if value in (None, ""):
+        return None
+    if not isinstance(value, str):
+        raise ValueError("due_date must be a YYYY-MM-DD string")
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"due_date must be a YYYY-MM-DD date, not {value!r}") from None
+
+
+def _new_task_row(obj):
+    if not isinstance(obj, dict) or not obj.get("title"):
+        raise ApiError(400, "each task needs a title")
+    return (
+        None,
+        obj["title"],
+        obj.get("description") or "",
+        _due_date(obj.get("due_date")),
+        int(obj.get("priority") or 0),
+        obj.get("tags") or "",
+        int(bool(obj.get("completed"))),
+    )
+
+
+class TaskApiHandler(BaseHTTPRequestHandler):
+    server_version = "floppy-zwang"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+    # --- plumbing ---
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        etag = None
+        try:
+            if not parts or parts[0] != "tasks":
+                raise ApiError(404, "not found")
+            name = f"{method}_{self._route(parts[1:])}"
+            handler = getattr(self, name, None)
+            if handler is None:
+                raise ApiError(404, "not found")
+            with tracing.span(f"api.{name}"):
+                if method == "get":
+                    status, body, etag = self._cached_get(lambda: handler(parts[1:], params))
+                else:
+                    status, body = handler(parts[1:], params)
+        except ApiError as e:
+            status, body = e.status, {"error": str(e)}
+        except (ValueError, TypeError, KeyError, sqlite3.IntegrityError) as e:
+            status, body = 400, {"error": str(e)}
+        except Exception:
+            logger.exception("%s %s failed", method.upper(), self.path)
+            status, body = 500, {"error": "internal server error"}
+        self._send(status, body, etag)
+
+    @staticmethod
+    def _route(rest):
+        if not rest:
+            return "collection"
+        if rest[0].isdigit():
+            return "item"
+        return rest[0]
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            raise ApiError(400, f"invalid JSON: {e}")
+
+    def _read_object(self):
+        body = self._read_json()
+        if not isinstance(body, dict):
+            raise ApiError(400, "expected a JSON object")
+        return body
+
+    def _send(self, status, body, etag=None):
+        payload = b"" if status == 304 else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def _cached_get(self, produce):
+        # Read the version before the data so a concurrent write can only make the tag stale, never the body.
+        etag = f'"{_BOOT_ID}-{db.data_version()}"'
+        if etag in [t.strip() for t in (self.headers.get("If-None-Match") or "").split(",")]:
+            return 304, None, etag
+        return 200, produce(), etag
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/metrics":
+            payload = tracing.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self._dispatch("get")
+
+    def do_POST(self):
+        self._dispatch("post")
+
+    def do_PUT(self):
+        self._dispatch("put")
+
+    def do_DELETE(self):
+        self._dispatch("delete")
+
+    # --- reads ---
+
+    def get_collection(self, rest, params):
+        limit, offset = _page_args(params)
+        rows = db.get_tasks(
+            filter_tag=params.get("tag") or None,
+            show_completed=_flag(params, "all"),
+            sort_by=params.get("sort", "due_date"),
+            limit=limit,
+            offset=offset,
+        )
+        return _page(rows, limit, offset)
+
+    def get_search(self, rest, params):
+        limit, offset = _page_args(params)
+        rows = db.search_tasks(params.get("q", ""), show_completed=_flag(params, "all"),
+                               limit=limit, offset=offset)
+        return _page(rows, limit, offset)
+
+    def get_changes(self, rest, params):
+        try:
+            since = int(params.get("since", 0))
+        except ValueError:
+            raise ApiError(400, "since must be an integer")
+        limit = _limit_arg(params, MAX_PAGE)
+        try:
+            changes = db.changes_since(since, limit)
+        except db.ChangeFeedGap as e:
+            raise ApiError(410, f"{e}; re-read /tasks from latest seq {db.latest_change_seq()}")
+        return {
+            "changes": [
+                {"seq": seq, "op": op, "id": tid, "changed_at": at, "fields": list(fields)}
+                for seq, op, tid, at, fields in changes
+            ],
+            "next_since": changes[-1][0] if changes else since,
+        }
+
+    def get_item(self, rest, params):
+        row = db.get_task(int(rest[0]))
+        if not row:
+            raise ApiError(404, "task not found")
+        return _task_dict(row)
+
+    # --- writes ---
+
+    def post_collection(self, rest, params):
+        body = self._read_json()
+        if isinstance(body, list):
+            return 201, {"added": db.add_tasks_bulk([_new_task_row(o) for o in body])}
+        _, title, desc, due, priority, tags, _ = _new_task_row(body)
+        tid = db.add_task(title, desc, due, priority, tags)
+        return 201, _task_dict(db.get_task(tid))
+
+    def put_item(self, rest, params):
+        tid = int(rest[0])
+        row = db.get_task(tid)
+        if not row:
+            raise ApiError(404, "task not found")
+        merged = _task_dict(row)
+        body = self._read_object()
+        merged.update({k: v for k, v in body.items() if k in db.TASK_COLUMNS and k != "id"})
+        if not merged["title"]:
+            raise ApiError(400, "a task needs a title")
+        if "due_date" in body:
+            merged["due_date"] = _due_date(body["due_date"])
+        db.update_task(tid, merged["title"], merged["description"], merged["due_date"],
+                       int(merged["priority"] or 0), merged["tags"], int(bool(merged["completed"])))
+        return 200, _task_dict(db.get_task(tid))
+
+    def delete_item(self, rest, params):
+        tid = int(rest[0])
+        if not db.get_task(tid):
+            raise ApiError(404, "task not found")
+        db.delete_task(tid)
+        return 200, {"deleted": 1}
+
+    def post_done(self, rest, params):
+        body = self._read_object()
+        completed = body.get("completed", True)
+        return 200, {"updated": db.set_completed_bulk([int(i) for i in body["ids"]], completed)}
+
+    def post_delete(self, rest, params):
+        body = self._read_object()
+        return 200, {"deleted": db.delete_tasks_bulk([int(i) for i in body["ids"]])}
+
+
+def make_server(host="127.0.0.1", port=8765, pool_size=8):
+    db.init_db()
+    db.enable_pooling(pool_size)
+    server = ThreadingHTTPServer((host, port), TaskApiHandler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host="127.0.0.1", port=8765, pool_size=8):
+    server = make_server(host, port, pool_size)
+    logger.info("Serving task API on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.disable_pooling()
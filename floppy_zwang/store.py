@@ -0,0 +1,768 @@
+"""
+Storage backends behind one interface.
+
+TaskStore is the set of operations the UI, dialogs, sync and reminder code
+use. SqliteTaskStore runs them through the functions in db.py against a
+configurable database (a file, or ":memory:" for a private shared-cache
+in-memory database); MemoryTaskStore keeps everything in Python dicts with
+the indexes those operations need, for tests, benchmarks and experiments.
+
+    store = SqliteTaskStore()           # FLOPPY_ZWANG_DB / tasks.db
+    store = SqliteTaskStore(":memory:")
+    store = MemoryTaskStore()
+    store.init()
+
+Task rows are (id, title, description, due_date, priority, tags, completed)
+tuples in every backend. List and search results carry None for descriptions
+of db.DESCRIPTION_COMPRESS_MIN bytes or more; get_task() and iter_tasks()
+return them in full. benchmarks/store_suite.py checks that the backends
+agree and times them side by side.
+"""
+import bisect
+import datetime
+import functools
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Protocol, runtime_checkable
+
+import db
+import recurrence
+
+
+@runtime_checkable
+class TaskStore(Protocol):
+    """Operations every backend provides; see the db.py function of the same name for details."""
+
+    due_counts: db.DueCountCache
+
+    def init(self): ...
+    def close(self): ...
+    def add_change_listener(self, callback): ...
+    def remove_change_listener(self, callback): ...
+    def data_version(self): ...
+
+    def add_task(self, title, description="", due_date=None, priority=0, tags="", parent_id=None): ...
+    def update_task(self, task_id, title, description, due_date, priority, tags, completed): ...
+    def delete_task(self, task_id): ...
+    def get_task(self, task_id): ...
+    def get_tasks(self, filter_tag=None, show_completed=False, sort_by="due_date", limit=None, offset=0,
+                  parent_id=None, top_level_only=False): ...
+    def iter_tasks(self, filter_tag=None, show_completed=True, sort_by="id", chunk_size=1000): ...
+    def search_tasks(self, query, show_completed=True, limit=None, offset=0): ...
+    def fuzzy_search_titles(self, query, show_completed=True, limit=50): ...
+    def add_tasks_bulk(self, rows, batch_size=5000, upsert=True, progress=None): ...
+    def set_completed_bulk(self, task_ids, completed=1): ...
+    def delete_tasks_bulk(self, task_ids): ...
+
+    def get_stats(self): ...
+    def get_task_tags(self): ...
+    def get_due_counts(self, start_date, end_date): ...
+    def get_upcoming_due(self, start_date, limit, after=None): ...
+    def get_group_counts(self, group_by, filter_tag=None, show_completed=False): ...
+    def get_group_tasks(self, group_by, key, filter_tag=None, show_completed=False, sort_by="default",
+                        limit=None, offset=0): ...
+
+    def get_parent_ids(self): ...
+    def get_subtree(self, task_id): ...
+    def get_rollups(self, task_ids): ...
+    def set_parent(self, task_id, parent_id): ...
+
+    def set_recurrence(self, task_id, rule): ...
+    def get_recurrence(self, task_id): ...
+    def get_recurrences(self, include_completed=False): ...
+    def complete_occurrence(self, task_id, occurrence_date, completed=True): ...
+    def get_completed_occurrences(self, task_ids, start_date=None, end_date=None): ...
+
+    def archive_completed(self, older_than_days=None, batch_size=200, pause=0.05, stop_event=None): ...
+    def search_archive(self, query=None, filter_tag=None, limit=None, offset=0): ...
+
+    def latest_change_seq(self): ...
+    def changes_since(self, seq=0, limit=1000): ...
+    def compact_changes(self, max_age_days=None, max_rows=None, batch_size=5000, pause=0.05, stop_event=None): ...
+
+    def map_task_to_gc(self, task_id, event_id): ...
+    def get_gc_event_id(self, task_id): ...
+
+
+# --- SQLite ---
+
+# db.py functions exposed unchanged as SqliteTaskStore methods.
+_DB_METHODS = (
+    "data_version",
+    "add_task", "update_task", "delete_task", "get_task", "get_tasks", "iter_tasks", "search_tasks",
+    "fuzzy_search_titles", "add_tasks_bulk", "set_completed_bulk", "delete_tasks_bulk",
+    "get_stats", "get_task_tags", "get_due_counts", "get_upcoming_due", "get_group_counts", "get_group_tasks",
+    "get_parent_ids", "get_subtree", "get_rollups", "set_parent",
+    "set_recurrence", "get_recurrence", "get_recurrences", "complete_occurrence", "get_completed_occurrences",
+    "archive_completed", "search_archive",
+    "latest_change_seq", "changes_since", "compact_changes",
+    "map_task_to_gc", "get_gc_event_id",
+)
+
+_memory_db_ids = itertools.count(1)
+
+
+class SqliteTaskStore:
+    """
+    The db.py functions bound to one database. Each store owns a
+    db.DatabaseContext (path, pool, data_version connection, change
+    listeners) and runs every call inside db.using() it, so stores on
+    different files can be used from different threads at once.
+    """
+
+    def __init__(self, path=None):
+        self._keepalive = None
+        if path == ":memory:":
+            # Each connection db.py opens must see the same data, so use a named
+            # shared-cache database and hold one connection open to keep it alive.
+            path = f"file:floppy-zwang-mem{next(_memory_db_ids)}?mode=memory&cache=shared"
+            self._keepalive = sqlite3.connect(path, uri=True, check_same_thread=False)
+        self.path = path or db.DB_FILENAME
+        self.db = db.DatabaseContext(self.path)
+        self.due_counts = db.DueCountCache(source=self)
+
+    def __repr__(self):
+        return f"SqliteTaskStore({self.path!r})"
+
+    def init(self):
+        with db.using(self.db):
+            db.init_db()
+
+    def close(self):
+        self.db.close()
+        if self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+
+    def add_change_listener(self, callback):
+        self.db.listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        if callback in self.db.listeners:
+            self.db.listeners.remove(callback)
+
+
+def _bind_db_function(name):
+    fn = getattr(db, name)
+
+    @functools.wraps(fn)
+    def method(self, *args, **kwargs):
+        with db.using(self.db):
+            return fn(*args, **kwargs)
+    return method
+
+
+for _name in _DB_METHODS:
+    setattr(SqliteTaskStore, _name, _bind_db_function(_name))
+del _name
+
+
+# --- In-memory ---
+
+def _split_tags(tags):
+    return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
+
+def _paged(rows, limit, offset):
+    if limit is None and not offset:
+        return rows
+    return rows[offset:None if limit is None else offset + limit]
+
+
+_SORT_KEYS = {
+    "priority": lambda r: (-(r["priority"] or 0), not r["due_date"], r["due_date"] or ""),
+    "title": lambda r: r["title"].lower(),
+    "id": lambda r: (),
+    "default": lambda r: (-(r["priority"] or 0), r["due_date"] is None, r["due_date"] or "9999-99-99",
+                          r["title"].lower()),
+}
+
+
+def _due_sort_key(r):
+    return (r["due_date"] is None, r["due_date"] or "")
+
+
+class MemoryTaskStore:
+    """
+    Pure-Python store. Records live in a dict by id, with secondary indexes
+    kept current on every write:
+
+        _by_tag     lower-cased tag -> ids (tag filters only scan matching tags)
+        _by_trigram title trigram -> ids (fuzzy title search)
+        _children   parent id -> ids
+        _open_due   sorted [(due_date, id)] of open tasks (due counts, reminders, overdue)
+        _counters   the task_stats counters (total/open/done, priority:N, tag:NAME)
+        _changes    the change feed, oldest first; entry i has seq _change_floor + i + 1
+
+    Nothing is persisted. All methods are safe to call from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._version = 0
+        self._next_id = 1
+        self._tasks = {}
+        self._by_tag = {}
+        self._by_trigram = {}
+        self._children = {}
+        self._open_due = []
+        self._counters = Counter()
+        self._exceptions = {}
+        self._gc = {}
+        self._archive = {}
+        self._gc_archive = {}
+        self._changes = []
+        self._change_floor = 0
+        self.due_counts = db.DueCountCache(source=self)
+
+    def __repr__(self):
+        return f"MemoryTaskStore({len(self._tasks)} tasks)"
+
+    def init(self):
+        pass
+
+    def close(self):
+        pass
+
+    def add_change_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, op, task_id):
+        for callback in list(self._listeners):
+            callback(op, task_id)
+
+    def data_version(self):
+        return self._version
+
+    # --- index maintenance (caller holds the lock) ---
+
+    def _index(self, rec):
+        tid = rec["id"]
+        tags = _split_tags(rec["tags"])
+        for tag in tags:
+            self._by_tag.setdefault(tag.lower(), set()).add(tid)
+        for gram in db.title_trigrams(rec["title"]):
+            self._by_trigram.setdefault(gram, set()).add(tid)
+        if rec["parent_id"] is not None:
+            self._children.setdefault(rec["parent_id"], set()).add(tid)
+        is_open = not rec["completed"]
+        if is_open and rec["due_date"]:
+            bisect.insort(self._open_due, (rec["due_date"], tid))
+        self._counters["total"] += 1
+        self._counters["open" if is_open else "done"] += 1
+        if is_open:
+            self._counters[f"priority:{rec['priority'] or 0}"] += 1
+            for tag in tags:
+                self._counters[f"tag:{tag}"] += 1
+
+    def _unindex(self, rec):
+        tid = rec["id"]
+        tags = _split_tags(rec["tags"])
+        for tag in tags:
+            members = self._by_tag.get(tag.lower())
+            if members is not None:
+                members.discard(tid)
+                if not members:
+                    del self._by_tag[tag.lower()]
+        for gram in db.title_trigrams(rec["title"]):
+            members = self._by_trigram.get(gram)
+            if members is not None:
+                members.discard(tid)
+                if not members:
+                    del self._by_trigram[gram]
+        if rec["parent_id"] is not None:
+            members = self._children.get(rec["parent_id"])
+            if members is not None:
+                members.discard(tid)
+                if not members:
+                    del self._children[rec["parent_id"]]
+        is_open = not rec["completed"]
+        if is_open and rec["due_date"]:
+            i = bisect.bisect_left(self._open_due, (rec["due_date"], tid))
+            if i < len(self._open_due) and self._open_due[i] == (rec["due_date"], tid):
+                del self._open_due[i]
+        keys = ["total", "open" if is_open else "done"]
+        if is_open:
+            keys.append(f"priority:{rec['priority'] or 0}")
+            keys += [f"tag:{tag}" for tag in tags]
+        self._counters.subtract(keys)
+        for key in keys:
+            if self._counters[key] <= 0:
+                del self._counters[key]
+
+    def _put(self, rec, **changes):
+        """Apply changes to rec (a new or existing record) and reindex it."""
+        old = self._tasks.get(rec["id"])
+        if old is not None:
+            self._unindex(old)
+        rec = dict(rec, **changes, updated_at=time.time())
+        self._tasks[rec["id"]] = rec
+        if old is None:
+            self._log_change("insert", rec["id"])
+        else:
+            fields = tuple(f for f in db.CHANGE_FIELDS if old[f] != rec[f])
+            if fields:
+                self._log_change("update", rec["id"], fields)
+        self._index(rec)
+        self._version += 1
+        return rec
+
+    def _remove(self, tid):
+        rec = self._tasks.pop(tid)
+        self._unindex(rec)
+        for child in sorted(self._children.get(tid, ())):
+            self._put(self._tasks[child], parent_id=rec["parent_id"])
+        self._log_change("delete", tid)
+        self._gc.pop(tid, None)
+        self._exceptions.pop(tid, None)
+        self._version += 1
+        return rec
+
+    def _log_change(self, op, tid, fields=()):
+        seq = self._change_floor + len(self._changes) + 1
+        self._changes.append((seq, op, tid, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), fields))
+
+    def _new_record(self, tid, title, description, due_date, priority, tags, completed, parent_id=None):
+        if tid is None:
+            tid = self._next_id
+        self._next_id = max(self._next_id, tid + 1)
+        return {
+            "id": tid, "title": title, "description": description, "due_date": due_date,
+            "priority": priority, "tags": tags, "completed": completed, "parent_id": parent_id,
+            "recurrence": None, "created_at": time.time(),
+        }
+
+    @staticmethod
+    def _row(rec):
+        return (rec["id"], rec["title"], rec["description"], rec["due_date"],
+                rec["priority"], rec["tags"], rec["completed"])
+
+    @classmethod
+    def _list_row(cls, rec):
+        # Lists and searches leave out large descriptions, as SQLite does for compressed ones.
+        row = cls._row(rec)
+        return row[:2] + (None,) + row[3:] if db.is_large_description(row[2]) else row
+
+    # --- tasks ---
+
+    def add_task(self, title, description="", due_date=None, priority=0, tags="", parent_id=None):
+        with self._lock:
+            rec = self._put(self._new_record(None, title, description, due_date, priority, tags, 0, parent_id))
+        self._notify("insert", rec["id"])
+        return rec["id"]
+
+    def update_task(self, task_id, title, description, due_date, priority, tags, completed):
+        with self._lock:
+            rec = self._tasks.get(task_id)
+            if rec is None:
+                return
+            self._put(rec, title=title, description=description, due_date=due_date,
+                      priority=priority, tags=tags, completed=int(completed))
+        self._notify("update", task_id)
+
+    def delete_task(self, task_id):
+        with self._lock:
+            if task_id in self._tasks:
+                self._remove(task_id)
+        self._notify("delete", task_id)
+
+    def get_task(self, task_id):
+        rec = self._tasks.get(task_id)
+        return self._row(rec) if rec else None
+
+    def _candidates(self, filter_tag=None, parent_id=None):
+        if parent_id is not None:
+            return [self._tasks[i] for i in self._children.get(parent_id, ())]
+        if filter_tag:
+            needle = filter_tag.lower()
+            if "," not in needle and needle == needle.strip():
+                ids = set()
+                for tag, members in self._by_tag.items():
+                    if needle in tag:
+                        ids |= members
+                return [self._tasks[i] for i in ids]
+        return list(self._tasks.values())
+
+    def _select(self, filter_tag=None, show_completed=False, sort_by="due_date", limit=None, offset=0,
+                parent_id=None, top_level_only=False, condition=None, full_description=False):
+        with self._lock:
+            recs = self._candidates(filter_tag, parent_id)
+        needle = filter_tag.lower() if filter_tag else None
+        out = [
+            r for r in recs
+            if (show_completed or not r["completed"])
+            and (parent_id is not None or not top_level_only or r["parent_id"] is None)
+            and (needle is None or needle in (r["tags"] or "").lower())
+            and (condition is None or condition(r))
+        ]
+        sort_key = _SORT_KEYS.get(sort_by, _due_sort_key)
+        key = lambda r: (sort_key(r), r["id"])  # noqa: E731
+        if limit is not None:
+            # A page only needs its first offset + limit rows in order.
+            out = heapq.nsmallest(offset + limit, out, key=key)
+        else:
+            out.sort(key=key)
+        row = self._row if full_description else self._list_row
+        return [row(r) for r in _paged(out, limit, offset)]
+
+    def get_tasks(self, filter_tag=None, show_completed=False, sort_by="due_date", limit=None, offset=0,
+                  parent_id=None, top_level_only=False):
+        return self._select(filter_tag, show_completed, sort_by, limit, offset, parent_id, top_level_only)
+
+    def iter_tasks(self, filter_tag=None, show_completed=True, sort_by="id", chunk_size=1000):
+        # A snapshot taken when iteration starts, like a cursor over one read transaction.
+        yield from self._select(filter_tag, show_completed, sort_by, full_description=True)
+
+    def search_tasks(self, query, show_completed=True, limit=None, offset=0):
+        needle = query.lower()
+        with self._lock:
+            recs = sorted(self._tasks.values(), key=lambda r: r["id"])
+        out = [
+            r for r in recs
+            if (show_completed or not r["completed"])
+            and any(needle in (r[f] or "").lower() for f in ("title", "description", "tags"))
+        ]
+        return [self._list_row(r) for r in _paged(out, limit, offset)]
+
+    def fuzzy_search_titles(self, query, show_completed=True, limit=50):
+        if not db.title_trigrams(query, pad=False):
+            return []
+        shared = Counter()
+        with self._lock:
+            for gram in db.title_trigrams(query):
+                shared.update(self._by_trigram.get(gram, ()))
+            recs = [self._tasks[tid] for tid, _ in shared.most_common(max(4 * limit, 200))]
+        rows = [self._list_row(r) for r in recs if show_completed or not r["completed"]]
+        return db.rank_fuzzy_matches(query, rows, limit)
+
+    def add_tasks_bulk(self, rows, batch_size=5000, upsert=True, progress=None):
+        total = 0
+        try:
+            for batch in iter(lambda it=iter(rows): list(itertools.islice(it, batch_size)), []):
+                with self._lock:
+                    # Rows with an id go first within a batch, as in db.add_tasks_bulk().
+                    batch.sort(key=lambda row: row[0] is None)
+                    for row in batch:
+                        tid, title, description, due_date, priority, tags, completed = row[:7]
+                        rule = row[7] if len(row) > 7 else None
+                        existing = self._tasks.get(tid) if tid is not None else None
+                        if existing is None:
+                            self._put(self._new_record(tid, title, description, due_date, priority, tags,
+                                                       int(completed)), recurrence=rule)
+                        elif upsert:
+                            self._put(existing, title=title, description=description, due_date=due_date,
+                                      priority=priority, tags=tags, completed=int(completed),
+                                      recurrence=rule or existing["recurrence"])
+                total += len(batch)
+                if progress:
+                    progress(total)
+        finally:
+            if total:
+                self._notify("bulk", None)
+        return total
+
+    def set_completed_bulk(self, task_ids, completed=1):
+        changed = 0
+        with self._lock:
+            for tid in task_ids:
+                if tid in self._tasks:
+                    self._put(self._tasks[tid], completed=int(bool(completed)))
+                    changed += 1
+        if changed:
+            self._notify("bulk", None)
+        return changed
+
+    def delete_tasks_bulk(self, task_ids):
+        changed = 0
+        with self._lock:
+            for tid in task_ids:
+                if tid in self._tasks:
+                    self._remove(tid)
+                    changed += 1
+        if changed:
+            self._notify("bulk", None)
+        return changed
+
+    # --- aggregates and views ---
+
+    def get_task_tags(self):
+        with self._lock:
+            return {tid: r["tags"] for tid, r in self._tasks.items() if r["tags"]}
+
+    def get_stats(self):
+        today = datetime.date.today().isoformat()
+        with self._lock:
+            counters = dict(self._counters)
+            overdue = bisect.bisect_left(self._open_due, (today,))
+        return {
+            "total": counters.get("total", 0),
+            "open": counters.get("open", 0),
+            "done": counters.get("done", 0),
+            "overdue": overdue,
+            "by_priority": {int(k[len("priority:"):]): v for k, v in counters.items() if k.startswith("priority:")},
+            "by_tag": {k[len("tag:"):]: v for k, v in counters.items() if k.startswith("tag:")},
+        }
+
+    def get_due_counts(self, start_date, end_date):
+        counts = {}
+        series = []
+        with self._lock:
+            lo = bisect.bisect_left(self._open_due, (start_date,))
+            hi = bisect.bisect_left(self._open_due, (end_date,))
+            for due, tid in self._open_due[lo:hi]:
+                rec = self._tasks[tid]
+                if rec["recurrence"] is None:
+                    n, prio = counts.get(due, (0, 0))
+                    counts[due] = (n + 1, max(prio, rec["priority"] or 0))
+            for rec in self._tasks.values():
+                if rec["recurrence"] and not rec["completed"] and rec["due_date"] and rec["due_date"] < end_date:
+                    series.append((rec["id"], rec["recurrence"], rec["due_date"], rec["priority"] or 0))
+        if series:
+            start, end = datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date)
+            done = self.get_completed_occurrences([s[0] for s in series], start_date, end_date)
+            for tid, rule, due, prio in series:
+                try:
+                    days = list(db.iter_occurrences(tid, rule, due, start, end, done.get(tid, ())))
+                except ValueError:
+                    continue
+                for day in days:
+                    n, max_prio = counts.get(day.isoformat(), (0, 0))
+                    counts[day.isoformat()] = (n + 1, max(max_prio, prio))
+        return counts
+
+    def get_upcoming_due(self, start_date, limit, after=None):
+        out = []
+        with self._lock:
+            i = bisect.bisect_right(self._open_due, tuple(after)) if after is not None else 0
+            i = max(i, bisect.bisect_left(self._open_due, (start_date,)))
+            while i < len(self._open_due) and len(out) < limit:
+                due, tid = self._open_due[i]
+                rec = self._tasks[tid]
+                if rec["recurrence"] is None:
+                    out.append((tid, rec["title"], due, rec["priority"]))
+                i += 1
+        return out
+
+    @staticmethod
+    def _due_bucket(rec):
+        today = datetime.date.today()
+        due = rec["due_date"]
+        if not due:
+            return "none"
+        if due < today.isoformat():
+            return "overdue"
+        if due == today.isoformat():
+            return "today"
+        if due <= (today + datetime.timedelta(days=7)).isoformat():
+            return "week"
+        return "later"
+
+    @classmethod
+    def _group_keys(cls, group_by, rec):
+        if group_by == "priority":
+            return [rec["priority"] or 0]
+        if group_by == "due":
+            return [cls._due_bucket(rec)]
+        if group_by == "tag":
+            return list(dict.fromkeys(_split_tags(rec["tags"]))) or [""]
+        raise ValueError(f"Unknown group mode {group_by!r}")
+
+    def get_group_counts(self, group_by, filter_tag=None, show_completed=False):
+        if group_by not in db.GROUP_MODES:
+            raise ValueError(f"Unknown group mode {group_by!r}")
+        counts = Counter()
+        needle = filter_tag.lower() if filter_tag else None
+        with self._lock:
+            recs = list(self._tasks.values())
+        for rec in recs:
+            if (show_completed or not rec["completed"]) and (needle is None or needle in (rec["tags"] or "").lower()):
+                counts.update(self._group_keys(group_by, rec))
+        if group_by == "priority":
+            return sorted(counts.items(), reverse=True)
+        if group_by == "due":
+            return sorted(counts.items(), key=lambda kv: db.DUE_BUCKETS.index(kv[0]))
+        return sorted(counts.items(), key=lambda kv: (kv[0] == "", kv[0].lower()))
+
+    def get_group_tasks(self, group_by, key, filter_tag=None, show_completed=False, sort_by="default",
+                        limit=None, offset=0):
+        if group_by not in db.GROUP_MODES:
+            raise ValueError(f"Unknown group mode {group_by!r}")
+        if group_by == "priority":
+            key = int(key)
+        return self._select(filter_tag, show_completed, sort_by, limit, offset,
+                            condition=lambda r: key in self._group_keys(group_by, r))
+
+    # --- hierarchy ---
+
+    def get_parent_ids(self):
+        with self._lock:
+            return set(self._children)
+
+    def _walk(self, task_id, depth=0):
+        yield task_id, depth
+        for child in sorted(self._children.get(task_id, ())):
+            yield from self._walk(child, depth + 1)
+
+    def get_subtree(self, task_id):
+        with self._lock:
+            if task_id not in self._tasks:
+                return []
+            return [
+                self._list_row(self._tasks[tid]) + (self._tasks[tid]["parent_id"], depth)
+                for tid, depth in self._walk(task_id)
+            ]
+
+    def get_rollups(self, task_ids):
+        out = {}
+        with self._lock:
+            for root in dict.fromkeys(task_ids):
+                rec = self._tasks.get(root)
+                if rec is None:
+                    continue
+                below = [self._tasks[tid] for tid, depth in self._walk(root) if depth > 0]
+                if below:
+                    out[root] = (sum(1 for r in below if r["completed"]), len(below))
+                else:
+                    out[root] = (int(bool(rec["completed"])), 1)
+        return out
+
+    def set_parent(self, task_id, parent_id):
+        with self._lock:
+            rec = self._tasks.get(task_id)
+            if parent_id is not None and any(tid == parent_id for tid, _ in self._walk(task_id)):
+                raise ValueError(f"Task {parent_id} is a sub-task of {task_id}")
+            if rec is not None:
+                self._put(rec, parent_id=parent_id)
+        self._notify("update", task_id)
+
+    # --- recurring tasks ---
+
+    def set_recurrence(self, task_id, rule):
+        rule = recurrence.normalize_rule(rule)
+        with self._lock:
+            rec = self._tasks.get(task_id)
+            if rule and (rec is None or not rec["due_date"]):
+                raise ValueError("A repeating task needs a due date for its first occurrence.")
+            if rule:
+                recurrence.normalize_rule(rule, rec["due_date"])
+            if rec is not None:
+                self._put(rec, recurrence=rule)
+            if not rule:
+                self._exceptions.pop(task_id, None)
+        self._notify("update", task_id)
+
+    def get_recurrence(self, task_id):
+        rec = self._tasks.get(task_id)
+        return rec["recurrence"] if rec else None
+
+    def get_recurrences(self, include_completed=False):
+        with self._lock:
+            return {
+                r["id"]: (r["recurrence"], r["due_date"]) for r in self._tasks.values()
+                if r["recurrence"] and (include_completed or not r["completed"])
+            }
+
+    def complete_occurrence(self, task_id, occurrence_date, completed=True):
+        with self._lock:
+            if completed:
+                self._exceptions.setdefault(task_id, set()).add(occurrence_date)
+            else:
+                self._exceptions.get(task_id, set()).discard(occurrence_date)
+            self._version += 1
+        self._notify("update", task_id)
+
+    def get_completed_occurrences(self, task_ids, start_date=None, end_date=None):
+        out = {}
+        with self._lock:
+            for tid in task_ids:
+                days = {
+                    datetime.date.fromisoformat(d) for d in self._exceptions.get(tid, ())
+                    if (not start_date or d >= start_date) and (not end_date or d < end_date)
+                }
+                if days:
+                    out[tid] = days
+        return out
+
+    # --- archive ---
+
+    def archive_completed(self, older_than_days=None, batch_size=200, pause=0.05, stop_event=None):
+        if older_than_days is None:
+            older_than_days = db.ARCHIVE_AFTER_DAYS
+        cutoff = time.time() - older_than_days * 86400
+        total = 0
+        while True:
+            with self._lock:
+                ids = [
+                    r["id"] for r in self._tasks.values()
+                    if r["completed"] and r["updated_at"] < cutoff and r["id"] not in self._children
+                ][:batch_size]
+                for tid in ids:
+                    event_id = self._gc.get(tid)
+                    rec = self._remove(tid)
+                    self._archive[tid] = dict(rec, archived_at=time.time())
+                    if event_id is not None:
+                        self._gc_archive[tid] = event_id
+            total += len(ids)
+            if len(ids) < batch_size or (stop_event is not None and stop_event.is_set()):
+                break
+            time.sleep(pause)
+        if total:
+            self._notify("bulk", None)
+        return total
+
+    def search_archive(self, query=None, filter_tag=None, limit=None, offset=0):
+        q = query.lower() if query else None
+        tag = filter_tag.lower() if filter_tag else None
+        with self._lock:
+            recs = sorted(self._archive.values(), key=lambda r: r["updated_at"], reverse=True)
+        out = [
+            r for r in recs
+            if (q is None or q in (r["title"] or "").lower() or q in (r["description"] or "").lower())
+            and (tag is None or tag in (r["tags"] or "").lower())
+        ]
+        return [self._list_row(r) for r in _paged(out, limit, offset)]
+
+    # --- change feed ---
+
+    def latest_change_seq(self):
+        with self._lock:
+            return self._change_floor + len(self._changes)
+
+    def changes_since(self, seq=0, limit=1000):
+        with self._lock:
+            if seq < self._change_floor:
+                raise db.ChangeFeedGap(seq, self._change_floor)
+            start = seq - self._change_floor
+            return self._changes[start:None if limit is None else start + limit]
+
+    def compact_changes(self, max_age_days=None, max_rows=None, batch_size=5000, pause=0.05, stop_event=None):
+        if max_age_days is None:
+            max_age_days = db.CHANGES_RETAIN_DAYS
+        if max_rows is None:
+            max_rows = db.CHANGES_MAX_ROWS
+        cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - max_age_days * 86400))
+        with self._lock:
+            old = bisect.bisect_left([c[3] for c in self._changes], cutoff)
+            n = max(old, len(self._changes) - max_rows)
+            del self._changes[:n]
+            self._change_floor += n
+        return n
+
+    # --- calendar mapping ---
+
+    def map_task_to_gc(self, task_id, event_id):
+        with self._lock:
+            self._gc[task_id] = event_id
+            self._version += 1
+
+    def get_gc_event_id(self, task_id):
+        return self._gc.get(task_id)
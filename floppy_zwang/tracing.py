@@ -0,0 +1,281 @@
+"""
+Lightweight tracing: timed spans, SQLite statement timings and histograms.
+
+    with tracing.span("ui.render") as s:
+        ...
+        s.rows = len(rows)
+
+    @tracing.traced("sync.push", rows=False)
+    def push(...): ...
+
+Every span records its duration (and, when set, a row count) into a
+per-name histogram. While tracing is on, connections opened by db.py get an
+sqlite3 trace callback; each statement run inside a span is timed until the
+next statement on the same thread or the end of the span, so the figure
+includes stepping and fetching its rows.
+
+Tracing is off unless FLOPPY_ZWANG_TRACE is set or enable() is called; when
+off, a traced call costs one global check. Results are exported with
+write_json() (FLOPPY_ZWANG_TRACE_FILE writes them at exit) or as Prometheus
+text: prometheus_text(), GET /metrics on the API server, or a standalone
+endpoint on FLOPPY_ZWANG_METRICS_PORT (start_metrics_server()).
+"""
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.environ.get("FLOPPY_ZWANG_TRACE_FILE") or None
+METRICS_PORT = int(os.environ.get("FLOPPY_ZWANG_METRICS_PORT") or 0)
+METRIC_PREFIX = "floppy_zwang"
+
+# Histogram bucket upper bounds (Prometheus "le"); one more bucket holds +Inf.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}   # (metric, label) -> Histogram
+_local = threading.local()
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+class Histogram:
+    __slots__ = ("bounds", "buckets", "count", "sum", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.buckets)),
+        }
+
+
+def observe(metric, label, value, bounds=DURATION_BUCKETS):
+    with _lock:
+        hist = _histograms.get((metric, label))
+        if hist is None:
+            hist = _histograms[(metric, label)] = Histogram(bounds)
+        hist.observe(value)
+
+
+class span:
+    """Context manager timing a block as `name`; set .rows to record a row count."""
+    __slots__ = ("name", "rows", "_t0", "_parent")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self._t0 = None
+
+    def __enter__(self):
+        if _enabled:
+            self._parent = getattr(_local, "span", None)
+            _local.span = self
+            self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._t0 is None:
+            return False
+        now = time.perf_counter()
+        _end_statement(now)
+        _local.span = self._parent
+        observe("span_duration_seconds", self.name, now - self._t0)
+        if self.rows is not None:
+            observe("span_rows", self.name, self.rows, ROW_BUCKETS)
+        return False
+
+
+def traced(name=None, rows=False):
+    """
+    Decorator form of span(). With rows=True, the length of a list result is
+    recorded as the row count.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label) as s:
+                result = fn(*args, **kwargs)
+                if rows and isinstance(result, list):
+                    s.rows = len(result)
+                return result
+        return wrapper
+    return decorate
+
+
+# --- SQLite statements ---
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|X'[0-9A-Fa-f]*'")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """The statement with literals replaced by ? (trace callbacks see bound values expanded)."""
+    sql = _SPACES.sub(" ", _LITERALS.sub("?", sql)).strip()
+    return _IN_LISTS.sub("(?, ...)", sql)[:200]
+
+
+def _end_statement(now):
+    stmt = getattr(_local, "statement", None)
+    if stmt is not None:
+        _local.statement = None
+        observe("sql_duration_seconds", stmt[0], now - stmt[1])
+
+
+def on_statement(sql):
+    """sqlite3 trace callback, installed by db._connect while tracing is on."""
+    if getattr(_local, "span", None) is None or sql.startswith("--"):
+        return  # outside any span, or a trigger sub-statement
+    now = time.perf_counter()
+    _end_statement(now)
+    _local.statement = (normalize_sql(sql), now)
+
+
+# --- export ---
+
+def snapshot():
+    """{metric: {label: histogram dict}} of everything recorded so far."""
+    out = {}
+    with _lock:
+        for (metric, label), hist in sorted(_histograms.items()):
+            out.setdefault(metric, {})[label] = hist.to_dict()
+    return out
+
+
+def write_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+        f.write("\n")
+
+
+_LABEL_NAMES = {"span_duration_seconds": "span", "span_rows": "span", "sql_duration_seconds": "statement"}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        items = sorted(_histograms.items())
+        by_metric = {}
+        for (metric, label), hist in items:
+            by_metric.setdefault(metric, []).append((label, hist.bounds, list(hist.buckets), hist.count, hist.sum))
+    for metric, series in by_metric.items():
+        name = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# TYPE {name} histogram")
+        label_name = _LABEL_NAMES.get(metric, "name")
+        for label, bounds, buckets, count, total in series:
+            sel = f'{label_name}="{_escape(label)}"'
+            cumulative = 0
+            for bound, n in zip(bounds, buckets):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{sel},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{sel},le="+Inf"}} {count}')
+            lines.append(f"{name}_sum{{{sel}}} {total}")
+            lines.append(f"{name}_count{{{sel}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Serve GET /metrics on a daemon thread. Returns the server."""
+    # Imported here: http.server is a third of the headless CLI's import time.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug("%s - " + format, self.address_string(), *args)
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, METRICS_PORT if port is None else port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", *server.server_address[:2])
+    return server
+
+
+def setup_from_env():
+    """Apply FLOPPY_ZWANG_TRACE_FILE / FLOPPY_ZWANG_METRICS_PORT (called by the entry points)."""
+    if not _enabled:
+        return
+    if TRACE_FILE:
+        atexit.register(write_json, TRACE_FILE)
+    if METRICS_PORT:
+        start_metrics_server()
+
+
+if os.environ.get("FLOPPY_ZWANG_TRACE", "").lower() not in ("", "0", "false", "no"):
+    enable()
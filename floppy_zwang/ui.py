@@ -1,26 +1,55 @@
 import threading
 import datetime
 import logging
+import os
+from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-from db import add_task, update_task, delete_task, get_tasks, get_task, map_task_to_gc
-from widgets import PlaceholderEntry, DateEntry
+from store import SqliteTaskStore
+from backup import run_scheduled_backup
+from recurrence import next_occurrence
+from reminders import ReminderScheduler
+from widgets import PlaceholderEntry, DateEntry, TagCompleter
 from dialogs import EditDialog
 from google_sync import push_task_to_google
+from lagmonitor import STALL_LOG, LagMonitor
+from tagindex import TagIndex
+from tracing import span, traced
 
-# Logging setup
+# Handlers and levels are set up by logconfig (main.py).
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-ch = logging.StreamHandler()
-formatter = logging.Formatter('[%(levelname)s] %(asctime)s - %(message)s')
-ch.setFormatter(formatter)
-logger.addHandler(ch)
+
+# First archive pass shortly after startup, then periodically.
+ARCHIVE_FIRST_RUN_MS = 10 * 1000
+ARCHIVE_INTERVAL_MS = 6 * 60 * 60 * 1000
+BACKUP_FIRST_RUN_MS = 60 * 1000
+BACKUP_INTERVAL_MS = 24 * 60 * 60 * 1000
+ARCHIVED_IID_PREFIX = "archived-"
+PLACEHOLDER_IID_PREFIX = "placeholder-"
+GROUP_IID_PREFIX = "grp"
+MORE_IID_PREFIX = "more-"
+GROUP_PAGE_SIZE = 200
+DUE_BUCKET_LABELS = {
+    "overdue": "Overdue",
+    "today": "Today",
+    "week": "Next 7 days",
+    "later": "Later",
+    "none": "No due date",
+}
+STATS_TOP_TAGS = 10
+# Typing in the filter box reloads the list once typing pauses for this long.
+FILTER_DEBOUNCE_MS = 200
+# Rows listed for a fuzzy title search, best match first.
+FUZZY_RESULTS = 100
+PERF_OVERLAY = os.environ.get("FLOPPY_ZWANG_PERF_OVERLAY", "") not in ("", "0")
 
 
 class TaskerApp:
-    def __init__(self, root, theme="litera"):
+    def __init__(self, root, store=None, theme="litera"):
         self.root = root
+        self.store = store or SqliteTaskStore()
+        self.tag_index = TagIndex(self.store)
         self.root.title("Simple Task Manager")
         self.root.geometry("900x600")
 
@@ -42,8 +71,9 @@ class TaskerApp:
 
         self.tags_entry = PlaceholderEntry(top, placeholder="Tags")
         self.tags_entry.grid(row=0, column=1, sticky="ew", padx=8)
+        TagCompleter(self.tags_entry, self.tag_index)
 
-        self.due_widget = DateEntry(top)
+        self.due_widget = DateEntry(top, day_counts=self.store.due_counts)
         self.due_widget.grid(row=0, column=2, sticky="ew", padx=8)
 
         self.priority_var = tk.IntVar(value=2)
@@ -64,7 +94,12 @@ class TaskerApp:
         self.filter_tag_var = tk.StringVar()
         filter_entry = ttk.Entry(toolbar, textvariable=self.filter_tag_var, width=16)
         filter_entry.pack(side=tk.LEFT, padx=(4, 8))
-        filter_entry.bind("<KeyRelease>", lambda e: self.load_tasks())
+        self._filter_job = None
+        filter_entry.bind("<KeyRelease>", self._on_filter_key)
+        TagCompleter(filter_entry, self.tag_index, multi=False, on_accept=lambda text: self._reload_filter())
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="Fuzzy title",
+                        variable=self.fuzzy_var, command=self._reload_filter).pack(side=tk.LEFT, padx=(0, 8))
 
         self.sort_var = tk.StringVar(value="due_date")
         sort_box = ttk.Combobox(
@@ -81,9 +116,30 @@ class TaskerApp:
         ttk.Checkbutton(toolbar, text="Default sort",
                         variable=self.default_sort_var, command=self.load_tasks).pack(side=tk.LEFT, padx=(8, 0))
 
+        ttk.Label(toolbar, text="Group by:").pack(side=tk.LEFT, padx=(8, 0))
+        self.group_var = tk.StringVar(value="none")
+        group_box = ttk.Combobox(
+            toolbar, textvariable=self.group_var,
+            values=["none", "tag", "due", "priority"], width=9, state="readonly"
+        )
+        group_box.pack(side=tk.LEFT, padx=(4, 0))
+        group_box.bind("<<ComboboxSelected>>", lambda e: self.load_tasks())
+
+        self.show_archived_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="Show archived",
+                        variable=self.show_archived_var, command=self.load_tasks).pack(side=tk.LEFT, padx=(8, 0))
+
+        # --- Stats sidebar ---
+        sidebar = ttk.Frame(root, padding=(0, 8, 8, 8))
+        sidebar.pack(side=tk.RIGHT, fill=tk.Y)
+        ttk.Label(sidebar, text="Overview").pack(anchor="w")
+        self.stats_label = ttk.Label(sidebar, text="", justify=tk.LEFT)
+        self.stats_label.pack(anchor="w", pady=(4, 0))
+
         # --- Treeview ---
         columns = ("title", "due", "priority", "tags", "completed")
-        self.tree = ttk.Treeview(root, columns=columns, show="headings", selectmode="browse")
+        self.tree = ttk.Treeview(root, columns=columns, show="tree headings", selectmode="browse")
+        self.tree.column("#0", width=40, stretch=False)
         self.sort_state = {}
 
         def make_heading(col, label):
@@ -102,6 +158,14 @@ class TaskerApp:
         self.tree.column("completed", width=60, anchor="center")
         self.tree.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
         self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self._parent_ids = set()
+        self._groups = {}
+        self._recurring = {}
+        self._occurrences_done = {}
+        self.tree.tag_configure("archived", foreground="grey")
+        self._edit_dialog = None
 
         # --- Bottom buttons ---
         bottom = ttk.Frame(root, padding=(8,8))
@@ -109,12 +173,62 @@ class TaskerApp:
         ttk.Button(bottom, text="Edit Selected", command=self.edit_selected).pack(side=tk.LEFT)
         ttk.Button(bottom, text="Delete Selected", command=self.delete_selected).pack(side=tk.LEFT, padx=(8, 0))
         ttk.Button(bottom, text="Mark Done/Undo", command=self.toggle_done).pack(side=tk.LEFT, padx=(8, 0))
+        ttk.Button(bottom, text="Add as Subtask", command=self.add_subtask).pack(side=tk.LEFT, padx=(8, 0))
         ttk.Button(bottom, text="Refresh", command=self.load_tasks).pack(side=tk.RIGHT)
 
+        # Event-loop lag monitor; F12 toggles its status overlay.
+        self.perf_label = ttk.Label(bottom, text="")
+        self.lag = LagMonitor(root, report_path=self._stall_log_path(), label=self.perf_label)
+        self.root.bind("<F12>", self.lag.toggle_overlay)
+
+        self.load_tasks()
+        self.root.after(ARCHIVE_FIRST_RUN_MS, self.run_archive_job)
+        if isinstance(self.store, SqliteTaskStore):
+            self.root.after(BACKUP_FIRST_RUN_MS, self.run_backup_job)
+
+        self.reminders = ReminderScheduler(self.store)
+        self.reminders.start()
+        self.lag.start()
+        self.lag.show_overlay(PERF_OVERLAY)
+        # The tag dictionary is filled off the main thread; completion starts once it is ready.
+        threading.Thread(target=self.lag.job(self.tag_index.build), daemon=True).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        self.tag_index.close()
+        self.lag.stop()
+        self.reminders.stop()
+        self.root.destroy()
+
+    def _on_filter_key(self, event):
+        if event.keysym in ("Up", "Down", "Tab", "Escape"):
+            return
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DEBOUNCE_MS, self._reload_filter)
+
+    def _reload_filter(self):
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+            self._filter_job = None
         self.load_tasks()
 
+    def _stall_log_path(self):
+        """Stall reports go next to the database file (or to $FLOPPY_ZWANG_STALL_LOG)."""
+        if STALL_LOG:
+            return STALL_LOG
+        path = getattr(self.store, "path", None)
+        if not path or path.startswith("file:"):
+            return None
+        return str(Path(path).resolve().parent / "stalls.log")
+
     # --- Methods ---
-    def quick_add(self):
+    def add_subtask(self):
+        tid = self.get_selected_task_id()
+        if tid:
+            self.quick_add(parent_id=tid)
+
+    def quick_add(self, parent_id=None):
         title = self._get_clean_text(self.title_entry)
         tags = self._get_clean_text(self.tags_entry)
         due = getattr(self.due_widget, "get_date", lambda: self.due_widget.get_date())()
@@ -138,7 +252,7 @@ class TaskerApp:
             return
 
         # ----- SAVE TASK -----
-        tid = add_task(title, "", due, priority, tags)
+        tid = self.store.add_task(title, "", due, priority, tags, parent_id)
 
         # Clear inputs
         self.title_entry.delete(0, tk.END)
@@ -158,43 +272,220 @@ class TaskerApp:
 
         # Reload list
         self.root.after(0, self.load_tasks)
-        logger.info(f"Added task {tid}: {title}")
+        logger.info("Added task %s: %s", tid, title)
+
+    def _fetch_rows(self, tag=None, parent_id=None):
+        top_level_only = tag is None and parent_id is None
+        # The store sorts (SQL ORDER BY for SQLite), so no key tuple per row is built here.
+        sort_by = "default" if self.default_sort_var.get() else self.sort_var.get()
+        with self.lag.query("get_tasks"):
+            return self.store.get_tasks(filter_tag=tag, sort_by=sort_by, show_completed=True,
+                                        parent_id=parent_id, top_level_only=top_level_only)
+
+    def _insert_rows(self, parent_iid, rows, iid_prefix=""):
+        self.lag.rows_rendered += len(rows)
+        with span("ui.insert_rows") as s:
+            s.rows = len(rows)
+            self._insert_rows_now(parent_iid, rows, iid_prefix)
+
+    def _insert_rows_now(self, parent_iid, rows, iid_prefix):
+        for r in rows:
+            tid, title, desc, due, priority, tags, completed = r
+            if tid in self._recurring and not completed:
+                nxt = self._next_occurrence(tid, due)
+                due = f"{nxt or due} ↻"
+            self.tree.insert(parent_iid, "end", iid=f"{iid_prefix}{tid}",
+                             values=(title, due or "", priority or 0, tags or "", "✓" if completed else ""))
+            if tid in self._parent_ids:
+                # Children are only fetched when the node is opened (on_tree_open).
+                self.tree.insert(str(tid), "end", iid=f"{PLACEHOLDER_IID_PREFIX}{tid}", values=("…",))
+
+    def _next_occurrence(self, tid, due):
+        """Next open occurrence of a repeating task from today on, or None once the series ended."""
+        rule, _ = self._recurring[tid]
+        try:
+            dtstart = datetime.date.fromisoformat(due)
+            return next_occurrence(rule, dtstart, datetime.date.today(), self._occurrences_done.get(tid, ()))
+        except (TypeError, ValueError):
+            return None
 
+    @traced("ui.load_tasks")
     def load_tasks(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # Clear in Tcl: get_children() would convert every iid to a Python string first.
+        self.tree.tk.eval(f"{self.tree} delete [{self.tree} children {{}}]")
+        self.lag.rows_rendered = 0
         tag = self.filter_tag_var.get().strip() or None
-        if self.default_sort_var.get():
-            rows = get_tasks(filter_tag=tag, show_completed=True)
-            rows.sort(key=lambda r: (-int(r[4] or 0), r[3] is None, r[3] or "9999-99-99", (r[1] or "").lower()))
+        # With a tag filter, matches are listed flat; otherwise only top-level tasks are rendered.
+        self._groups = {}
+        self._recurring = self.store.get_recurrences()
+        self._occurrences_done = self.store.get_completed_occurrences(
+            self._recurring, start_date=datetime.date.today().isoformat())
+        fuzzy = self._fuzzy_query(tag)
+        if fuzzy:
+            # Typo-tolerant title matches, listed flat in rank order (sort and grouping don't apply).
+            self._parent_ids = set()
+            with self.lag.query("fuzzy_search_titles"):
+                rows = self.store.fuzzy_search_titles(tag, show_completed=True, limit=FUZZY_RESULTS)
+            self._insert_rows("", rows)
+        elif self.group_var.get() != "none":
+            self._parent_ids = set()
+            self._load_groups(self.group_var.get(), tag)
         else:
-            rows = get_tasks(filter_tag=tag, sort_by=self.sort_var.get(), show_completed=True)
-        for r in rows:
-            tid, title, desc, due, priority, tags, completed = r
-            self.tree.insert("", "end", iid=str(tid),
-                             values=(title, due or "", priority or 0, tags or "", "✓" if completed else ""))
+            self._parent_ids = self.store.get_parent_ids() if tag is None else set()
+            self._insert_rows("", self._fetch_rows(tag))
+        if self.show_archived_var.get():
+            archived = self.store.search_archive(query=tag) if fuzzy else self.store.search_archive(filter_tag=tag)
+            for tid, title, desc, due, priority, tags, completed in archived:
+                self.tree.insert("", "end", iid=f"{ARCHIVED_IID_PREFIX}{tid}", tags=("archived",),
+                                 values=(title, due or "", priority or 0, tags or "", "✓" if completed else ""))
+        self.refresh_stats()
+
+    def _fuzzy_query(self, text):
+        # Under three characters there are no trigrams to match, so the box filters tags as usual.
+        return bool(self.fuzzy_var.get() and text and len(text) >= 3)
+
+    def _load_groups(self, group_by, tag):
+        """Insert one collapsed header row per group; members are paged in on expand."""
+        for idx, (key, count) in enumerate(self.store.get_group_counts(group_by, filter_tag=tag, show_completed=True)):
+            if group_by == "due":
+                label = DUE_BUCKET_LABELS[key]
+            elif group_by == "priority":
+                label = f"Priority {key}"
+            else:
+                label = key or "(untagged)"
+            group_iid = f"{GROUP_IID_PREFIX}{idx}"
+            self._groups[group_iid] = {"by": group_by, "key": key, "tag": tag, "count": count, "offset": 0}
+            self.tree.insert("", "end", iid=group_iid, values=(f"{label} ({count})",))
+            self.tree.insert(group_iid, "end", iid=f"{PLACEHOLDER_IID_PREFIX}{group_iid}", values=("…",))
+
+    def _load_group_page(self, group_iid):
+        group = self._groups[group_iid]
+        more_iid = f"{MORE_IID_PREFIX}{group_iid}"
+        if self.tree.exists(more_iid):
+            self.tree.delete(more_iid)
+        with self.lag.query("get_group_tasks"):
+            rows = self.store.get_group_tasks(
+                group["by"], group["key"], filter_tag=group["tag"], show_completed=True,
+                sort_by="default" if self.default_sort_var.get() else self.sort_var.get(),
+                limit=GROUP_PAGE_SIZE, offset=group["offset"],
+            )
+        self._insert_rows(group_iid, rows, iid_prefix=f"{group_iid}/")
+        group["offset"] += len(rows)
+        remaining = group["count"] - group["offset"]
+        if rows and remaining > 0:
+            self.tree.insert(group_iid, "end", iid=more_iid, values=(f"Load more… ({remaining} left)",))
+
+    def on_tree_select(self, event):
+        sel = self.tree.selection()
+        if sel and sel[0].startswith(MORE_IID_PREFIX):
+            self.tree.selection_remove(sel[0])
+            self._load_group_page(sel[0][len(MORE_IID_PREFIX):])
+
+    def on_tree_open(self, event):
+        iid = self.tree.focus()
+        children = self.tree.get_children(iid)
+        if len(children) != 1 or not children[0].startswith(PLACEHOLDER_IID_PREFIX):
+            return
+        self.tree.delete(children[0])
+        if iid in self._groups:
+            self._load_group_page(iid)
+            return
+        rows = self._fetch_rows(parent_id=int(iid))
+        self._insert_rows(iid, rows)
+        rollup_ids = [int(iid)] + [r[0] for r in rows if r[0] in self._parent_ids]
+        for tid, (done, total) in self.store.get_rollups(rollup_ids).items():
+            if total:
+                self.tree.set(str(tid), "completed", f"{round(100 * done / total)}%")
+
+    def refresh_stats(self):
+        with self.lag.query("get_stats"):
+            stats = self.store.get_stats()
+        lines = [
+            f"Total: {stats['total']}",
+            f"Open: {stats['open']}",
+            f"Done: {stats['done']}",
+            f"Overdue: {stats['overdue']}",
+            "",
+            "Open by priority:",
+        ]
+        lines += [f"  P{p}: {n}" for p, n in sorted(stats["by_priority"].items(), reverse=True)]
+        top_tags = sorted(stats["by_tag"].items(), key=lambda kv: (-kv[1], kv[0]))[:STATS_TOP_TAGS]
+        if top_tags:
+            lines += ["", "Open by tag:"]
+            lines += [f"  {tag}: {n}" for tag, n in top_tags]
+        self.stats_label.config(text="\n".join(lines))
+
+    def run_archive_job(self):
+        """Archive old completed tasks and trim the change feed on a worker thread, then reschedule."""
+        def worker():
+            try:
+                moved = self.store.archive_completed()
+                if moved:
+                    logger.info("Archived %d completed tasks", moved)
+                    self.root.after(0, self.load_tasks)
+                dropped = self.store.compact_changes()
+                if dropped:
+                    logger.info("Compacted %d change feed entries", dropped)
+            except Exception as e:
+                logger.error("Archive job failed: %s", e)
+
+        threading.Thread(target=self.lag.job(worker), daemon=True).start()
+        self.root.after(ARCHIVE_INTERVAL_MS, self.run_archive_job)
+
+    def run_backup_job(self):
+        """Snapshot the database on a worker thread (incremental backup API steps), then reschedule."""
+        def worker():
+            try:
+                path = run_scheduled_backup(src_path=self.store.path)
+                logger.info("Backed up database to %s", path)
+            except Exception as e:
+                logger.error("Backup failed: %s", e)
+
+        threading.Thread(target=self.lag.job(worker), daemon=True).start()
+        self.root.after(BACKUP_INTERVAL_MS, self.run_backup_job)
 
     def get_selected_task_id(self):
         sel = self.tree.selection()
         if not sel:
             messagebox.showinfo("Select", "Please select a task.")
             return None
-        return int(sel[0])
+        iid = sel[0]
+        if "/" in iid:
+            # Task row inside a group header: "<group iid>/<task id>"
+            return int(iid.rsplit("/", 1)[1])
+        if iid.startswith((PLACEHOLDER_IID_PREFIX, GROUP_IID_PREFIX, MORE_IID_PREFIX)):
+            return None
+        if iid.startswith(ARCHIVED_IID_PREFIX):
+            messagebox.showinfo("Archived", "Archived tasks are read-only.")
+            return None
+        return int(iid)
 
+    @traced("ui.open_edit_dialog")
     def edit_selected(self):
         tid = self.get_selected_task_id()
         if not tid:
             return
-        row = get_task(tid)
+        row = self.store.get_task(tid)
         if not row:
             messagebox.showerror("Error", "Task not found.")
             return
         # Non-blocking modal dialog (grab_set will prevent interaction with parent)
-        EditDialog(self.root, row, on_save=self.on_edit_save)
+        if self._edit_dialog is None or not self._edit_dialog.exists():
+            self._edit_dialog = EditDialog(self.root, row, on_save=self.on_edit_save, store=self.store,
+                                           tag_index=self.tag_index)
+        else:
+            self._edit_dialog.open(row)
 
-    def on_edit_save(self, task_data):
-        update_task(*task_data)
-        logger.info(f"Updated task {task_data[0]}")
+    def on_edit_save(self, task_data, recurrence=None):
+        self.store.update_task(*task_data)
+        # set_recurrence() is a second write transaction that bumps updated_at
+        # (delaying archiving), so only call it when the Repeat field changed.
+        if recurrence != self.store.get_recurrence(task_data[0]):
+            try:
+                self.store.set_recurrence(task_data[0], recurrence)
+            except ValueError as e:
+                messagebox.showerror("Repeat", str(e))
+        logger.info("Updated task %s", task_data[0])
         self.root.after(0, self.load_tasks)
 
     def delete_selected(self):
@@ -202,19 +493,28 @@ class TaskerApp:
         if not tid:
             return
         if messagebox.askyesno("Confirm", "Delete selected task?"):
-            delete_task(tid)
-            logger.info(f"Deleted task {tid}")
+            self.store.delete_task(tid)
+            logger.info("Deleted task %s", tid)
             self.root.after(0, self.load_tasks)
 
     def toggle_done(self):
         tid = self.get_selected_task_id()
         if not tid:
             return
-        row = get_task(tid)
+        row = self.store.get_task(tid)
         if not row:
             return
+        if tid in self._recurring and not row[6]:
+            # Tick off the next occurrence only; the series completes after its last one.
+            nxt = self._next_occurrence(tid, row[3])
+            if nxt:
+                self.store.complete_occurrence(tid, nxt.isoformat())
+                self._occurrences_done.setdefault(tid, set()).add(nxt)
+                if self._next_occurrence(tid, row[3]) is not None:
+                    self.root.after(0, self.load_tasks)
+                    return
         completed = not bool(row[6])
-        update_task(tid, row[1], row[2], row[3], row[4], row[5], int(completed))
+        self.store.update_task(tid, row[1], row[2], row[3], row[4], row[5], int(completed))
         self.root.after(0, self.load_tasks)
 
     def on_double_click(self, event):
@@ -226,24 +526,25 @@ class TaskerApp:
         tid = self.get_selected_task_id()
         if not tid:
             return
-        task = get_task(tid)
+        task = self.store.get_task(tid)
         if not task:
             return
 
         def worker():
             try:
-                event_id = push_task_to_google(task)
-                map_task_to_gc(tid, event_id)
+                event_id = push_task_to_google(task, self.store)
+                self.store.map_task_to_gc(tid, event_id)
                 self.root.after(0, lambda: messagebox.showinfo(
                     "Synced", f"Task pushed to Google Calendar (event id: {event_id})."))
-                logger.info(f"Synced task {tid} to Google Calendar")
+                logger.info("Synced task %s to Google Calendar", tid)
             except Exception as e:
                 self.root.after(0, lambda: messagebox.showerror(
                     "Sync error", f"Error during Google sync:\n{e}"))
-                logger.error(f"Google sync error for task {tid}: {e}")
+                logger.error("Google sync error for task %s: %s", tid, e)
 
-        threading.Thread(target=worker, daemon=True).start()
+        threading.Thread(target=self.lag.job(worker), daemon=True).start()
 
+    @traced("ui.sort_by_column")
     def sort_by_column(self, col):
         direction = self.sort_state.get(col, False)
         self.sort_state[col] = not direction
@@ -3,6 +3,19 @@ import datetime
 import tkinter as tk
 from tkinter import ttk
 
+_placeholder_styles = {}
+
+
+def _placeholder_style(color):
+    """One shared ttk style per placeholder colour, not one per entry."""
+    name = _placeholder_styles.get(color)
+    if name is None:
+        name = "Placeholder.TEntry" if not _placeholder_styles else f"Placeholder{len(_placeholder_styles)}.TEntry"
+        ttk.Style().configure(name, foreground=color)
+        _placeholder_styles[color] = name
+    return name
+
+
 class PlaceholderEntry(ttk.Entry):
     def __init__(self, master=None, placeholder="Placeholder", color="grey", **kwargs):
         super().__init__(master, **kwargs)
@@ -10,10 +23,7 @@ class PlaceholderEntry(ttk.Entry):
         self.placeholder_color = color
 
         self.default_style = self.cget("style") or ""
-
-        style = ttk.Style()
-        self.placeholder_style = f"{id(self)}.Placeholder.TEntry"
-        style.configure(self.placeholder_style, foreground=self.placeholder_color)
+        self.placeholder_style = _placeholder_style(color)
 
         self.bind("<FocusIn>", self._clear)
         self.bind("<FocusOut>", self._restore)
@@ -34,12 +44,47 @@ class PlaceholderEntry(ttk.Entry):
             self.delete(0, tk.END)
             self.configure(style=self.default_style)
 
+HEAT_STYLES = {
+    "busy": ("Busy.Cal.TButton", "#fff3cd"),
+    "hot": ("Hot.Cal.TButton", "#ffc107"),
+    "overdue": ("Overdue.Cal.TButton", "#f8a5a5"),
+}
+_heat_styles_ready = False
+
+
+def _ensure_heat_styles():
+    global _heat_styles_ready
+    if _heat_styles_ready:
+        return
+    style = ttk.Style()
+    for name, bg in HEAT_STYLES.values():
+        style.configure(name, background=bg, foreground="black")
+    _heat_styles_ready = True
+
+
+def heat_style(date_obj, count, max_priority, today=None):
+    """Pick the day-button style for `count` open tasks due on date_obj."""
+    if not count:
+        return "TButton"
+    today = today or datetime.date.today()
+    if date_obj < today:
+        return HEAT_STYLES["overdue"][0]
+    if count >= 5 or max_priority >= 4:
+        return HEAT_STYLES["hot"][0]
+    return HEAT_STYLES["busy"][0]
+
+
 class CalendarPopup(tk.Toplevel):
     """
     A Toplevel popup showing a month grid. Callback receives a datetime.date.
+    The popup only hides itself when closed; call show() to display it, the
+    first time too (it draws the month). The 6x7 day buttons are created once
+    and reconfigured on navigation.
+    day_counts, if given, provides get(year, month) -> {day: (count, max_priority)}
+    (and optionally prefetch(year, month)) to overlay open-task counts per day.
     """
 
-    def __init__(self, parent, selected_date=None, callback=None):
+    def __init__(self, parent, selected_date=None, callback=None, day_counts=None):
         super().__init__(parent)
         self.withdraw()
         self.transient(parent)
@@ -47,6 +92,9 @@ class CalendarPopup(tk.Toplevel):
         self.resizable(False, False)
         self.callback = callback
         self.parent = parent
+        self.day_counts = day_counts
+        if day_counts is not None:
+            _ensure_heat_styles()
 
         self.selected_date = selected_date or datetime.date.today()
         self.display_year = self.selected_date.year
@@ -93,7 +141,13 @@ class CalendarPopup(tk.Toplevel):
         self.days_frame = ttk.Frame(frm)
         self.days_frame.grid(row=2, column=0, pady=(4, 0), sticky="nsew")
         for i in range(7):
-            self.days_frame.columnconfigure(i, weight=1)
+            self.days_frame.columnconfigure(i, weight=1, uniform="day")
+        self._cells = []
+        self._cell_dates = [None] * 42
+        for i in range(42):
+            btn = ttk.Button(self.days_frame, command=lambda i=i: self._on_cell(i))
+            btn.grid(row=i // 7, column=i % 7, padx=1, pady=1, sticky="nsew")
+            self._cells.append(btn)
 
         # --- Footer ---
         footer = ttk.Frame(frm)
@@ -101,35 +155,50 @@ class CalendarPopup(tk.Toplevel):
         ttk.Button(footer, text="Today", command=self._on_today).pack(side="left")
         ttk.Button(footer, text="Cancel", command=self._on_close).pack(side="right")
 
-        self._draw_calendar()
-
     def _draw_calendar(self):
-        # Clear previous widgets
-        for w in self.days_frame.winfo_children():
-            w.destroy()
-
         dt_name = datetime.date(self.display_year, self.display_month, 1).strftime("%B %Y")
         self.header_label.config(text=dt_name)
 
         month_cal = calendar.monthcalendar(self.display_year, self.display_month)
+        counts = {}
+        if self.day_counts is not None:
+            counts = self.day_counts.get(self.display_year, self.display_month)
+        today = datetime.date.today()
 
-        for r, week in enumerate(month_cal):
+        for r in range(6):
+            week = month_cal[r] if r < len(month_cal) else [0] * 7
             for c, day in enumerate(week):
+                idx = r * 7 + c
+                btn = self._cells[idx]
                 if day == 0:
-                    lbl = ttk.Label(self.days_frame, text="", anchor="center")
-                    lbl.grid(row=r, column=c, padx=1, pady=1, sticky="nsew")
+                    self._cell_dates[idx] = None
+                    btn.grid_remove()
+                    continue
+                dt = datetime.date(self.display_year, self.display_month, day)
+                self._cell_dates[idx] = dt
+                if self.day_counts is not None:
+                    n, prio = counts.get(day, (0, 0))
+                    btn.configure(text=f"{day}\n{n or ''}", style=heat_style(dt, n, prio, today))
                 else:
-                    btn = ttk.Button(self.days_frame, text=str(day))
-                    dt = datetime.date(self.display_year, self.display_month, day)
-                    if dt == self.selected_date:
-                        btn.state(["selected"])
-                    btn.grid(row=r, column=c, padx=1, pady=1, sticky="nsew")
-                    btn.config(command=lambda d=dt: self._on_day_selected(d))
+                    btn.configure(text=str(day))
+                btn.state(["selected"] if dt == self.selected_date else ["!selected"])
+                btn.grid()
 
             # Ensure each row expands evenly
-            self.days_frame.rowconfigure(r, weight=1)
+            self.days_frame.rowconfigure(r, weight=1 if r < len(month_cal) else 0)
 
+        prefetch = getattr(self.day_counts, "prefetch", None)
+        if prefetch:
+            self.after_idle(prefetch, self.display_year, self.display_month)
 
+    def show(self, selected_date=None):
+        """Re-target the popup at selected_date (default today) and display it."""
+        self.selected_date = selected_date or datetime.date.today()
+        self.display_year = self.selected_date.year
+        self.display_month = self.selected_date.month
+        self._draw_calendar()
+        self.deiconify()
+        self.lift()
 
     def _on_prev(self):
         y, m = self.display_year, self.display_month
@@ -152,12 +221,11 @@ class CalendarPopup(tk.Toplevel):
         self._draw_calendar()
 
     def _on_today(self):
-        self.selected_date = datetime.date.today()
-        if self.callback:
-            try:
-                self.callback(self.selected_date)
-            finally:
-                self.destroy()
+        self._on_day_selected(datetime.date.today())
+
+    def _on_cell(self, idx):
+        if self._cell_dates[idx] is not None:
+            self._on_day_selected(self._cell_dates[idx])
 
     def _on_day_selected(self, date_obj):
         self.selected_date = date_obj
@@ -165,19 +233,22 @@ class CalendarPopup(tk.Toplevel):
             try:
                 self.callback(date_obj)
             finally:
-                self.destroy()
+                self._on_close()
 
     def _on_close(self):
-        self.destroy()
+        self.withdraw()
 
 class DateEntry(ttk.Frame):
     """
     Composite widget with an entry (read-only) and a button that opens CalendarPopup.
+    day_counts is passed through to CalendarPopup for the per-day task overlay.
     get_date() returns ISO string 'YYYY-MM-DD' or empty string.
     set_date(date_obj) accepts either datetime.date or ISO string.
     """
-    def __init__(self, master=None, width=12, initial_date=None, **kwargs):
+    def __init__(self, master=None, width=12, initial_date=None, day_counts=None, **kwargs):
         super().__init__(master, **kwargs)
+        self.day_counts = day_counts
+        self._popup = None
         self._value = tk.StringVar()
         self.entry = ttk.Entry(self, textvariable=self._value, width=width, state="readonly")
         self.entry.pack(side="left", fill="x", expand=True)
@@ -189,8 +260,6 @@ class DateEntry(ttk.Frame):
         else:
             self._value.set("")
 
-        self._popup = None
-
     def _open_popup(self):
         sel = None
         try:
@@ -199,19 +268,26 @@ class DateEntry(ttk.Frame):
         except Exception:
             sel = datetime.date.today()
 
-        self._popup = CalendarPopup(
-            self.winfo_toplevel(),
-            selected_date=sel,
-            callback=self._on_date_chosen
-        )
+        if self._popup is None or not self._popup.winfo_exists():
+            self._popup = CalendarPopup(
+                self.winfo_toplevel(),
+                selected_date=sel,
+                callback=self._on_date_chosen,
+                day_counts=self.day_counts,
+            )
 
         x = self.winfo_rootx()
         y = self.winfo_rooty() + self.winfo_height()
 
         self._popup.geometry(f"+{x}+{y}")
-        self._popup.deiconify()
+        self._popup.show(sel)
         self._popup.focus_force()
 
+    def destroy(self):
+        if self._popup is not None and self._popup.winfo_exists():
+            self._popup.destroy()
+        super().destroy()
+
     def _on_date_chosen(self, date_obj):
         if isinstance(date_obj, (datetime.date, datetime.datetime)):
             iso = date_obj.isoformat()
@@ -232,3 +308,109 @@ class DateEntry(ttk.Frame):
             self._value.set(date_obj_or_str.isoformat())
         else:
             self._value.set("")
+
+
+class TagCompleter:
+    """
+    Completion popup for an entry holding comma-separated tags (multi=True) or
+    a single tag. Suggestions come from a TagIndex as the last tag is typed;
+    Up/Down move through them, Tab/Return or a click accepts, Escape closes.
+    on_accept(text) is called after a suggestion is inserted.
+    """
+    def __init__(self, entry, index, multi=True, on_accept=None, limit=8):
+        self.entry = entry
+        self.index = index
+        self.multi = multi
+        self.on_accept = on_accept
+        self.limit = limit
+        self._popup = None
+        self._listbox = None
+
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", lambda e: self._move(1), add="+")
+        entry.bind("<Up>", lambda e: self._move(-1), add="+")
+        entry.bind("<Tab>", self._on_accept_key, add="+")
+        entry.bind("<Return>", self._on_accept_key, add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self.hide), add="+")
+
+    def _tokens(self):
+        text = self.entry.get()
+        if isinstance(self.entry, PlaceholderEntry) and self.entry._is_placeholder():
+            return [], ""
+        if not self.multi:
+            return [], text
+        *done, last = text.split(",")
+        return [t.strip() for t in done], last
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Tab", "Escape"):
+            return
+        done, last = self._tokens()
+        prefix = last.strip()
+        suggestions = self.index.suggest(prefix, self.limit, exclude=set(done)) if prefix else []
+        if not suggestions or suggestions == [prefix]:
+            self.hide()
+            return
+        self._show(suggestions)
+
+    def _show(self, suggestions):
+        if self._popup is None or not self._popup.winfo_exists():
+            self._popup = tk.Toplevel(self.entry)
+            self._popup.overrideredirect(True)
+            self._listbox = tk.Listbox(self._popup, exportselection=False, takefocus=0, activestyle="none")
+            self._listbox.pack(fill="both", expand=True)
+            self._listbox.bind("<ButtonPress-1>", self._on_click)
+        lb = self._listbox
+        lb.delete(0, tk.END)
+        for tag in suggestions:
+            lb.insert(tk.END, tag)
+        lb.configure(height=len(suggestions), width=max(int(self.entry.cget("width") or 20), 20))
+        lb.selection_set(0)
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self._popup.geometry(f"+{x}+{y}")
+        self._popup.deiconify()
+        self._popup.lift()
+
+    def visible(self):
+        return self._popup is not None and self._popup.winfo_exists() and self._popup.winfo_viewable()
+
+    def hide(self):
+        if self._popup is not None and self._popup.winfo_exists():
+            self._popup.withdraw()
+
+    def _move(self, step):
+        if not self.visible():
+            return None
+        lb = self._listbox
+        cur = lb.curselection()
+        i = max(0, min(lb.size() - 1, (cur[0] if cur else -1) + step))
+        lb.selection_clear(0, tk.END)
+        lb.selection_set(i)
+        lb.see(i)
+        return "break"
+
+    def _on_click(self, event):
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(self._listbox.nearest(event.y))
+        self._accept()
+        return "break"
+
+    def _on_accept_key(self, event):
+        if not self.visible() or not self._listbox.curselection():
+            return None
+        self._accept()
+        return "break"
+
+    def _accept(self):
+        tag = self._listbox.get(self._listbox.curselection()[0])
+        done, _ = self._tokens()
+        text = ", ".join([t for t in done if t] + [tag]) if self.multi else tag
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, text)
+        self.entry.icursor(tk.END)
+        self.hide()
+        self.entry.focus_set()
+        if self.on_accept:
+            self.on_accept(text)